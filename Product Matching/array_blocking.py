@@ -0,0 +1,396 @@
+"""
+Array-backed MinHash LSH blocking engine.
+Signatures live in one contiguous uint64 matrix (optionally memory-mapped from disk)
+and band buckets are sorted hash arrays, so memory stays at a few hundred bytes per product.
+"""
+from typing import List, Dict, Tuple
+import heapq
+import time
+from datasketch import MinHashLSH
+import numpy as np
+import config
+from blocking import CandidateBlocker, MinHashSignatureMixin
+
+
+# 64-bit multipliers for folding band values into a single bucket key
+_BAND_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+_FMIX_MULTIPLIERS = (np.uint64(0xFF51AFD7ED558CCD), np.uint64(0xC4CEB9FE1A85EC53))
+
+
+def optimal_band_params(threshold: float, num_perm: int,
+                        false_positive_weight: float = 0.5,
+                        false_negative_weight: float = 0.5) -> Tuple[int, int]:
+    """
+    Choose the number of bands and rows per band for a Jaccard threshold.
+    Taken from datasketch's MinHashLSH itself, so the banding always matches
+    the layout ProductBlocker indexes with.
+    
+    Args:
+        threshold: Jaccard similarity threshold
+        num_perm: Number of permutations
+        false_positive_weight: Weight of the false positive probability
+        false_negative_weight: Weight of the false negative probability
+    
+    Returns:
+        Tuple of (bands, rows_per_band)
+    """
+    lsh = MinHashLSH(threshold=threshold, num_perm=num_perm,
+                     weights=(false_positive_weight, false_negative_weight))
+    return lsh.b, lsh.r
+
+
+class ArrayLSHBlocker(MinHashSignatureMixin, CandidateBlocker):
+    """
+    MinHash LSH blocking backed by flat numpy arrays instead of Python objects.
+    Drop-in replacement for ProductBlocker.
+    """
+    
+    def __init__(self, num_perm: int = None, threshold: float = None, cross_store_only: bool = None,
+                 ranked: bool = None, signature_path: str = None, build_workers: int = None,
+                 n_gram_size: int = None):
+        """
+        Initialize the array-backed blocker.
+        
+        Args:
+            num_perm: Number of permutations for MinHash (default: from config)
+            threshold: Jaccard similarity threshold (default: from config)
+            cross_store_only: Only pair products from different stores (default: from config)
+            ranked: Keep the most similar candidates when truncating (default: from config)
+            signature_path: Optional .npy file to keep the signature matrix memory-mapped on disk
+            build_workers: Processes used to compute signatures, 0 for all cores (default: from config)
+            n_gram_size: Character n-gram size for shingling (default: from config)
+        """
+        super().__init__(num_perm, threshold, cross_store_only, ranked, build_workers, n_gram_size)
+        
+        self.signature_path = signature_path
+        
+        # Banding layout
+        self.bands, self.rows_per_band = optimal_band_params(self.threshold, self.num_perm)
+        self.hashranges = [
+            (i * self.rows_per_band, (i + 1) * self.rows_per_band)
+            for i in range(self.bands)
+        ]
+        
+        # Band buckets: per band, bucket keys sorted ascending with their rows
+        self.band_keys = np.empty((self.bands, 0), dtype=np.uint64)  # band -> sorted bucket keys
+        self.band_rows = np.empty((self.bands, 0), dtype=np.int32)  # band -> row at each sorted position
+        self.band_positions = np.empty((self.bands, 0), dtype=np.int32)  # band -> sorted position of each row
+        
+        print(f"Initialized ArrayLSHBlocker with num_perm={self.num_perm}, threshold={self.threshold} "
+              f"({self.bands} bands x {self.rows_per_band} rows)")
+    
+    def hash_bands(self, signatures: np.ndarray) -> np.ndarray:
+        """
+        Hash every band of many signatures into 64-bit bucket keys.
+        
+        Args:
+            signatures: uint64 array of shape (num_products, num_perm)
+        
+        Returns:
+            uint64 array of shape (bands, num_products)
+        """
+        keys = np.empty((self.bands, len(signatures)), dtype=np.uint64)
+        
+        for band, (start, end) in enumerate(self.hashranges):
+            key = np.full(len(signatures), band, dtype=np.uint64)
+            for column in range(start, end):
+                key ^= signatures[:, column]
+                key *= _BAND_MULTIPLIER
+            
+            # Finalize so every band value affects every key bit
+            key ^= key >> np.uint64(33)
+            key *= _FMIX_MULTIPLIERS[0]
+            key ^= key >> np.uint64(33)
+            key *= _FMIX_MULTIPLIERS[1]
+            key ^= key >> np.uint64(33)
+            keys[band] = key
+        
+        return keys
+    
+    def build_index(self, products: List[Dict], signatures: np.ndarray = None) -> None:
+        """
+        Build the index from a list of products, replacing any previous index.
+        
+        Args:
+            products: List of product dictionaries
+            signatures: Optional precomputed signature matrix aligned with products,
+                e.g. np.load(path, mmap_mode='c') of a previous run
+        """
+        print(f"\nBuilding array LSH index for {len(products)} products...")
+        start_time = time.time()
+        
+        product_ids = [p['productID'] for p in products]
+        if len(set(product_ids)) != len(product_ids):
+            raise ValueError("The given key already exists")
+        
+        if signatures is not None and signatures.shape != (len(products), self.num_perm):
+            raise ValueError(f"Signature matrix shape {signatures.shape} does not match "
+                             f"({len(products)}, {self.num_perm})")
+        
+        if signatures is None:
+            signatures = self._compute_signature_matrix([p['productName'] for p in products])
+        
+        self.products = dict(zip(product_ids, products))
+        self.product_ids = product_ids
+        self.id_to_row = {pid: row for row, pid in enumerate(product_ids)}
+        self.signatures = signatures
+        self._set_store_codes()
+        self._statistics = None
+        
+        self._build_buckets()
+        
+        elapsed_time = time.time() - start_time
+        print(f"✓ Index built in {elapsed_time:.2f} seconds")
+        print(f"  Average: {elapsed_time/max(len(products), 1)*1000:.2f} ms per product")
+    
+    def _build_buckets(self) -> None:
+        """Hash and sort the band buckets of the current signature matrix."""
+        num_products = len(self.signatures)
+        
+        # Band keys are hashed in chunks so memory-mapped signatures are streamed
+        band_keys = np.empty((self.bands, num_products), dtype=np.uint64)
+        for start in range(0, num_products, config.ARRAY_LSH_CHUNK_SIZE):
+            end = min(start + config.ARRAY_LSH_CHUNK_SIZE, num_products)
+            band_keys[:, start:end] = self.hash_bands(np.asarray(self.signatures[start:end]))
+        
+        # Sort each band in place so equal keys form contiguous buckets
+        self.band_rows = np.empty(band_keys.shape, dtype=np.int32)
+        self.band_positions = np.empty(band_keys.shape, dtype=np.int32)
+        positions = np.arange(num_products, dtype=np.int32)
+        
+        for band in range(self.bands):
+            order = np.argsort(band_keys[band], kind='stable')
+            band_keys[band] = band_keys[band][order]
+            self.band_rows[band] = order
+            self.band_positions[band, order] = positions
+        
+        self.band_keys = band_keys
+    
+    def _index_positions(self) -> None:
+        """Record the sorted position of every row in each band."""
+        self.band_positions = np.empty((self.bands, len(self.product_ids)), dtype=np.int32)
+        positions = np.broadcast_to(np.arange(self.band_rows.shape[1], dtype=np.int32), self.band_rows.shape)
+        np.put_along_axis(self.band_positions, self.band_rows, positions, axis=1)
+    
+    def _insert_signatures(self, rows: np.ndarray, signatures: np.ndarray) -> None:
+        """
+        Merge rows into the sorted band buckets.
+        Only the new rows are hashed; each band is merged with one searchsorted and insert.
+        
+        Args:
+            rows: Rows of the product table, already registered in product_ids
+            signatures: uint64 array of shape (len(rows), num_perm)
+        """
+        if self.band_keys.shape[1] == 0 and len(rows) == len(self.signatures):
+            # Filling an empty index: hash the whole matrix in streamed chunks
+            self._build_buckets()
+            return
+        
+        keys = self.hash_bands(np.asarray(signatures))
+        size = self.band_keys.shape[1] + len(rows)
+        band_keys = np.empty((self.bands, size), dtype=np.uint64)
+        band_rows = np.empty((self.bands, size), dtype=np.int32)
+        
+        for band in range(self.bands):
+            order = np.argsort(keys[band], kind='stable')
+            new_keys = keys[band][order]
+            positions = self.band_keys[band].searchsorted(new_keys, side='right')
+            band_keys[band] = np.insert(self.band_keys[band], positions, new_keys)
+            band_rows[band] = np.insert(self.band_rows[band], positions, rows[order])
+        
+        self.band_keys = band_keys
+        self.band_rows = band_rows
+        self._index_positions()
+    
+    def _remove_signatures(self, rows: np.ndarray) -> None:
+        """
+        Delete rows from the sorted band buckets by mask.
+        
+        Args:
+            rows: Rows of the product table
+        """
+        keep = np.ones(self.band_keys.shape, dtype=bool)
+        np.put_along_axis(keep, self.band_positions[:, rows], False, axis=1)
+        
+        size = self.band_keys.shape[1] - len(rows)
+        self.band_keys = self.band_keys[keep].reshape(self.bands, size)
+        self.band_rows = self.band_rows[keep].reshape(self.bands, size)
+        self._index_positions()
+    
+    def _drop_rows(self, keep: np.ndarray) -> None:
+        """
+        Compact the signature matrix and renumber the rows held in the band buckets.
+        
+        Args:
+            keep: Boolean mask over the current rows
+        """
+        super()._drop_rows(keep)
+        
+        new_rows = (np.cumsum(keep) - 1).astype(np.int32)
+        self.band_rows = new_rows[self.band_rows]
+        self._index_positions()
+    
+    def load_snapshot(self, path: str, mmap_mode: str = 'c') -> int:
+        """
+        Load a snapshot written by save_snapshot(), memory-mapping the signatures.
+        
+        Args:
+            path: Snapshot directory
+            mmap_mode: numpy mmap mode for the signature matrix (default: copy-on-write)
+            
+        Returns:
+            Number of products loaded
+        """
+        return super().load_snapshot(path, mmap_mode=mmap_mode)
+    
+    def _compute_signature_matrix(self, product_names: List[str]) -> np.ndarray:
+        """
+        Compute signatures chunk by chunk into memory or a memory-mapped file.
+        
+        Args:
+            product_names: List of product name strings
+        
+        Returns:
+            uint64 array (or copy-on-write memmap) of shape (len(product_names), num_perm)
+        """
+        shape = (len(product_names), self.num_perm)
+        
+        if self.signature_path:
+            signatures = np.lib.format.open_memmap(self.signature_path, mode='w+', dtype=np.uint64, shape=shape)
+        else:
+            signatures = np.empty(shape, dtype=np.uint64)
+        
+        if self.build_workers != 1 and len(product_names) > config.PARALLEL_SHARD_SIZE:
+            # Worker shards are written straight into the (memory-mapped) matrix
+            from parallel_build import parallel_signatures
+            parallel_signatures(product_names, self.num_perm, self.build_workers, out=signatures,
+                                n_gram_size=self.n_gram_size)
+        else:
+            for start in range(0, len(product_names), config.ARRAY_LSH_CHUNK_SIZE):
+                end = min(start + config.ARRAY_LSH_CHUNK_SIZE, len(product_names))
+                signatures[start:end] = self.compute_signatures(product_names[start:end])
+        
+        if self.signature_path:
+            signatures.flush()
+            del signatures
+            # Copy-on-write, as in load_snapshot(): renames update rows in memory only
+            return np.load(self.signature_path, mmap_mode='c')
+        
+        return signatures
+    
+    def query_rows(self, row: int) -> np.ndarray:
+        """
+        Find the rows sharing at least one band bucket with a row.
+        
+        Args:
+            row: Row of the query product in the signature matrix
+        
+        Returns:
+            Sorted int array of candidate rows (including the row itself)
+        """
+        positions = self.band_positions[:, row]
+        buckets = []
+        
+        for band, keys in enumerate(self.band_keys):
+            key = keys[positions[band]]
+            start = keys.searchsorted(key, side='left')
+            end = keys.searchsorted(key, side='right')
+            buckets.append(self.band_rows[band, start:end])
+        
+        return np.unique(np.concatenate(buckets))
+    
+    def bucket_summary(self, top: int = 5) -> Tuple[np.ndarray, List[Tuple[int, int, List[int]]]]:
+        """
+        Get the sizes of all band buckets and the largest buckets.
+        
+        Args:
+            top: Number of largest buckets to return
+            
+        Returns:
+            Tuple of (array of bucket sizes over all bands,
+            list of (size, band, member rows) for the largest buckets, largest first)
+        """
+        sizes = []
+        largest = []
+        
+        for band, keys in enumerate(self.band_keys):
+            if len(keys) == 0:
+                continue
+            
+            # Buckets are runs of equal keys in the sorted array
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            band_sizes = np.diff(np.r_[starts, len(keys)])
+            sizes.append(band_sizes)
+            
+            biggest = int(np.argmax(band_sizes))
+            largest.append((int(band_sizes[biggest]), band, int(starts[biggest])))
+        
+        largest = heapq.nlargest(top, largest, key=lambda bucket: (bucket[0], -bucket[1]))
+        largest = [
+            (size, band, self.band_rows[band, start:start + size].tolist())
+            for size, band, start in largest
+        ]
+        
+        return (np.concatenate(sizes) if sizes else np.empty(0, dtype=np.int64)), largest
+    
+    def memory_usage(self) -> Dict:
+        """
+        Get the size of the index arrays in bytes.
+        
+        Returns:
+            Dictionary with byte counts (memory-mapped signatures are reported separately)
+        """
+        memory_mapped = isinstance(self.signatures, np.memmap)
+        buckets = self.band_keys.nbytes + self.band_rows.nbytes + self.band_positions.nbytes
+        
+        return {
+            'bucket_bytes': buckets,
+            'signature_bytes': 0 if memory_mapped else self.signatures.nbytes,
+            'memory_mapped_bytes': self.signatures.nbytes if memory_mapped else 0,
+            'bytes_per_product': (buckets + (0 if memory_mapped else self.signatures.nbytes)) / max(len(self.product_ids), 1)
+        }
+
+
+if __name__ == "__main__":
+    # Test the blocker with sample data
+    sample_products = [
+        {
+            'productID': '1',
+            'productName': 'National Banana Jelly 80gm',
+            'availableAt': 'Rahim Store',
+            'originalPrice': 170
+        },
+        {
+            'productID': '2',
+            'productName': 'National Banana Jelly 80gm',
+            'availableAt': 'Metro',
+            'originalPrice': 165
+        },
+        {
+            'productID': '3',
+            'productName': 'National Strawberry Jelly 80gm',
+            'availableAt': 'Al-Fatah',
+            'originalPrice': 175
+        },
+        {
+            'productID': '4',
+            'productName': 'Nestle KitKat 500ml',
+            'availableAt': 'Raja Sahib',
+            'originalPrice': 200
+        }
+    ]
+    
+    blocker = ArrayLSHBlocker()
+    blocker.build_index(sample_products)
+    
+    print("\nQuerying candidates for 'National Banana Jelly 80gm' (Rahim Store):")
+    for candidate in blocker.query_candidates('1'):
+        print(f"  - {candidate['productName']} at {candidate['availableAt']}")
+    
+    print("\nBlocking Statistics:")
+    for key, value in blocker.get_statistics().items():
+        print(f"  {key}: {value}")
+    
+    print("\nIndex Memory:")
+    for key, value in blocker.memory_usage().items():
+        print(f"  {key}: {value}")
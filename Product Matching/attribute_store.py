@@ -0,0 +1,257 @@
+"""
+Shared product attribute store.
+Parses each product name once per run and serves the attributes to every stage.
+"""
+from typing import List, Dict, Optional
+from collections import OrderedDict
+import json
+import os
+import time
+import numpy as np
+import config
+from preprocessing import extract_product_attributes, extract_attributes_batch, PARSER_VERSION
+
+
+class ProductAttributeStore:
+    """
+    Memoized product attributes keyed by productID.
+    Catalog products are parsed in bulk, other names go through a bounded LRU cache.
+    """
+    
+    STORE_VERSION = 3
+    
+    def __init__(self, cache_size: int = None, path: str = None, build_workers: int = None):
+        """
+        Initialize the attribute store.
+        
+        Args:
+            cache_size: Maximum entries in the on-demand LRU cache (default: from config)
+            path: Optional JSON file used to persist attributes between runs
+            build_workers: Processes used to parse large catalogs, 0 for all cores (default: from config)
+        """
+        self.cache_size = cache_size or config.ATTRIBUTE_CACHE_SIZE
+        self.path = path
+        self.build_workers = config.BUILD_WORKERS if build_workers is None else build_workers
+        
+        self.attributes = {}  # productID -> attribute dict
+        self.cache = OrderedDict()  # productName -> attribute dict (LRU order)
+        
+        self.hits = 0
+        self.misses = 0
+    
+    def build(self, products: List[Dict], prune: bool = True) -> None:
+        """
+        Parse attributes for all products not already in the store.
+        Products whose name changed since they were parsed are parsed again.
+        
+        Args:
+            products: List of product dictionaries
+            prune: Drop stored products that are not in the list (pass False
+                when building only part of the catalog)
+        """
+        if self.path and not self.attributes and os.path.exists(self.path):
+            self.load()
+        
+        removed = 0
+        if prune:
+            current_ids = {p['productID'] for p in products}
+            for product_id in [pid for pid in self.attributes if pid not in current_ids]:
+                del self.attributes[product_id]
+                removed += 1
+        
+        pending = [
+            p for p in products
+            if self._stored(p['productID'], p['productName']) is None
+        ]
+        
+        if not pending:
+            if removed and self.path:
+                self.save()
+            return
+        
+        print(f"\nParsing attributes for {len(pending)} products...")
+        start_time = time.time()
+        
+        product_names = [p['productName'] for p in pending]
+        if self.build_workers != 1 and len(pending) > config.PARALLEL_SHARD_SIZE:
+            from parallel_build import parallel_attributes
+            columns = parallel_attributes(product_names, self.build_workers)
+        else:
+            columns = extract_attributes_batch(product_names)
+        
+        for i, product in enumerate(pending):
+            size = columns['size'][i]
+            self.attributes[product['productID']] = {
+                'brand': columns['brand'][i],
+                'product_type': columns['product_type'][i],
+                'size': None if np.isnan(size) else float(size),
+                'unit': columns['unit'][i],
+                'original_name': product['productName']
+            }
+        
+        elapsed_time = time.time() - start_time
+        print(f"  Attributes parsed in {elapsed_time:.2f} seconds")
+        
+        if self.path:
+            self.save()
+    
+    def get(self, product: Dict) -> Dict:
+        """
+        Get attributes for a product.
+        The returned dictionary is shared and must not be modified.
+        
+        Args:
+            product: Product dictionary
+        
+        Returns:
+            Dictionary with brand, product_type, size, unit, and original_name
+        """
+        attrs = self._stored(product.get('productID'), product['productName'])
+        
+        if attrs is not None:
+            self.hits += 1
+            return attrs
+        
+        return self.get_by_name(product['productName'])
+    
+    def get_by_name(self, product_name: str) -> Dict:
+        """
+        Get attributes for a product name that is not part of the catalog.
+        
+        Args:
+            product_name: Product name string
+        
+        Returns:
+            Dictionary with brand, product_type, size, unit, and original_name
+        """
+        attrs = self.cache.get(product_name)
+        
+        if attrs is not None:
+            self.hits += 1
+            self.cache.move_to_end(product_name)
+            return attrs
+        
+        self.misses += 1
+        attrs = extract_product_attributes(product_name)
+        
+        self.cache[product_name] = attrs
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        
+        return attrs
+    
+    def _stored(self, product_id: Optional[str], product_name: str) -> Optional[Dict]:
+        """Return stored catalog attributes if they were parsed from the same name."""
+        attrs = self.attributes.get(product_id)
+        
+        if attrs is not None and attrs['original_name'] == product_name:
+            return attrs
+        
+        return None
+    
+    def save(self, path: str = None) -> None:
+        """
+        Persist catalog attributes to disk.
+        
+        Args:
+            path: Output JSON path (default: the store path)
+        """
+        path = path or self.path
+        
+        entries = {
+            product_id: [
+                attrs['original_name'], attrs['brand'], attrs['product_type'],
+                attrs['size'], attrs['unit']
+            ]
+            for product_id, attrs in self.attributes.items()
+        }
+        
+        # Write a temporary file and swap it in, so an interrupted save keeps the old store
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': [self.STORE_VERSION, PARSER_VERSION],
+                'attributes': entries
+            }, f)
+        os.replace(path + '.tmp', path)
+    
+    def load(self, path: str = None) -> int:
+        """
+        Load catalog attributes persisted by save().
+        Unreadable files and files written by a different store version or parser are ignored.
+        
+        Args:
+            path: Input JSON path (default: the store path)
+        
+        Returns:
+            Number of products loaded
+        """
+        path = path or self.path
+        
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except ValueError as e:
+            print(f"Ignoring attribute store {path}: {e}")
+            return 0
+        
+        if data.get('version') != [self.STORE_VERSION, PARSER_VERSION]:
+            print(f"Ignoring attribute store {path}: version {data.get('version')}")
+            return 0
+        
+        for product_id, (name, brand, product_type, size, unit) in data['attributes'].items():
+            self.attributes[product_id] = {
+                'brand': brand,
+                'product_type': product_type,
+                'size': size,
+                'unit': unit,
+                'original_name': name
+            }
+        
+        print(f"Loaded attributes for {len(data['attributes'])} products from {path}")
+        return len(data['attributes'])
+    
+    def get_statistics(self) -> Dict:
+        """
+        Get attribute store statistics.
+        
+        Returns:
+            Dictionary with statistics
+        """
+        lookups = self.hits + self.misses
+        
+        return {
+            'catalog_products': len(self.attributes),
+            'cached_names': len(self.cache),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / lookups * 100) if lookups > 0 else 0
+        }
+
+
+if __name__ == "__main__":
+    sample_products = [
+        {
+            'productID': '1',
+            'productName': 'National Banana Jelly 80gm',
+            'availableAt': 'Rahim Store',
+            'originalPrice': 170
+        },
+        {
+            'productID': '2',
+            'productName': 'National Banana Jelly 160gm',
+            'availableAt': 'Metro',
+            'originalPrice': 320
+        }
+    ]
+    
+    store = ProductAttributeStore()
+    store.build(sample_products)
+    
+    for product in sample_products:
+        print(f"{product['productName']}: {store.get(product)}")
+    
+    print(f"Ad-hoc: {store.get_by_name('Nestle KitKat 500ml')}")
+    
+    print("\nAttribute Store Statistics:")
+    for key, value in store.get_statistics().items():
+        print(f"  {key}: {value}")
@@ -0,0 +1,116 @@
+"""
+Benchmark blocked vs. blocking-free matching.
+
+Builds the matcher once, then runs the same sample of queries in both modes
+for every blocking engine and reports blocker build time, query time and how
+many of the blocking-free semantic matches the blocked mode still finds.
+"""
+
+import random
+import time
+from typing import Dict, List
+from data_loader import ProductDataLoader
+from product_matcher import ProductMatcher
+
+
+def run_queries(matcher: ProductMatcher, product_ids: List[str], blocked: bool) -> Dict:
+    """
+    Run match queries for a sample of products in one mode.
+    
+    Args:
+        matcher: Built product matcher
+        product_ids: Product IDs to query
+        blocked: Whether to restrict semantic matching to LSH candidates
+    
+    Returns:
+        Dictionary with elapsed time and semantic match IDs per product
+    """
+    semantic = {}
+    
+    start_time = time.time()
+    for product_id in product_ids:
+        matches = matcher.find_all_matches(product_id, blocked=blocked)
+        semantic[product_id] = {m['product']['productID'] for m in matches['semantic_matches']}
+    elapsed_time = time.time() - start_time
+    
+    return {'elapsed_time': elapsed_time, 'semantic': semantic}
+
+
+def benchmark(matcher: ProductMatcher, sample_size: int = 500, seed: int = 42) -> Dict:
+    """
+    Compare blocked and blocking-free matching on a random sample of products.
+    
+    Args:
+        matcher: Built product matcher
+        sample_size: Number of products to query
+        seed: Random seed for the sample
+    
+    Returns:
+        Dictionary with timings, speedup, and semantic match recall
+    """
+    product_ids = list(matcher.products)
+    random.Random(seed).shuffle(product_ids)
+    product_ids = product_ids[:sample_size]
+    
+    full = run_queries(matcher, product_ids, blocked=False)
+    blocked = run_queries(matcher, product_ids, blocked=True)
+    
+    reference_matches = sum(len(full['semantic'][pid]) for pid in product_ids)
+    recovered_matches = sum(len(full['semantic'][pid] & blocked['semantic'][pid]) for pid in product_ids)
+    extra_matches = sum(len(blocked['semantic'][pid] - full['semantic'][pid]) for pid in product_ids)
+    
+    return {
+        'sample_size': len(product_ids),
+        'full_ms_per_query': full['elapsed_time'] / max(len(product_ids), 1) * 1000,
+        'blocked_ms_per_query': blocked['elapsed_time'] / max(len(product_ids), 1) * 1000,
+        'speedup': full['elapsed_time'] / blocked['elapsed_time'] if blocked['elapsed_time'] > 0 else 0,
+        'full_semantic_matches': reference_matches,
+        'blocked_semantic_matches': recovered_matches + extra_matches,
+        'semantic_recall': (recovered_matches / reference_matches * 100) if reference_matches > 0 else 100,
+        'matches_beyond_full_top_k': extra_matches
+    }
+
+
+def main():
+    """Main execution function."""
+    print("=" * 80)
+    print("BLOCKED VS. BLOCKING-FREE MATCHING BENCHMARK")
+    print("=" * 80)
+    
+    SAMPLE_SIZE = 500
+    BLOCKING_ENGINES = ('datasketch', 'array', 'sorted')
+    
+    loader = ProductDataLoader()
+    products = loader.load_products_from_stores()
+    print(f"\nLoaded {len(products):,} products")
+    
+    matcher = ProductMatcher()
+    matcher.build_index(products)
+    
+    all_results = {}
+    for engine in BLOCKING_ENGINES:
+        matcher.set_blocking_engine(engine)
+        
+        start_time = time.time()
+        matcher.build_blocker()
+        build_time = time.time() - start_time
+        
+        all_results[engine] = {'blocker_build_time': build_time, **benchmark(matcher, sample_size=SAMPLE_SIZE)}
+    
+    for engine, results in all_results.items():
+        print("\n" + "=" * 80)
+        print(f"RESULTS: {engine}")
+        print("=" * 80)
+        for key, value in results.items():
+            if isinstance(value, float):
+                print(f"  {key}: {value:.2f}")
+            else:
+                print(f"  {key}: {value}")
+    
+    loader.close()
+    
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -1,97 +1,329 @@
 """
 MinHash LSH-based blocking system for efficient product candidate generation.
 """
-from datasketch import MinHash, MinHashLSH
-from typing import List, Dict, Tuple, Set
+from abc import ABC, abstractmethod
+from datasketch import MinHashLSH
+from typing import Iterable, Iterator, List, Dict, Tuple, Set
+import heapq
+import json
+import os
 import time
+import numpy as np
 import config
-from preprocessing import clean_product_name, generate_ngrams
+from preprocessing import clean_product_name, generate_ngram_hashes, generate_ngram_hashes_batch
+from snapshot_store import generation_file, new_generation, publish, read_manifest
 
 
-class ProductBlocker:
+# MinHash permutation constants (same universal hashing scheme as datasketch)
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def minhash_permutations(num_perm: int, seed: int = 1) -> Tuple[np.ndarray, np.ndarray]:
     """
-    MinHash LSH-based blocking system for product matching.
-    Reduces comparison space from O(n²) to O(n) by grouping similar products.
+    Generate the random permutation parameters (a, b) for MinHash.
+    
+    Args:
+        num_perm: Number of permutations
+        seed: Random seed
+        
+    Returns:
+        Tuple of (a, b) uint64 arrays of length num_perm
+    """
+    generator = np.random.RandomState(seed)
+    a, b = np.array([
+        (generator.randint(1, MERSENNE_PRIME, dtype=np.uint64),
+         generator.randint(0, MERSENNE_PRIME, dtype=np.uint64))
+        for _ in range(num_perm)
+    ], dtype=np.uint64).T
+    return a, b
+
+
+def minhash_signatures(product_names: List[str], permutations: Tuple[np.ndarray, np.ndarray],
+                       n_gram_size: int = None) -> np.ndarray:
+    """
+    Compute MinHash signatures for many products at once.
+    N-grams are hashed in one pass and permutations are applied in batches.
+    
+    Args:
+        product_names: List of product name strings
+        permutations: Permutation parameters (a, b) from minhash_permutations()
+        n_gram_size: Character n-gram size (default: from config)
+        
+    Returns:
+        uint64 array of shape (len(product_names), num_perm)
+    """
+    cleaned_names = [clean_product_name(name) for name in product_names]
+    ngram_hashes, offsets = generate_ngram_hashes_batch(cleaned_names, n_gram_size)
+    
+    # Permutations x products layout keeps the per-product minimum contiguous
+    a, b = permutations
+    signatures = np.full((len(a), len(product_names)), MAX_HASH, dtype=np.uint64)
+    a = a[:, np.newaxis]
+    b = b[:, np.newaxis]
+    
+    for start in range(0, len(product_names), config.SIGNATURE_BATCH_SIZE):
+        end = min(start + config.SIGNATURE_BATCH_SIZE, len(product_names))
+        
+        # Products without n-grams keep the empty signature
+        non_empty = np.diff(offsets[start:end + 1]) > 0
+        if not non_empty.any():
+            continue
+        
+        batch_hashes = ngram_hashes[offsets[start]:offsets[end]].astype(np.uint64)
+        
+        # (a * h + b) mod (2^61 - 1) using shifts instead of division
+        permuted = a * batch_hashes
+        permuted += b
+        reduced = permuted & MERSENNE_PRIME
+        permuted >>= np.uint64(61)
+        reduced += permuted
+        reduced[reduced >= MERSENNE_PRIME] -= MERSENNE_PRIME
+        reduced &= MAX_HASH
+        
+        # Minimum over each product's n-gram columns
+        segment_starts = offsets[start:end][non_empty] - offsets[start]
+        columns = start + np.flatnonzero(non_empty)
+        signatures[:, columns] = np.minimum.reduceat(reduced, segment_starts, axis=1)
+    
+    return np.ascontiguousarray(signatures.T)
+
+
+class MinHashSignature:
+    """
+    Lean MinHash signature: only the hash values, as read by MinHashLSH.
+    """
+    
+    __slots__ = ('hashvalues',)
+    
+    def __init__(self, hashvalues: np.ndarray):
+        self.hashvalues = hashvalues
+    
+    def __len__(self) -> int:
+        return len(self.hashvalues)
+    
+    def jaccard(self, other: 'MinHashSignature') -> float:
+        """Estimate Jaccard similarity with another signature."""
+        return float(np.count_nonzero(self.hashvalues == other.hashvalues)) / len(self.hashvalues)
+
+
+class CandidateBlocker(ABC):
+    """
+    Common interface of the blocking engines.
+    Subclasses maintain the index (build_index, upsert_products, remove_products)
+    and answer row queries (query_rows, _rank_rows, bucket_summary); candidate
+    lookups, pair streaming and statistics are shared.
     """
     
-    def __init__(self, num_perm: int = None, threshold: float = None):
+    def __init__(self, cross_store_only: bool = None, ranked: bool = None):
         """
-        Initialize the product blocker.
+        Initialize the shared blocker state.
         
         Args:
-            num_perm: Number of permutations for MinHash (default: from config)
-            threshold: Jaccard similarity threshold (default: from config)
+            cross_store_only: Only pair products from different stores (default: from config)
+            ranked: Keep the most similar candidates when truncating (default: from config)
         """
-        self.num_perm = num_perm or config.LSH_NUM_PERM
-        self.threshold = threshold or config.LSH_THRESHOLD
-        
-        # Initialize LSH index
-        self.lsh = MinHashLSH(threshold=self.threshold, num_perm=self.num_perm)
+        self.cross_store_only = config.CROSS_STORE_ONLY if cross_store_only is None else cross_store_only
+        self.ranked = config.RANKED_CANDIDATES if ranked is None else ranked
         
         # Store product metadata for quick lookup
         self.products = {}  # productID -> product dict
-        self.minhashes = {}  # productID -> MinHash object
+        self.product_ids = []  # row -> productID
+        self.id_to_row = {}  # productID -> row
         
-        print(f"Initialized ProductBlocker with num_perm={self.num_perm}, threshold={self.threshold}")
+        # Store of each row as an integer code, for cross-store filtering without dict lookups
+        self.store_names = {}  # availableAt -> store code
+        self.store_codes = np.empty(0, dtype=np.int32)  # row -> store code
+        
+        # Statistics of the last full candidate pass (cleared when the index changes)
+        self._statistics = None
     
-    def create_minhash(self, product_name: str) -> MinHash:
+    @abstractmethod
+    def build_index(self, products: List[Dict]) -> None:
         """
-        Create MinHash signature from product name.
+        Build the index from a list of products, replacing any previous index.
         
         Args:
-            product_name: Product name string
+            products: List of product dictionaries
+        """
+    
+    @abstractmethod
+    def upsert_products(self, products: List[Dict]) -> Dict:
+        """
+        Add new products and update existing ones.
+        
+        Args:
+            products: List of product dictionaries
             
         Returns:
-            MinHash object
+            Dictionary with counts of added, updated, and unchanged products
         """
-        # Clean product name
-        cleaned_name = clean_product_name(product_name)
+    
+    @abstractmethod
+    def remove_products(self, product_ids: Iterable[str]) -> int:
+        """
+        Remove products from the index.
+        
+        Args:
+            product_ids: Product IDs to remove (unknown IDs are ignored)
+            
+        Returns:
+            Number of products removed
+        """
+    
+    @abstractmethod
+    def query_rows(self, row: int) -> np.ndarray:
+        """
+        Find the candidate rows of a row.
         
-        # Generate n-grams
-        ngrams = generate_ngrams(cleaned_name)
+        Args:
+            row: Row of the query product
+            
+        Returns:
+            int array of candidate rows (including the row itself)
+        """
+    
+    @abstractmethod
+    def _rank_rows(self, row: int, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rank candidate rows by similarity to a row.
         
-        # Create MinHash
-        minhash = MinHash(num_perm=self.num_perm)
-        for ngram in ngrams:
-            minhash.update(ngram.encode('utf-8'))
+        Args:
+            row: Row of the query product
+            rows: Candidate rows
+            k: Number of candidates to keep
+            
+        Returns:
+            Tuple of (top-k candidate rows, their scores), most similar first
+        """
+    
+    @abstractmethod
+    def bucket_summary(self, top: int = 5) -> Tuple[np.ndarray, List[Tuple[int, int, List[int]]]]:
+        """
+        Get the sizes of all blocks and the largest blocks.
         
-        return minhash
+        Args:
+            top: Number of largest blocks to return
+            
+        Returns:
+            Tuple of (array of block sizes,
+            list of (size, band or pass, member rows) for the largest blocks, largest first)
+        """
     
-    def build_index(self, products: List[Dict]) -> None:
+    def save_snapshot(self, path: str) -> None:
         """
-        Build LSH index from list of products.
+        Save the index to a snapshot directory.
+        Blockers without a snapshot format save nothing.
         
         Args:
-            products: List of product dictionaries
+            path: Snapshot directory
         """
-        print(f"\nBuilding LSH index for {len(products)} products...")
-        start_time = time.time()
+    
+    def load_snapshot(self, path: str, mmap_mode: str = None) -> int:
+        """
+        Load a snapshot into an empty blocker.
+        Blockers without a snapshot format load nothing, so callers rebuild the index.
         
-        for i, product in enumerate(products):
-            product_id = product['productID']
-            product_name = product['productName']
+        Args:
+            path: Snapshot directory
+            mmap_mode: Optional numpy mmap mode for memory-mapped arrays
             
-            # Create MinHash signature
-            minhash = self.create_minhash(product_name)
+        Returns:
+            Number of products loaded
+        """
+        return 0
+    
+    def sync_products(self, products: List[Dict]) -> Dict:
+        """
+        Bring the index in line with a full catalog: upsert every product
+        and remove indexed products that are no longer in the catalog.
+        
+        Args:
+            products: Complete list of product dictionaries
             
-            # Store product and minhash
-            self.products[product_id] = product
-            self.minhashes[product_id] = minhash
+        Returns:
+            Dictionary with counts of added, updated, unchanged, and removed products
+        """
+        current_ids = {p['productID'] for p in products}
+        removed = self.remove_products([pid for pid in self.product_ids if pid not in current_ids])
+        
+        stats = self.upsert_products(products)
+        stats['removed'] = removed
+        
+        return stats
+    
+    def _candidate_rows(self, row: int, max_candidates: int) -> Tuple[np.ndarray, bool]:
+        """
+        Get the candidate rows of a row as returned by query_candidates().
+        
+        Args:
+            row: Row of the query product
+            max_candidates: Maximum number of candidates to return
             
-            # Insert into LSH index
-            self.lsh.insert(product_id, minhash)
+        Returns:
+            Tuple of (int32 candidate rows, whether candidates were cut off by max_candidates)
+        """
+        rows = self.query_rows(row)
+        
+        # Remove self from candidates
+        rows = rows[rows != row]
+        
+        if self.cross_store_only:
+            rows = self._other_stores(row, rows)
+        
+        if self.ranked:
+            return self._rank_rows(row, rows, max_candidates)[0], len(rows) > max_candidates
+        
+        return rows[:max_candidates], len(rows) > max_candidates
+    
+    def _set_store_codes(self, rows: np.ndarray = None) -> None:
+        """
+        Refresh the store codes of rows from their product dictionaries.
+        Rows beyond the end of the code array are appended.
+        
+        Args:
+            rows: Rows whose products were added or replaced (default: all rows)
+        """
+        if rows is None:
+            rows = np.arange(len(self.product_ids), dtype=np.int32)
+            self.store_codes = np.empty(len(self.product_ids), dtype=np.int32)
+        elif len(self.store_codes) < len(self.product_ids):
+            missing = len(self.product_ids) - len(self.store_codes)
+            self.store_codes = np.concatenate([self.store_codes, np.empty(missing, dtype=np.int32)])
+        
+        stores = [self.products[self.product_ids[r]].get('availableAt') for r in rows.tolist()]
+        self.store_codes[rows] = [self.store_names.setdefault(store, len(self.store_names)) for store in stores]
+    
+    def _other_stores(self, row: int, rows: np.ndarray) -> np.ndarray:
+        """
+        Keep only candidate rows available at a different store than the query row.
+        
+        Args:
+            row: Row of the query product
+            rows: Candidate rows
             
-            # Progress indicator
-            if (i + 1) % 1000 == 0:
-                print(f"  Processed {i + 1}/{len(products)} products...")
+        Returns:
+            Filtered candidate rows
+        """
+        return rows[self.store_codes[rows] != self.store_codes[row]]
+    
+    def products_at(self, rows: Iterable[int]) -> List[Dict]:
+        """
+        Look up products by row of the product table.
         
-        elapsed_time = time.time() - start_time
-        print(f"✓ Index built in {elapsed_time:.2f} seconds")
-        print(f"  Average: {elapsed_time/len(products)*1000:.2f} ms per product")
+        Args:
+            rows: Rows of the product table (product_ids)
+            
+        Returns:
+            List of product dictionaries
+        """
+        return [self.products[self.product_ids[r]] for r in rows]
     
     def query_candidates(self, product_id: str, max_candidates: int = 200) -> List[Dict]:
         """
         Find candidate products similar to the given product.
+        In ranked mode the most similar candidates are kept, most similar first.
+        In cross-store mode only products from other stores are returned.
         
         Args:
             product_id: Product ID to query
@@ -100,27 +332,106 @@ class ProductBlocker:
         Returns:
             List of candidate product dictionaries
         """
-        if product_id not in self.minhashes:
+        row = self.id_to_row.get(product_id)
+        if row is None:
             return []
         
-        # Query LSH index
-        minhash = self.minhashes[product_id]
-        candidate_ids = self.lsh.query(minhash)
+        rows, _ = self._candidate_rows(row, max_candidates)
         
-        # Remove self from candidates
-        candidate_ids = [cid for cid in candidate_ids if cid != product_id]
+        return self.products_at(rows)
+    
+    def query_top_k(self, product_id: str, k: int = 20) -> List[Tuple[Dict, float]]:
+        """
+        Find the k LSH candidates most similar to the given product.
+        
+        Args:
+            product_id: Product ID to query
+            k: Number of candidates to return
+            
+        Returns:
+            List of (candidate product, estimated Jaccard similarity) tuples, most similar first
+        """
+        row = self.id_to_row.get(product_id)
+        if row is None:
+            return []
+        
+        rows = self.query_rows(row)
+        rows = rows[rows != row]
         
-        # Limit number of candidates
-        candidate_ids = candidate_ids[:max_candidates]
+        if self.cross_store_only:
+            rows = self._other_stores(row, rows)
         
-        # Return candidate products
-        candidates = [self.products[cid] for cid in candidate_ids]
+        rows, similarities = self._rank_rows(row, rows, k)
         
-        return candidates
+        return list(zip(self.products_at(rows), similarities.tolist()))
+    
+    def iter_candidate_pairs(self, max_candidates_per_product: int = 200,
+                             chunk_size: int = None) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Stream all candidate pairs as chunks of row indices into the product table
+        (product_ids / products_at()). Each pair is yielded once.
+        A complete pass also records the statistics returned by get_statistics().
+        
+        Pairs are deduplicated by row order instead of a set of seen pairs: a pair
+        (i, j) with j < i was already emitted while querying j, unless j's own
+        candidate list was cut off by max_candidates_per_product. Only those
+        truncated lists are kept, so memory does not grow with the number of pairs.
+        
+        Args:
+            max_candidates_per_product: Maximum candidates per product
+            chunk_size: Approximate number of pairs per chunk (default: from config)
+            
+        Yields:
+            Tuples of (query_rows, candidate_rows) int32 arrays of equal length
+        """
+        chunk_size = chunk_size or config.PAIR_CHUNK_SIZE
+        
+        truncated_rows = {}  # row -> sorted candidate rows, only for cut-off queries
+        candidate_counts = np.zeros(len(self.product_ids), dtype=np.int32)
+        total_pairs = 0
+        left = []
+        right = []
+        pending = 0
+        
+        for row in range(len(self.product_ids)):
+            rows, truncated = self._candidate_rows(row, max_candidates_per_product)
+            candidate_counts[row] = len(rows)
+            if truncated:
+                truncated_rows[row] = np.sort(rows)
+            
+            keep = rows > row
+            if truncated_rows:
+                for i in np.flatnonzero(~keep):
+                    kept = truncated_rows.get(rows[i])
+                    if kept is not None:
+                        position = np.searchsorted(kept, row)
+                        keep[i] = position == len(kept) or kept[position] != row
+            
+            rows = rows[keep]
+            if len(rows) == 0:
+                continue
+            
+            left.append(np.full(len(rows), row, dtype=np.int32))
+            right.append(rows.astype(np.int32, copy=False))
+            pending += len(rows)
+            total_pairs += len(rows)
+            
+            if pending >= chunk_size:
+                yield np.concatenate(left), np.concatenate(right)
+                left, right, pending = [], [], 0
+        
+        if pending:
+            yield np.concatenate(left), np.concatenate(right)
+        
+        self._statistics = self._summarize(
+            candidate_counts, len(truncated_rows), total_pairs, max_candidates_per_product
+        )
     
     def get_all_candidate_pairs(self, max_candidates_per_product: int = 200) -> List[Tuple[Dict, Dict]]:
         """
         Generate all candidate pairs for matching.
+        In cross-store mode only pairs spanning two stores are generated.
+        Use iter_candidate_pairs() to stream pairs without materializing them.
         
         Args:
             max_candidates_per_product: Maximum candidates per product
@@ -132,53 +443,555 @@ class ProductBlocker:
         start_time = time.time()
         
         pairs = []
-        seen_pairs = set()  # To avoid duplicate pairs
         
-        for product_id in self.products:
-            candidates = self.query_candidates(product_id, max_candidates_per_product)
-            
-            for candidate in candidates:
-                # Create sorted pair to avoid duplicates (A,B) and (B,A)
-                pair_key = tuple(sorted([product_id, candidate['productID']]))
-                
-                if pair_key not in seen_pairs:
-                    seen_pairs.add(pair_key)
-                    pairs.append((self.products[product_id], candidate))
+        for query_rows, candidate_rows in self.iter_candidate_pairs(max_candidates_per_product):
+            pairs.extend(zip(self.products_at(query_rows), self.products_at(candidate_rows)))
         
         elapsed_time = time.time() - start_time
         print(f"Generated {len(pairs)} candidate pairs in {elapsed_time:.2f} seconds")
         
         return pairs
     
-    def get_statistics(self) -> Dict:
+    def _summarize(self, candidate_counts: np.ndarray, truncated_products: int,
+                   total_pairs: int, max_candidates: int) -> Dict:
         """
-        Get blocking statistics.
+        Build the blocking statistics from one candidate pass.
         
+        Args:
+            candidate_counts: Candidates returned per row
+            truncated_products: Number of rows whose candidates were cut off
+            total_pairs: Number of unique candidate pairs
+            max_candidates: Candidate limit used for the pass
+            
         Returns:
             Dictionary with statistics
         """
-        total_products = len(self.products)
+        total_products = len(self.product_ids)
         
-        # Calculate average candidates per product
-        total_candidates = 0
-        for product_id in self.products:
-            candidates = self.query_candidates(product_id)
-            total_candidates += len(candidates)
-        
-        avg_candidates = total_candidates / total_products if total_products > 0 else 0
+        avg_candidates = float(candidate_counts.mean()) if total_products > 0 else 0
         
         # Calculate reduction ratio
         total_possible_pairs = (total_products * (total_products - 1)) / 2
-        actual_pairs = total_candidates / 2  # Each pair counted twice
-        reduction_ratio = (1 - actual_pairs / total_possible_pairs) * 100 if total_possible_pairs > 0 else 0
+        reduction_ratio = (1 - total_pairs / total_possible_pairs) * 100 if total_possible_pairs > 0 else 0
+        
+        # Bucket size distribution over all bands
+        sizes, largest = self.bucket_summary()
+        edges = [1, 2, 3, 6, 11, 51, 201, np.inf]
+        labels = ['1', '2', '3-5', '6-10', '11-50', '51-200', '>200']
+        histogram, _ = np.histogram(sizes, bins=edges)
         
         return {
             'total_products': total_products,
             'avg_candidates_per_product': avg_candidates,
+            'max_candidates_per_product': int(candidate_counts.max()) if total_products > 0 else 0,
+            'truncated_products': truncated_products,
+            'candidate_limit': max_candidates,
             'total_possible_pairs': int(total_possible_pairs),
-            'actual_candidate_pairs': int(actual_pairs),
-            'reduction_ratio': reduction_ratio
+            'actual_candidate_pairs': total_pairs,
+            'reduction_ratio': reduction_ratio,
+            'total_buckets': len(sizes),
+            'bucket_size_distribution': dict(zip(labels, histogram.tolist())),
+            'largest_buckets': [
+                {
+                    'band': band,
+                    'size': size,
+                    'sample': [p['productName'] for p in self.products_at(rows[:3])]
+                }
+                for size, band, rows in largest
+            ]
         }
+    
+    def get_statistics(self) -> Dict:
+        """
+        Get blocking statistics.
+        Reuses the statistics of the last complete candidate pass; a pass is
+        only run if the index changed since.
+        
+        Returns:
+            Dictionary with statistics
+        """
+        if self._statistics is None:
+            for _ in self.iter_candidate_pairs():
+                pass
+        
+        return self._statistics
+
+
+class MinHashSignatureMixin(ABC):
+    """
+    Signature-matrix bookkeeping shared by the MinHash LSH engines.
+    Keeps one uint64 signature row per product and maintains it on upserts,
+    removals and snapshots; engines only store and query band buckets through
+    _insert_signatures() and _remove_signatures(). Combine with CandidateBlocker.
+    """
+    
+    SNAPSHOT_VERSION = 2  # 2: files in generation directories named by the manifest
+    
+    def __init__(self, num_perm: int = None, threshold: float = None, cross_store_only: bool = None,
+                 ranked: bool = None, build_workers: int = None, n_gram_size: int = None):
+        """
+        Initialize the signature parameters and the shared blocker state.
+        
+        Args:
+            num_perm: Number of permutations for MinHash (default: from config)
+            threshold: Jaccard similarity threshold (default: from config)
+            cross_store_only: Only pair products from different stores (default: from config)
+            ranked: Keep the most similar candidates when truncating (default: from config)
+            build_workers: Processes used to compute signatures, 0 for all cores (default: from config)
+            n_gram_size: Character n-gram size for shingling (default: from config)
+        """
+        super().__init__(cross_store_only, ranked)
+        
+        self.num_perm = num_perm or config.LSH_NUM_PERM
+        self.threshold = threshold or config.LSH_THRESHOLD
+        self.build_workers = config.BUILD_WORKERS if build_workers is None else build_workers
+        self.n_gram_size = n_gram_size or config.N_GRAM_SIZE
+        
+        # MinHash permutation parameters
+        self.permutations = minhash_permutations(self.num_perm)
+        
+        self.signatures = np.empty((0, self.num_perm), dtype=np.uint64)  # row -> MinHash values
+    
+    @abstractmethod
+    def _insert_signatures(self, rows: np.ndarray, signatures: np.ndarray) -> None:
+        """
+        Add rows to the band buckets.
+        
+        Args:
+            rows: Rows of the product table, already registered in product_ids
+            signatures: uint64 array of shape (len(rows), num_perm)
+        """
+    
+    @abstractmethod
+    def _remove_signatures(self, rows: np.ndarray) -> None:
+        """
+        Remove rows from the band buckets (the rows themselves stay in the product table).
+        
+        Args:
+            rows: Rows of the product table
+        """
+    
+    def create_minhash(self, product_name: str) -> MinHashSignature:
+        """
+        Create MinHash signature from product name.
+        
+        Args:
+            product_name: Product name string
+            
+        Returns:
+            MinHashSignature object
+        """
+        # Clean product name
+        cleaned_name = clean_product_name(product_name)
+        
+        # Generate hashed n-grams
+        ngram_hashes = generate_ngram_hashes(cleaned_name, self.n_gram_size)
+        
+        # Create MinHash
+        return MinHashSignature(self.compute_signature(ngram_hashes))
+    
+    def compute_signature(self, ngram_hashes: np.ndarray) -> np.ndarray:
+        """
+        Compute MinHash values for a set of n-gram hashes with vectorized permutations.
+        
+        Args:
+            ngram_hashes: Array of n-gram hashes
+            
+        Returns:
+            uint64 array of num_perm hash values
+        """
+        if len(ngram_hashes) == 0:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        
+        a, b = self.permutations
+        
+        # (num_ngrams, num_perm) permuted hashes, minimum over n-grams
+        permuted = (ngram_hashes.astype(np.uint64)[:, np.newaxis] * a + b) % MERSENNE_PRIME
+        return np.bitwise_and(permuted, MAX_HASH).min(axis=0)
+    
+    def compute_signatures(self, product_names: List[str]) -> np.ndarray:
+        """
+        Compute MinHash signatures for many products at once.
+        Large catalogs are sharded across worker processes when build_workers > 1.
+        
+        Args:
+            product_names: List of product name strings
+            
+        Returns:
+            uint64 array of shape (len(product_names), num_perm)
+        """
+        if self.build_workers != 1 and len(product_names) > config.PARALLEL_SHARD_SIZE:
+            from parallel_build import parallel_signatures
+            return parallel_signatures(product_names, self.num_perm, self.build_workers,
+                                       n_gram_size=self.n_gram_size)
+        
+        return minhash_signatures(product_names, self.permutations, self.n_gram_size)
+    
+    def upsert_products(self, products: List[Dict]) -> Dict:
+        """
+        Add new products and update existing ones in place.
+        Only products that are new or whose name changed are re-signed and re-bucketed.
+        Appending to a memory-mapped signature matrix loads it into memory.
+        
+        Args:
+            products: List of product dictionaries
+            
+        Returns:
+            Dictionary with counts of added, updated, and unchanged products
+        """
+        added = []
+        updated = []
+        
+        products = {p['productID']: p for p in products}
+        for product_id, product in products.items():
+            current = self.products.get(product_id)
+            if current is None:
+                added.append(product)
+            elif current['productName'] != product['productName']:
+                updated.append(product)
+        
+        changed = updated + added
+        if changed:
+            print(f"\nUpdating LSH index: {len(added)} new, {len(updated)} renamed products...")
+            start_time = time.time()
+            
+            signatures = self.compute_signatures([p['productName'] for p in changed])
+            
+            # Renamed products keep their row, new products are appended
+            updated_rows = np.array([self.id_to_row[p['productID']] for p in updated], dtype=np.int32)
+            if updated:
+                self._remove_signatures(updated_rows)
+                if not self.signatures.flags.writeable:
+                    self.signatures = np.array(self.signatures)
+                self.signatures[updated_rows] = signatures[:len(updated)]
+            
+            first_row = len(self.product_ids)
+            for i, product in enumerate(added):
+                self.id_to_row[product['productID']] = first_row + i
+                self.product_ids.append(product['productID'])
+            self.signatures = np.concatenate([self.signatures, signatures[len(updated):]])
+            
+            added_rows = np.arange(first_row, first_row + len(added), dtype=np.int32)
+            self._insert_signatures(np.concatenate([updated_rows, added_rows]), signatures)
+            
+            elapsed_time = time.time() - start_time
+            print(f"✓ Index updated in {elapsed_time:.2f} seconds")
+        
+        self.products.update(products)
+        self._set_store_codes(np.array([self.id_to_row[pid] for pid in products], dtype=np.int32))
+        self._statistics = None
+        
+        return {
+            'added': len(added),
+            'updated': len(updated),
+            'unchanged': len(products) - len(changed)
+        }
+    
+    def remove_products(self, product_ids: Iterable[str]) -> int:
+        """
+        Remove products from the index.
+        
+        Args:
+            product_ids: Product IDs to remove (unknown IDs are ignored)
+            
+        Returns:
+            Number of products removed
+        """
+        removed = [pid for pid in dict.fromkeys(product_ids) if pid in self.id_to_row]
+        if not removed:
+            return 0
+        
+        rows = np.array([self.id_to_row[pid] for pid in removed], dtype=np.int32)
+        self._remove_signatures(rows)
+        
+        keep = np.ones(len(self.product_ids), dtype=bool)
+        keep[rows] = False
+        self._drop_rows(keep)
+        
+        for product_id in removed:
+            del self.products[product_id]
+        
+        print(f"Removed {len(removed)} products from LSH index")
+        return len(removed)
+    
+    def _drop_rows(self, keep: np.ndarray) -> None:
+        """
+        Compact the signature matrix and renumber rows after a removal.
+        
+        Args:
+            keep: Boolean mask over the current rows
+        """
+        self.signatures = self.signatures[keep]
+        self.store_codes = self.store_codes[keep]
+        self._statistics = None
+        self.product_ids = [pid for pid, kept in zip(self.product_ids, keep) if kept]
+        self.id_to_row = {pid: row for row, pid in enumerate(self.product_ids)}
+    
+    def _snapshot_params(self) -> Dict:
+        """Parameters that determine the signature values."""
+        return {
+            'num_perm': self.num_perm,
+            'n_gram_size': self.n_gram_size,
+            'ngram_hash_bits': config.NGRAM_HASH_BITS
+        }
+    
+    def save_snapshot(self, path: str) -> None:
+        """
+        Save signatures and the product-ID mapping to a snapshot directory.
+        Files go to a new generation that the manifest points to once complete, so an
+        interrupted save leaves the previous snapshot readable and never mixes the two.
+        Memory-mapped signatures are written straight from the map.
+        
+        Args:
+            path: Snapshot directory (created if missing)
+        """
+        generation = new_generation(path)
+        
+        with open(os.path.join(path, generation, 'signatures.npy'), 'wb') as f:
+            np.save(f, self.signatures)
+        
+        with open(os.path.join(path, generation, 'products.json'), 'w', encoding='utf-8') as f:
+            json.dump([[pid, self.products[pid]['productName']] for pid in self.product_ids], f)
+        
+        publish(path, generation, {
+            'version': self.SNAPSHOT_VERSION,
+            'num_products': len(self.product_ids),
+            'threshold': self.threshold,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            **self._snapshot_params()
+        })
+        
+        print(f"Saved LSH snapshot of {len(self.product_ids)} products to {path}")
+    
+    def load_snapshot(self, path: str, mmap_mode: str = None) -> int:
+        """
+        Load a snapshot written by save_snapshot() into an empty blocker.
+        Missing snapshots and snapshots from a different version or signature parameters are ignored.
+        Loaded products only carry productID and productName until they are
+        refreshed with upsert_products() or sync_products().
+        
+        Args:
+            path: Snapshot directory
+            mmap_mode: Optional numpy mmap mode for the signature matrix (e.g. 'c')
+            
+        Returns:
+            Number of products loaded
+        """
+        if self.product_ids:
+            raise ValueError("Snapshots can only be loaded into an empty index")
+        
+        manifest = read_manifest(path)
+        if manifest is None:
+            print(f"Ignoring LSH snapshot {path}: no readable manifest")
+            return 0
+        
+        params = {key: manifest.get(key) for key in self._snapshot_params()}
+        if manifest.get('version') != self.SNAPSHOT_VERSION or params != self._snapshot_params():
+            print(f"Ignoring LSH snapshot {path}: version {manifest.get('version')}, parameters {params}")
+            return 0
+        
+        start_time = time.time()
+        
+        try:
+            signatures = np.load(generation_file(path, manifest, 'signatures.npy'), mmap_mode=mmap_mode)
+            with open(generation_file(path, manifest, 'products.json'), 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring LSH snapshot {path}: {e}")
+            return 0
+        
+        if signatures.shape != (len(entries), self.num_perm) or len(entries) != manifest.get('num_products'):
+            print(f"Ignoring LSH snapshot {path}: signature matrix does not match product list")
+            return 0
+        
+        product_ids = [pid for pid, _ in entries]
+        
+        self.products = {pid: {'productID': pid, 'productName': name} for pid, name in entries}
+        self.product_ids = product_ids
+        self.id_to_row = {pid: row for row, pid in enumerate(product_ids)}
+        self.signatures = signatures
+        self._set_store_codes()
+        self._statistics = None
+        
+        self._insert_signatures(np.arange(len(product_ids), dtype=np.int32), signatures)
+        
+        elapsed_time = time.time() - start_time
+        print(f"Loaded LSH snapshot of {len(entries)} products from {path} in {elapsed_time:.2f} seconds")
+        return len(entries)
+    
+    def get_signature(self, product_id: str) -> MinHashSignature:
+        """
+        Get the MinHash signature of an indexed product.
+        
+        Args:
+            product_id: Product ID
+            
+        Returns:
+            MinHashSignature object, or None if the product is not indexed
+        """
+        row = self.id_to_row.get(product_id)
+        if row is None:
+            return None
+        return MinHashSignature(self.signatures[row])
+    
+    def _rank_rows(self, row: int, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rank candidate rows by estimated Jaccard similarity (signature agreement).
+        Ties are broken by row so results are deterministic.
+        
+        Args:
+            row: Row of the query product
+            rows: Candidate rows
+            k: Number of candidates to keep
+            
+        Returns:
+            Tuple of (top-k candidate rows, their estimated Jaccard similarities), most similar first
+        """
+        agreement = np.count_nonzero(np.asarray(self.signatures[rows]) == self.signatures[row], axis=1)
+        order = np.lexsort((rows, -agreement))[:k]
+        
+        return rows[order], agreement[order] / self.num_perm
+
+
+class ProductBlocker(MinHashSignatureMixin, CandidateBlocker):
+    """
+    MinHash LSH-based blocking system for product matching.
+    Reduces comparison space from O(n²) to O(n) by grouping similar products.
+    """
+    
+    def __init__(self, num_perm: int = None, threshold: float = None, cross_store_only: bool = None,
+                 ranked: bool = None, build_workers: int = None, n_gram_size: int = None):
+        """
+        Initialize the product blocker.
+        
+        Args:
+            num_perm: Number of permutations for MinHash (default: from config)
+            threshold: Jaccard similarity threshold (default: from config)
+            cross_store_only: Only pair products from different stores (default: from config)
+            ranked: Keep the most similar candidates when truncating (default: from config)
+            build_workers: Processes used to compute signatures, 0 for all cores (default: from config)
+            n_gram_size: Character n-gram size for shingling (default: from config)
+        """
+        super().__init__(num_perm, threshold, cross_store_only, ranked, build_workers, n_gram_size)
+        
+        # Initialize LSH index
+        self.lsh = MinHashLSH(threshold=self.threshold, num_perm=self.num_perm)
+        
+        print(f"Initialized ProductBlocker with num_perm={self.num_perm}, threshold={self.threshold}")
+    
+    def _insert_signatures(self, rows: np.ndarray, signatures: np.ndarray) -> None:
+        """
+        Bulk-insert signatures into the LSH index.
+        Band keys are built for all products at once (same byte layout
+        MinHashLSH uses for its own band hashes).
+        
+        Args:
+            rows: Rows of the product table, one per signature row
+            signatures: uint64 array of shape (len(rows), num_perm)
+        """
+        product_ids = [self.product_ids[row] for row in rows.tolist()]
+        swapped = np.asarray(signatures).byteswap()
+        band_keys = []
+        
+        for start, end in self.lsh.hashranges:
+            width = (end - start) * swapped.itemsize
+            raw = np.ascontiguousarray(swapped[:, start:end]).tobytes()
+            band_keys.append([raw[i:i + width] for i in range(0, len(raw), width)])
+        
+        for keys, hashtable in zip(band_keys, self.lsh.hashtables):
+            for key, product_id in zip(keys, product_ids):
+                hashtable.insert(key, product_id)
+        
+        for i, product_id in enumerate(product_ids):
+            self.lsh.keys.insert(product_id, *[keys[i] for keys in band_keys])
+    
+    def _remove_signatures(self, rows: np.ndarray) -> None:
+        """
+        Remove rows from the LSH buckets.
+        
+        Args:
+            rows: Rows of indexed products
+        """
+        for row in rows.tolist():
+            self.lsh.remove(self.product_ids[row])
+    
+    def build_index(self, products: List[Dict]) -> None:
+        """
+        Build LSH index from list of products.
+        
+        Args:
+            products: List of product dictionaries
+        """
+        print(f"\nBuilding LSH index for {len(products)} products...")
+        start_time = time.time()
+        
+        product_ids = [p['productID'] for p in products]
+        if len(set(product_ids)) != len(product_ids) or any(pid in self.id_to_row for pid in product_ids):
+            raise ValueError("The given key already exists")
+        
+        # Compute all MinHash signatures in bulk
+        signatures = self.compute_signatures([p['productName'] for p in products])
+        
+        # Store products and their signature rows
+        first_row = len(self.product_ids)
+        for i, product in enumerate(products):
+            self.products[product_ids[i]] = product
+            self.id_to_row[product_ids[i]] = first_row + i
+        
+        self.product_ids.extend(product_ids)
+        self.signatures = np.vstack([self.signatures, signatures])
+        self._set_store_codes(np.arange(first_row, len(self.product_ids), dtype=np.int32))
+        self._statistics = None
+        
+        # Insert into LSH index
+        self._insert_signatures(np.arange(first_row, len(self.product_ids), dtype=np.int32), signatures)
+        
+        elapsed_time = time.time() - start_time
+        print(f"✓ Index built in {elapsed_time:.2f} seconds")
+        print(f"  Average: {elapsed_time/max(len(products), 1)*1000:.2f} ms per product")
+    
+    def query_rows(self, row: int) -> np.ndarray:
+        """
+        Find the rows sharing at least one LSH bucket with a row.
+        
+        Args:
+            row: Row of the query product in the signature matrix
+            
+        Returns:
+            int32 array of candidate rows (including the row itself)
+        """
+        candidate_ids = self.lsh.query(MinHashSignature(self.signatures[row]))
+        return np.fromiter((self.id_to_row[cid] for cid in candidate_ids), dtype=np.int32, count=len(candidate_ids))
+    
+    def bucket_summary(self, top: int = 5) -> Tuple[np.ndarray, List[Tuple[int, int, List[int]]]]:
+        """
+        Get the sizes of all LSH buckets and the largest buckets.
+        
+        Args:
+            top: Number of largest buckets to return
+            
+        Returns:
+            Tuple of (array of bucket sizes over all bands,
+            list of (size, band, member rows) for the largest buckets, largest first)
+        """
+        sizes = []
+        largest = []
+        
+        for band, hashtable in enumerate(self.lsh.hashtables):
+            counts = hashtable.itemcounts()
+            sizes.extend(counts.values())
+            
+            if counts:
+                key = max(counts, key=counts.get)
+                largest.append((counts[key], band, key))
+        
+        largest = heapq.nlargest(top, largest, key=lambda bucket: (bucket[0], -bucket[1]))
+        largest = [
+            (size, band, sorted(self.id_to_row[pid] for pid in self.lsh.hashtables[band].get(key)))
+            for size, band, key in largest
+        ]
+        
+        return np.array(sizes, dtype=np.int64), largest
 
 
 if __name__ == "__main__":
@@ -222,6 +1035,10 @@ if __name__ == "__main__":
     for candidate in candidates:
         print(f"  - {candidate['productName']} at {candidate['availableAt']}")
     
+    print("\nTop-2 most similar candidates:")
+    for candidate, similarity in blocker.query_top_k('1', k=2):
+        print(f"  - {candidate['productName']} at {candidate['availableAt']} (~{similarity:.2f} Jaccard)")
+    
     # Get statistics
     print("\nBlocking Statistics:")
     stats = blocker.get_statistics()
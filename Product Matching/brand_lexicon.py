@@ -0,0 +1,269 @@
+"""
+Compiled keyword and brand lexicons for product name matching.
+Uses an Aho-Corasick automaton so lookups cost O(name length) regardless of lexicon size.
+
+This module has no dependencies on the rest of the matching system. Each pipeline
+runs from its own directory, so the Recommendation Model keeps an identical copy
+(Recommendation Model/brand_lexicon.py); change both files together.
+"""
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over a fixed list of keywords.
+    Keyword positions in the input list act as priorities (lower index wins).
+    """
+    
+    def __init__(self, keywords: Iterable[str]):
+        """
+        Compile the automaton.
+        
+        Args:
+            keywords: Keywords to match (duplicates are compiled once)
+        """
+        self.keywords = []  # keyword index -> keyword
+        self.keyword_index = {}  # keyword -> keyword index
+        
+        self.goto = [{}]  # node -> {char: node}
+        self.fail = [0]  # node -> failure link
+        self.terminal = [-1]  # node -> keyword ending exactly at this node
+        self.outputs = [()]  # node -> keywords ending at this node (incl. via failure links)
+        self.completion = [-1]  # node -> shortest keyword in the subtree of this node
+        
+        for keyword in keywords:
+            if keyword and keyword not in self.keyword_index:
+                self.keyword_index[keyword] = len(self.keywords)
+                self.keywords.append(keyword)
+                self._add(keyword)
+        
+        self._link()
+    
+    def _add(self, keyword: str) -> None:
+        """Insert a keyword into the trie."""
+        index = self.keyword_index[keyword]
+        node = 0
+        
+        for char in keyword:
+            next_node = self.goto[node].get(char)
+            if next_node is None:
+                next_node = len(self.goto)
+                self.goto[node][char] = next_node
+                self.goto.append({})
+                self.fail.append(0)
+                self.terminal.append(-1)
+                self.outputs.append(())
+                self.completion.append(-1)
+            node = next_node
+            
+            # Shortest keyword below this node (ties: alphabetical)
+            best = self.completion[node]
+            if best < 0 or (len(keyword), keyword) < (len(self.keywords[best]), self.keywords[best]):
+                self.completion[node] = index
+        
+        self.terminal[node] = index
+    
+    def _link(self) -> None:
+        """Compute failure links and merged outputs (breadth-first)."""
+        queue = deque()
+        
+        for node in self.goto[0].values():
+            self.fail[node] = 0
+            self.outputs[node] = self._own_output(node)
+            queue.append(node)
+        
+        while queue:
+            node = queue.popleft()
+            
+            for char, child in self.goto[node].items():
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                
+                self.fail[child] = target if target != child else 0
+                self.outputs[child] = self._own_output(child) + self.outputs[self.fail[child]]
+                queue.append(child)
+    
+    def _own_output(self, node: int) -> Tuple[int, ...]:
+        """Keyword ending exactly at a node, as a tuple."""
+        return (self.terminal[node],) if self.terminal[node] >= 0 else ()
+    
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        """
+        Scan text once and yield every keyword occurrence.
+        
+        Args:
+            text: Text to scan (keywords are matched case-sensitively)
+        
+        Yields:
+            (end_position, keyword_index) tuples
+        """
+        goto = self.goto
+        fail = self.fail
+        outputs = self.outputs
+        node = 0
+        
+        for position, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            
+            for index in outputs[node]:
+                yield position + 1, index
+    
+    def find_all(self, text: str) -> Set[int]:
+        """
+        Get the indices of all keywords occurring anywhere in text.
+        
+        Args:
+            text: Text to scan
+        
+        Returns:
+            Set of keyword indices
+        """
+        return {index for _, index in self.iter_matches(text)}
+    
+    def find_first(self, text: str) -> Optional[str]:
+        """
+        Get the highest-priority (lowest index) keyword occurring anywhere in text.
+        
+        Args:
+            text: Text to scan
+        
+        Returns:
+            Keyword string or None if no keyword occurs
+        """
+        matches = self.find_all(text)
+        return self.keywords[min(matches)] if matches else None
+    
+    def match_prefix(self, text: str, boundaries: List[int]) -> Optional[str]:
+        """
+        Match keywords against the beginning of text.
+        
+        The longest keyword that is a prefix of text wins. Otherwise, the text
+        is cut at each boundary (longest first) and the shortest keyword that
+        starts with the cut text is returned.
+        
+        Args:
+            text: Text to match
+            boundaries: Cut positions in text to try for completions
+        
+        Returns:
+            Keyword string or None if nothing matches
+        """
+        nodes = {0: 0}  # position -> trie node reached
+        node = 0
+        best = -1
+        
+        for position, char in enumerate(text):
+            node = self.goto[node].get(char)
+            if node is None:
+                break
+            if self.terminal[node] >= 0:
+                best = self.terminal[node]
+            nodes[position + 1] = node
+        
+        if best >= 0:
+            return self.keywords[best]
+        
+        for boundary in sorted(boundaries, reverse=True):
+            node = nodes.get(boundary)
+            if node and self.completion[node] >= 0:
+                return self.keywords[self.completion[node]]
+        
+        return None
+    
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+
+class BrandLexicon:
+    """
+    Compiled brand lexicon with alias normalization.
+    """
+    
+    def __init__(self, brands: Iterable[str], aliases: Dict[str, str] = None):
+        """
+        Compile the brand lexicon.
+        
+        Args:
+            brands: Brand names (lowercase, cleaned); order sets priority for find()
+            aliases: Optional mapping of brand variations to canonical names
+        """
+        self.aliases = dict(aliases or {})
+        self.automaton = KeywordAutomaton(brands)
+    
+    def normalize(self, brand: str) -> str:
+        """
+        Normalize a brand using the alias table.
+        
+        Args:
+            brand: Brand name
+        
+        Returns:
+            Canonical brand name
+        """
+        return self.aliases.get(brand, brand)
+    
+    def match_tokens(self, tokens: List[str], max_tokens: int = 3) -> Optional[str]:
+        """
+        Match a brand against the leading tokens of a cleaned product name.
+        
+        Args:
+            tokens: Word tokens of the cleaned product name
+            max_tokens: Number of leading tokens that may form the brand
+        
+        Returns:
+            Canonical brand name or None if no brand matches
+        """
+        tokens = tokens[:max_tokens]
+        
+        boundaries = []
+        position = -1
+        for token in tokens:
+            position += len(token) + 1
+            boundaries.append(position)
+        
+        brand = self.automaton.match_prefix(' '.join(tokens), boundaries)
+        
+        return self.normalize(brand) if brand is not None else None
+    
+    def find(self, text: str) -> Optional[str]:
+        """
+        Find the highest-priority brand occurring anywhere in text.
+        
+        Args:
+            text: Lowercase text to scan
+        
+        Returns:
+            Canonical brand name or None if no brand occurs
+        """
+        brand = self.automaton.find_first(text)
+        
+        return self.normalize(brand) if brand is not None else None
+    
+    def __len__(self) -> int:
+        return len(self.automaton)
+
+
+if __name__ == "__main__":
+    lexicon = BrandLexicon(
+        ['national', 'national foods', 'shan', 'coca cola', 'cocacola'],
+        {'national foods': 'national', 'coca cola': 'cocacola'}
+    )
+    
+    test_names = [
+        "national foods banana jelly",
+        "coca cola zero",
+        "shan biryani masala",
+        "nat jelly"
+    ]
+    
+    print(f"Lexicon with {len(lexicon)} brands:\n")
+    
+    for name in test_names:
+        print(f"{name}")
+        print(f"  Prefix match: {lexicon.match_tokens(name.split())}")
+        print(f"  Anywhere:     {lexicon.find(name)}")
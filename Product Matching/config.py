@@ -24,6 +24,38 @@ STORE_COLLECTIONS = [
 LSH_NUM_PERM = 128  # Number of permutations (balance between speed and accuracy)
 LSH_THRESHOLD = 0.5  # Jaccard similarity threshold for candidate generation
 N_GRAM_SIZE = 3  # Character-level n-gram size for tokenization
+NGRAM_HASH_BITS = 32  # Width of hashed n-gram shingles (32 or 64)
+CROSS_STORE_ONLY = False  # Only generate candidate pairs between different stores (availableAt)
+RANKED_CANDIDATES = False  # Keep the most similar LSH candidates (by signature agreement) when truncating; costs a signature gather per query
+SN_WINDOW_SIZE = 10  # Sliding window of the sorted-neighbourhood blocker
+BLOCKING_ENGINE = os.getenv('BLOCKING_ENGINE', 'datasketch')  # 'datasketch' (MinHashLSH), 'array' (ArrayLSHBlocker) or 'sorted' (SortedNeighbourhoodBlocker)
+SIGNATURE_MATRIX_PATH = os.getenv('SIGNATURE_MATRIX_PATH')  # Optional .npy file to memory-map array LSH signatures
+LSH_SNAPSHOT_PATH = os.getenv('LSH_SNAPSHOT_PATH')  # Optional directory to persist the LSH index between runs
+LABELED_PAIRS_PATH = os.getenv('LABELED_PAIRS_PATH')  # Optional CSV of matching productID1,productID2 pairs for tune_blocking.py (default: exact-match groups)
 
 # Performance Settings
 BATCH_SIZE = 1000  # Batch size for processing products
+SIGNATURE_BATCH_SIZE = 256  # Products per vectorized MinHash batch (sized to stay in CPU cache)
+ARRAY_LSH_CHUNK_SIZE = 50000  # Products per chunk when filling the array LSH signature matrix
+PAIR_CHUNK_SIZE = 100000  # Candidate pairs per chunk yielded by iter_candidate_pairs()
+BUILD_WORKERS = int(os.getenv('BUILD_WORKERS', '1'))  # Processes for sharded index builds (1: single process, 0: all CPU cores)
+PARALLEL_SHARD_SIZE = 20000  # Products per shard sent to a build worker (smaller catalogs are built in-process)
+
+# Matching Settings
+MATCHING_STAGES = ('blocking', 'exact', 'semantic')  # Stages ProductMatcher builds (each on first use)
+BLOCKED_MATCHING = False  # Run semantic matching on LSH candidates only (lower recall; enable when benchmark_matching.py shows acceptable recall)
+BLOCKED_MAX_CANDIDATES = 200  # LSH candidates scored per product in blocked mode
+SEMANTIC_TOP_K = 20  # Nearest neighbours considered per product by semantic matching
+SEMANTIC_MIN_SIMILARITY = 0.85  # Minimum cosine similarity of a semantic match
+SEMANTIC_SEARCH_BATCH_SIZE = 4096  # Query rows per FAISS search in the batched all-pairs kNN pass
+SEMANTIC_INDEX_PATH = os.getenv('SEMANTIC_INDEX_PATH')  # Optional directory to persist the FAISS index and embeddings between runs
+EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH')  # Optional directory caching embeddings by model and size-agnostic name, so only new names are encoded
+EMBEDDING_CACHE_MAX_ENTRIES = 500000  # Cached vectors kept when shards are merged (oldest unused ones are evicted first)
+EMBEDDING_CACHE_MAX_SHARDS = 16  # Append-only cache shards allowed before they are merged into one
+CANONICAL_KEY_STORE_PATH = os.getenv('CANONICAL_KEY_STORE_PATH')  # Optional JSON-lines file to persist canonical keys for incremental exact matching
+HASHED_CANONICAL_KEYS = False  # Group exact matches by 64-bit hashes of the canonical keys
+KEEP_CANONICAL_KEY_NAMES = False  # With hashed keys, keep a side table of readable keys for debugging
+
+# Attribute Store Settings
+ATTRIBUTE_CACHE_SIZE = 50000  # Max product names kept in the on-demand LRU cache
+ATTRIBUTE_STORE_PATH = os.getenv('ATTRIBUTE_STORE_PATH')  # Optional JSON file to persist parsed attributes
@@ -0,0 +1,253 @@
+"""
+Content-addressed on-disk embedding cache.
+Vectors are keyed by a hash of the model name and the normalized text, so
+unchanged names are never re-encoded and identical names share one entry.
+"""
+from typing import Callable, List, Tuple
+import glob
+import hashlib
+import os
+import time
+import numpy as np
+import config
+
+
+KEY_SIZE = 16  # Bytes per cache key (blake2b digest)
+COMPACT_CHUNK_SIZE = 65536  # Vectors copied per step when merging shards
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text before encoding and caching (whitespace runs collapsed, trimmed).
+    
+    Args:
+        text: Text to normalize
+    
+    Returns:
+        Normalized text
+    """
+    return ' '.join(text.split())
+
+
+class EmbeddingCache:
+    """
+    Append-only shards of embedding vectors, each with a parallel array of content keys.
+    New vectors are written as a new shard, so existing shards are never rewritten
+    on append. Shards are merged once there are more than max_shards, and above
+    max_entries the oldest entries not used by this process are evicted.
+    """
+    
+    def __init__(self, path: str, model_name: str, max_entries: int = None, max_shards: int = None):
+        """
+        Initialize the cache and load existing shards.
+        
+        Args:
+            path: Cache directory (one subdirectory per model, created on first write)
+            model_name: Model whose vectors are cached (part of every key)
+            max_entries: Entries kept when shards are merged (default: from config)
+            max_shards: Shards allowed before they are merged (default: from config)
+        """
+        self.path = os.path.join(path, model_name.replace('/', '__'))
+        self.model_name = model_name
+        self.max_entries = max_entries or config.EMBEDDING_CACHE_MAX_ENTRIES
+        self.max_shards = max_shards or config.EMBEDDING_CACHE_MAX_SHARDS
+        
+        self.shards = []  # (shard number, memory-mapped vectors), oldest first
+        self.starts = []  # position of each shard's first vector
+        self.size = 0  # vectors over all shards (including superseded duplicates)
+        self.key_to_position = {}  # content key -> position over all shards
+        self.used = set()  # content keys read or written by this process
+        
+        self.hits = 0
+        self.misses = 0
+        
+        self._load()
+    
+    def key(self, text: str) -> bytes:
+        """
+        Get the content key of a normalized text.
+        
+        Args:
+            text: Normalized text
+        
+        Returns:
+            Key bytes
+        """
+        digest = hashlib.blake2b(digest_size=KEY_SIZE)
+        digest.update(self.model_name.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(text.encode('utf-8'))
+        return digest.digest()
+    
+    def _shard_files(self, number: int) -> Tuple[str, str]:
+        """Get the vector and key file of a shard."""
+        prefix = os.path.join(self.path, f"{number:06d}")
+        return prefix + '.npy', prefix + '.keys.npy'
+    
+    def _add_shard(self, number: int, keys: np.ndarray, vectors: np.ndarray) -> None:
+        """Register a shard; its keys supersede equal keys of older shards."""
+        raw = keys.tobytes()
+        for i in range(len(keys)):
+            self.key_to_position[raw[i * KEY_SIZE:(i + 1) * KEY_SIZE]] = self.size + i
+        
+        self.shards.append((number, vectors))
+        self.starts.append(self.size)
+        self.size += len(vectors)
+    
+    def _load(self) -> None:
+        """Load the keys of all complete shards and memory-map their vectors."""
+        # A shard is complete once its key file exists (it is written last)
+        numbers = sorted(
+            int(os.path.basename(keys_file).split('.')[0])
+            for keys_file in glob.glob(os.path.join(self.path, '*.keys.npy'))
+        )
+        
+        for number in numbers:
+            vectors_file, keys_file = self._shard_files(number)
+            keys = np.load(keys_file)
+            vectors = np.load(vectors_file, mmap_mode='r')
+            
+            if len(keys) != len(vectors):
+                print(f"Ignoring embedding cache shard {keys_file}: keys do not match vectors")
+                continue
+            
+            self._add_shard(number, keys, vectors)
+        
+        if self.shards:
+            print(f"Loaded embedding cache with {len(self)} vectors in {len(self.shards)} shards from {self.path}")
+    
+    def _write_shard(self, keys: List[bytes], vectors: np.ndarray) -> None:
+        """Write new entries as the next shard (vectors first, keys last)."""
+        os.makedirs(self.path, exist_ok=True)
+        
+        number = self.shards[-1][0] + 1 if self.shards else 0
+        vectors_file, keys_file = self._shard_files(number)
+        
+        with open(vectors_file + '.tmp', 'wb') as f:
+            np.save(f, vectors)
+        os.replace(vectors_file + '.tmp', vectors_file)
+        
+        keys = np.frombuffer(b''.join(keys), dtype=np.uint8).reshape(-1, KEY_SIZE)
+        with open(keys_file + '.tmp', 'wb') as f:
+            np.save(f, keys)
+        os.replace(keys_file + '.tmp', keys_file)
+        
+        self._add_shard(number, keys, np.load(vectors_file, mmap_mode='r'))
+    
+    def _gather(self, positions: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """
+        Read vectors by position, one slice per shard.
+        
+        Args:
+            positions: int64 positions over all shards
+            out: Optional float32 array of shape (len(positions), dimension) to fill
+        
+        Returns:
+            float32 array of shape (len(positions), dimension)
+        """
+        if out is None:
+            out = np.empty((len(positions), self.shards[0][1].shape[1]), dtype=np.float32)
+        
+        starts = np.array(self.starts, dtype=np.int64)
+        shard_of = np.searchsorted(starts, positions, side='right') - 1
+        
+        for shard in np.unique(shard_of):
+            mask = shard_of == shard
+            out[mask] = self.shards[shard][1][positions[mask] - starts[shard]]
+        
+        return out
+    
+    def compact(self) -> None:
+        """
+        Merge all shards into one. Above max_entries, the oldest entries not
+        used by this process are left out.
+        """
+        start_time = time.time()
+        
+        entries = sorted(self.key_to_position.items(), key=lambda entry: entry[1])  # oldest first
+        
+        excess = len(entries) - self.max_entries
+        evicted = set()
+        if excess > 0:
+            for key, _ in entries:
+                if len(evicted) == excess:
+                    break
+                if key not in self.used:
+                    evicted.add(key)
+            entries = [entry for entry in entries if entry[0] not in evicted]
+        
+        number = self.shards[-1][0] + 1
+        vectors_file, keys_file = self._shard_files(number)
+        dimension = self.shards[0][1].shape[1]
+        
+        # Copy chunk by chunk, so merging never holds the whole cache in memory
+        positions = np.fromiter((position for _, position in entries), dtype=np.int64, count=len(entries))
+        merged = np.lib.format.open_memmap(vectors_file + '.tmp', mode='w+', dtype=np.float32,
+                                           shape=(len(entries), dimension))
+        for chunk in range(0, len(entries), COMPACT_CHUNK_SIZE):
+            end = min(chunk + COMPACT_CHUNK_SIZE, len(entries))
+            self._gather(positions[chunk:end], out=merged[chunk:end])
+        merged.flush()
+        del merged
+        os.replace(vectors_file + '.tmp', vectors_file)
+        
+        keys = np.frombuffer(b''.join(key for key, _ in entries), dtype=np.uint8).reshape(-1, KEY_SIZE)
+        with open(keys_file + '.tmp', 'wb') as f:
+            np.save(f, keys)
+        os.replace(keys_file + '.tmp', keys_file)
+        
+        # Unmap the old shards before deleting them
+        old_numbers = [shard_number for shard_number, _ in self.shards]
+        self.shards, self.starts, self.size, self.key_to_position = [], [], 0, {}
+        for old_number in old_numbers:
+            for old_file in self._shard_files(old_number):
+                os.remove(old_file)
+        
+        self._add_shard(number, keys, np.load(vectors_file, mmap_mode='r'))
+        
+        print(f"  Compacted embedding cache to {len(entries)} vectors "
+              f"({len(evicted)} evicted) in {time.time() - start_time:.2f} seconds")
+    
+    def get_or_encode(self, texts: List[str], encode: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Get vectors for normalized texts, encoding only texts not in the cache.
+        
+        Args:
+            texts: Normalized texts
+            encode: Function encoding a list of texts into a float array
+        
+        Returns:
+            float32 array of shape (len(texts), dimension)
+        """
+        if not texts:
+            return np.asarray(encode([]), dtype=np.float32)
+        
+        keys = [self.key(text) for text in texts]
+        
+        missing = {}  # key -> text, each missing text once
+        for key, text in zip(keys, texts):
+            if key not in self.key_to_position:
+                missing.setdefault(key, text)
+        
+        self.misses += len(missing)
+        self.hits += len(texts) - len(missing)
+        print(f"  Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} misses")
+        
+        if missing:
+            start_time = time.time()
+            vectors = np.asarray(encode(list(missing.values())), dtype=np.float32)
+            self._write_shard(list(missing), vectors)
+            print(f"  Encoded {len(missing)} new texts in {time.time() - start_time:.2f} seconds")
+        
+        self.used.update(keys)
+        positions = np.fromiter((self.key_to_position[key] for key in keys), dtype=np.int64, count=len(keys))
+        embeddings = self._gather(positions)
+        
+        # Entries used by this process are never evicted, so only compact if others can go
+        if len(self.shards) > self.max_shards or (len(self) > self.max_entries and len(self.used) < len(self)):
+            self.compact()
+        
+        return embeddings
+    
+    def __len__(self) -> int:
+        return len(self.key_to_position)
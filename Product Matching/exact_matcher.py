@@ -2,23 +2,65 @@
 Exact matching system for identifying identical products across stores.
 Uses canonical key generation to group exact matches.
 """
-from typing import List, Dict, Set
+from typing import List, Dict, Set, Tuple, Union
+from array import array
 from collections import defaultdict
+import hashlib
 import time
-from preprocessing import extract_product_attributes
+import numpy as np
+import config
+from attribute_store import ProductAttributeStore
+from key_store import CanonicalKeyStore
+from preprocessing import PARSER_VERSION
+from price_comparator import PriceComparator
+
+
+def hash_canonical_key(canonical_key: str) -> int:
+    """
+    Hash a readable canonical key to a stable unsigned 64-bit integer.
+    
+    Args:
+        canonical_key: Canonical key string
+        
+    Returns:
+        Integer in [0, 2^64), identical across runs and processes
+    """
+    return int.from_bytes(hashlib.blake2b(canonical_key.encode('utf-8'), digest_size=8).digest(), 'little')
 
 
 class ExactMatcher:
     """
     Exact matching system using canonical keys.
     Groups identical products across different stores.
+    Groups hold row indices into a single catalog table instead of product dicts.
     """
     
-    def __init__(self):
-        """Initialize the exact matcher."""
-        self.match_groups = {}  # canonical_key -> list of products
-        self.product_to_key = {}  # productID -> canonical_key
-        self.products = {}  # productID -> product dict
+    KEY_FORMAT_VERSION = 1  # Bump whenever canonical_key_from_attributes() changes its output
+    
+    def __init__(self, attribute_store: ProductAttributeStore = None, key_store_path: str = None,
+                 hashed_keys: bool = None, keep_key_names: bool = None):
+        """
+        Initialize the exact matcher.
+        
+        Args:
+            attribute_store: Shared attribute store (default: a private store)
+            key_store_path: Optional JSON-lines file to persist canonical keys between runs
+            hashed_keys: Use 64-bit hashes of the canonical keys as group keys (default: from config)
+            keep_key_names: With hashed keys, keep a side table of readable keys (default: from config)
+        """
+        self.attribute_store = attribute_store or ProductAttributeStore()
+        self.key_store = CanonicalKeyStore(key_store_path, self.key_version()) if key_store_path else None
+        self.hashed_keys = config.HASHED_CANONICAL_KEYS if hashed_keys is None else hashed_keys
+        self.keep_key_names = config.KEEP_CANONICAL_KEY_NAMES if keep_key_names is None else keep_key_names
+        self.catalog = []  # row -> product dict (None once removed)
+        self.id_to_row = {}  # productID -> row
+        self.row_keys = []  # row -> canonical_key, or array('Q') of hashes if hashed (None / 0 once removed)
+        self.match_groups = {}  # canonical_key or its hash -> read-only int32 array of rows (ascending)
+        self.key_names = {}  # key hash -> canonical_key (hashed keys with keep_key_names only)
+        
+        # Price summary of each group, computed on first request
+        self.price_comparator = PriceComparator(attribute_store=self.attribute_store)
+        self.price_summaries = {}  # canonical_key or its hash -> price summary
         
         print("Initialized ExactMatcher")
     
@@ -33,12 +75,28 @@ class ExactMatcher:
         Returns:
             Canonical key string
         """
-        attrs = extract_product_attributes(product_name)
+        attrs = self.attribute_store.get_by_name(product_name)
         
-        brand = attrs['brand'] or 'unknown'
-        product_type = attrs['product_type'] or 'unknown'
-        size = attrs['size']
-        unit = attrs['unit']
+        return self.canonical_key_from_attributes(
+            attrs['brand'], attrs['product_type'], attrs['size'], attrs['unit']
+        )
+    
+    def canonical_key_from_attributes(self, brand: str, product_type: str,
+                                      size: float, unit: str) -> str:
+        """
+        Create canonical key from already extracted product attributes.
+        
+        Args:
+            brand: Brand name
+            product_type: Product type (name without brand and size)
+            size: Normalized size, or None
+            unit: Normalized unit, or None
+            
+        Returns:
+            Canonical key string
+        """
+        brand = brand or 'unknown'
+        product_type = product_type or 'unknown'
         
         # Handle products without size
         if size is None or unit is None:
@@ -54,9 +112,19 @@ class ExactMatcher:
         
         return key
     
+    def key_version(self) -> Tuple[int, int]:
+        """
+        Get the versions of the attribute parser and the canonical key format.
+        Persisted keys written under other versions are recomputed.
+        
+        Returns:
+            Tuple of (parser version, key format version)
+        """
+        return PARSER_VERSION, self.KEY_FORMAT_VERSION
+    
     def build_exact_matches(self, products: List[Dict]) -> None:
         """
-        Build exact match groups from list of products.
+        Build exact match groups from list of products, replacing any previous groups.
         
         Args:
             products: List of product dictionaries
@@ -64,30 +132,287 @@ class ExactMatcher:
         print(f"\nBuilding exact match groups for {len(products)} products...")
         start_time = time.time()
         
-        for i, product in enumerate(products):
-            product_id = product['productID']
-            product_name = product['productName']
-            
+        # Reuse persisted keys of products whose name is unchanged
+        stored_keys = self.key_store.load() if self.key_store else {}
+        
+        # Parse attributes for the remaining products in one pass
+        self.attribute_store.build([
+            p for p in products
+            if stored_keys.get(p['productID'], (None,))[0] != p['productName']
+        ], prune=False)
+        
+        self.catalog = list(products)
+        self.id_to_row = {}
+        self.row_keys = array('Q') if self.hashed_keys else []
+        self.key_names = {}
+        self.price_summaries = {}
+        readable_keys = []  # row -> canonical_key (for the key store)
+        key_to_group = {}  # canonical_key -> group number in first-seen order
+        row_groups = np.empty(len(self.catalog), dtype=np.int32)
+        
+        for row, product in enumerate(self.catalog):
             # Create canonical key
-            canonical_key = self.create_canonical_key(product_name)
+            stored = stored_keys.get(product['productID'])
+            if stored is not None and stored[0] == product['productName']:
+                canonical_key = stored[1]
+            else:
+                canonical_key = self._product_key(product)
+            readable_keys.append(canonical_key)
+            canonical_key = self._group_key(canonical_key)
             
-            # Store product
-            self.products[product_id] = product
-            self.product_to_key[product_id] = canonical_key
-            
-            # Add to match group
-            if canonical_key not in self.match_groups:
-                self.match_groups[canonical_key] = []
-            self.match_groups[canonical_key].append(product)
+            # Store product row and its match group
+            self.id_to_row[product['productID']] = row
+            self.row_keys.append(canonical_key)
+            row_groups[row] = key_to_group.setdefault(canonical_key, len(key_to_group))
             
             # Progress indicator
-            if (i + 1) % 1000 == 0:
-                print(f"  Processed {i + 1}/{len(products)} products...")
+            if (row + 1) % 1000 == 0:
+                print(f"  Processed {row + 1}/{len(products)} products...")
+        
+        # One contiguous row array sorted by group; each group is a view into it
+        members = np.argsort(row_groups, kind='stable').astype(np.int32)
+        members.flags.writeable = False
+        bounds = np.cumsum(np.bincount(row_groups, minlength=len(key_to_group)))[:-1]
+        self.match_groups = dict(zip(key_to_group, np.split(members, bounds)))
+        
+        if self.key_store:
+            self.key_store.rewrite({
+                product['productID']: (product['productName'], readable_keys[row])
+                for row, product in enumerate(self.catalog)
+            })
         
         elapsed_time = time.time() - start_time
         print(f"  Exact match groups built in {elapsed_time:.2f} seconds")
         print(f"  Total unique products: {len(self.match_groups)}")
-        print(f"  Average: {elapsed_time/len(products)*1000:.2f} ms per product")
+        print(f"  Average: {elapsed_time/max(len(products), 1)*1000:.2f} ms per product")
+    
+    def _product_key(self, product: Dict) -> str:
+        """Create the canonical key of a product from its stored attributes."""
+        attrs = self.attribute_store.get(product)
+        
+        return self.canonical_key_from_attributes(
+            attrs['brand'], attrs['product_type'], attrs['size'], attrs['unit']
+        )
+    
+    def _group_key(self, canonical_key: str) -> Union[str, int]:
+        """Get the group key of a readable canonical key (its hash if keys are hashed)."""
+        if not self.hashed_keys:
+            return canonical_key
+        
+        key_hash = hash_canonical_key(canonical_key)
+        if self.keep_key_names:
+            self.key_names.setdefault(key_hash, canonical_key)
+        
+        return key_hash
+    
+    def get_key_hashes(self) -> np.ndarray:
+        """
+        Get the key hash of every catalog row (hashed keys only).
+        
+        Returns:
+            uint64 array copied from the row keys (0 for removed rows); a view would
+            lock the row keys against appends from add_or_update()
+        """
+        if not self.hashed_keys:
+            raise ValueError("Canonical keys are not hashed")
+        
+        return np.array(self.row_keys, dtype=np.uint64)
+    
+    def readable_key(self, key: Union[str, int]) -> str:
+        """
+        Get the readable canonical key of a group key (for debugging).
+        
+        Args:
+            key: Group key, as returned by get_canonical_key() or add_or_update()
+            
+        Returns:
+            Canonical key string (the first one seen for a colliding hash),
+            or the key itself if readable keys are not kept
+        """
+        return self.key_names.get(key, key) if self.hashed_keys else key
+    
+    def audit_key_collisions(self) -> Dict:
+        """
+        Report hash collisions between distinct readable canonical keys.
+        Readable keys are recomputed for the whole catalog, so the side table is not needed.
+        
+        Returns:
+            Dictionary with the number of distinct keys, the expected and actual
+            number of colliding hashes, and the colliding readable keys by hash
+        """
+        readable_keys = defaultdict(set)  # key hash -> canonical_keys
+        
+        for product in self.catalog:
+            if product is not None:
+                canonical_key = self._product_key(product)
+                readable_keys[hash_canonical_key(canonical_key)].add(canonical_key)
+        
+        distinct_keys = sum(len(keys) for keys in readable_keys.values())
+        collisions = {
+            f"{key_hash:016x}": sorted(keys)
+            for key_hash, keys in readable_keys.items() if len(keys) > 1
+        }
+        
+        return {
+            'hashed_keys': self.hashed_keys,
+            'distinct_keys': distinct_keys,
+            'expected_collisions': distinct_keys * (distinct_keys - 1) / 2 / 2 ** 64,
+            'colliding_hashes': len(collisions),
+            'collisions': collisions
+        }
+    
+    def _join_group(self, canonical_key: str, row: int) -> None:
+        """Add a row to a match group, keeping rows ascending."""
+        self.price_summaries.pop(canonical_key, None)
+        group = self.match_groups.get(canonical_key)
+        
+        if group is None:
+            group = np.array([row], dtype=np.int32)
+        else:
+            group = np.insert(group, np.searchsorted(group, row), row)
+        
+        group.flags.writeable = False
+        self.match_groups[canonical_key] = group
+    
+    def _leave_group(self, canonical_key: str, row: int) -> None:
+        """Remove a row from its match group, dropping the group once empty."""
+        self.price_summaries.pop(canonical_key, None)
+        group = self.match_groups[canonical_key]
+        
+        if len(group) == 1:
+            del self.match_groups[canonical_key]
+            return
+        
+        group = group[group != row]
+        group.flags.writeable = False
+        self.match_groups[canonical_key] = group
+    
+    def add_or_update(self, product: Dict) -> Set[str]:
+        """
+        Add a new product or update an indexed one without rebuilding.
+        Only the product's old and new groups are touched.
+        
+        Args:
+            product: Product dictionary
+            
+        Returns:
+            Canonical keys of the groups whose members or member data changed
+        """
+        product_id = product['productID']
+        row = self.id_to_row.get(product_id)
+        
+        if row is not None and self.catalog[row] == product:
+            return set()
+        
+        if row is not None and self.catalog[row]['productName'] == product['productName']:
+            # Same name, same group: only the product data changed
+            self.catalog[row] = product
+            self.price_summaries.pop(self.row_keys[row], None)
+            return {self.row_keys[row]}
+        
+        readable_key = self._product_key(product)
+        canonical_key = self._group_key(readable_key)
+        changed = {canonical_key}
+        
+        if row is None:
+            row = len(self.catalog)
+            self.catalog.append(product)
+            self.row_keys.append(canonical_key)
+            self.id_to_row[product_id] = row
+            self._join_group(canonical_key, row)
+        else:
+            old_key = self.row_keys[row]
+            self.catalog[row] = product
+            self.row_keys[row] = canonical_key
+            if old_key != canonical_key:
+                changed.add(old_key)
+                self._leave_group(old_key, row)
+                self._join_group(canonical_key, row)
+        
+        if self.key_store:
+            self.key_store.append(product_id, product['productName'], readable_key)
+        
+        return changed
+    
+    def remove(self, product_id: str) -> Set[str]:
+        """
+        Remove a product from its match group without rebuilding.
+        
+        Args:
+            product_id: Product ID to remove
+            
+        Returns:
+            Canonical key of the changed group (empty for unknown products)
+        """
+        row = self.id_to_row.pop(product_id, None)
+        if row is None:
+            return set()
+        
+        canonical_key = self.row_keys[row]
+        self._leave_group(canonical_key, row)
+        self.catalog[row] = None
+        self.row_keys[row] = 0 if self.hashed_keys else None
+        
+        if self.key_store:
+            self.key_store.append(product_id, None, None)
+        
+        return {canonical_key}
+    
+    def get_canonical_key(self, product_id: str) -> Union[str, int]:
+        """
+        Get the canonical key of an indexed product.
+        
+        Args:
+            product_id: Product ID to query
+            
+        Returns:
+            Canonical key string (its 64-bit hash if keys are hashed), or None for unknown products
+        """
+        row = self.id_to_row.get(product_id)
+        return None if row is None else self.row_keys[row]
+    
+    def get_match_group_rows(self, product_id: str) -> np.ndarray:
+        """
+        Get the catalog rows of a product's match group (including self).
+        
+        Args:
+            product_id: Product ID to query
+            
+        Returns:
+            Read-only int32 array of rows (the stored group, not a copy)
+        """
+        canonical_key = self.get_canonical_key(product_id)
+        if canonical_key is None:
+            return np.empty(0, dtype=np.int32)
+        
+        return self.match_groups[canonical_key]
+    
+    def get_exact_match_rows(self, product_id: str) -> np.ndarray:
+        """
+        Get the catalog rows of a product's exact matches (excluding self).
+        
+        Args:
+            product_id: Product ID to query
+            
+        Returns:
+            int32 array of rows
+        """
+        rows = self.get_match_group_rows(product_id)
+        
+        return rows[rows != self.id_to_row[product_id]] if len(rows) > 1 else rows[:0]
+    
+    def products_at(self, rows: np.ndarray) -> List[Dict]:
+        """
+        Get the catalog products at the given rows.
+        
+        Args:
+            rows: Catalog rows
+            
+        Returns:
+            List of product dictionaries
+        """
+        catalog = self.catalog
+        return [catalog[row] for row in rows.tolist()]
     
     def get_exact_matches(self, product_id: str) -> List[Dict]:
         """
@@ -99,16 +424,14 @@ class ExactMatcher:
         Returns:
             List of matching products (excluding self)
         """
-        if product_id not in self.product_to_key:
+        rows = self.get_match_group_rows(product_id)
+        if len(rows) <= 1:
             return []
         
-        canonical_key = self.product_to_key[product_id]
-        matches = self.match_groups.get(canonical_key, [])
-        
-        # Remove self from matches
-        matches = [p for p in matches if p['productID'] != product_id]
+        row = self.id_to_row[product_id]
+        catalog = self.catalog
         
-        return matches
+        return [catalog[r] for r in rows.tolist() if r != row]
     
     def get_match_group(self, product_id: str) -> List[Dict]:
         """
@@ -120,11 +443,39 @@ class ExactMatcher:
         Returns:
             List of all products in the match group
         """
-        if product_id not in self.product_to_key:
-            return []
+        return self.products_at(self.get_match_group_rows(product_id))
+    
+    def get_price_summary(self, product_id: str) -> Dict:
+        """
+        Get the price summary of a product's match group.
+        Computed once per group and cached until the group changes.
         
-        canonical_key = self.product_to_key[product_id]
-        return self.match_groups.get(canonical_key, [])
+        Args:
+            product_id: Product ID to query
+            
+        Returns:
+            Dictionary with the group ranked by price-per-unit ('price_comparison',
+            as from PriceComparator.rank_by_value()) and its 'savings_analysis'
+            (best deal, worst deal, savings), or None for unknown products
+        """
+        canonical_key = self.get_canonical_key(product_id)
+        if canonical_key is None:
+            return None
+        
+        summary = self.price_summaries.get(canonical_key)
+        
+        if summary is None:
+            comparator = self.price_comparator
+            ranked = comparator.rank_by_value(
+                comparator.compare_products(self.products_at(self.match_groups[canonical_key]))
+            )
+            summary = {
+                'price_comparison': ranked,
+                'savings_analysis': comparator.get_savings_analysis(ranked)
+            }
+            self.price_summaries[canonical_key] = summary
+        
+        return summary
     
     def get_match_statistics(self) -> Dict:
         """
@@ -133,7 +484,7 @@ class ExactMatcher:
         Returns:
             Dictionary with statistics
         """
-        total_products = len(self.products)
+        total_products = len(self.id_to_row)
         total_groups = len(self.match_groups)
         
         # Count products with matches (group size > 1)
@@ -177,7 +528,7 @@ class ExactMatcher:
         
         for group in self.match_groups.values():
             if len(group) >= min_group_size:
-                sample_groups.append(group)
+                sample_groups.append(self.products_at(group))
                 if len(sample_groups) >= num_samples:
                     break
         
@@ -238,3 +589,9 @@ if __name__ == "__main__":
             print(f"  {key}: {value:.2f}")
         else:
             print(f"  {key}: {value}")
+    
+    # Hashed keys with a collision audit
+    hashed_matcher = ExactMatcher(hashed_keys=True)
+    hashed_matcher.build_exact_matches(sample_products)
+    audit = hashed_matcher.audit_key_collisions()
+    print(f"\nHashed keys: {audit['distinct_keys']} distinct, {audit['colliding_hashes']} colliding hashes")
@@ -0,0 +1,89 @@
+"""
+Persisted canonical-key index.
+Keeps each product's canonical key on disk so exact matching can skip parsing
+unchanged products and apply single-product updates without a rebuild.
+"""
+from typing import Dict, Optional, Tuple
+import json
+import os
+
+
+class CanonicalKeyStore:
+    """
+    Append-only JSON-lines file of productID -> (product name, canonical key).
+    Updates are appended in O(1); rewrite() compacts the file.
+    The header records the parser and key format versions the keys were computed with.
+    """
+    
+    STORE_VERSION = 3
+    
+    def __init__(self, path: str, key_version: Tuple[int, ...] = ()):
+        """
+        Initialize the key store.
+        
+        Args:
+            path: JSON-lines file holding the keys
+            key_version: Versions of the parser and key format the keys are valid for
+        """
+        self.path = path
+        self.version = [self.STORE_VERSION, *key_version]
+    
+    def load(self) -> Dict[str, Tuple[str, str]]:
+        """
+        Load the stored keys, replaying updates and removals in order.
+        Files written by a different store, parser or key format version are ignored.
+        
+        Returns:
+            Dictionary of productID -> (product name, canonical key)
+        """
+        entries = {}
+        
+        if not os.path.exists(self.path):
+            return entries
+        
+        with open(self.path, 'r', encoding='utf-8') as f:
+            header = json.loads(f.readline() or '{}')
+            if header.get('version') != self.version:
+                print(f"Ignoring canonical key store {self.path}: version {header.get('version')}")
+                return entries
+            
+            for line in f:
+                product_id, name, key = json.loads(line)
+                if key is None:
+                    entries.pop(product_id, None)
+                else:
+                    entries[product_id] = (name, key)
+        
+        print(f"Loaded canonical keys for {len(entries)} products from {self.path}")
+        return entries
+    
+    def rewrite(self, entries: Dict[str, Tuple[str, str]]) -> None:
+        """
+        Replace the file with a compacted copy of the given keys.
+        
+        Args:
+            entries: Dictionary of productID -> (product name, canonical key)
+        """
+        tmp_path = self.path + '.tmp'
+        
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'version': self.version}) + '\n')
+            for product_id, (name, key) in entries.items():
+                f.write(json.dumps([product_id, name, key]) + '\n')
+        
+        os.replace(tmp_path, self.path)
+    
+    def append(self, product_id: str, name: Optional[str], key: Optional[str]) -> None:
+        """
+        Record one product's key (a None key records a removal).
+        
+        Args:
+            product_id: Product ID
+            name: Product name the key was computed from
+            key: Canonical key, or None if the product was removed
+        """
+        if not os.path.exists(self.path):
+            self.rewrite({})
+        
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps([product_id, name, key]) + '\n')
@@ -0,0 +1,174 @@
+"""
+Sharded index building across CPU cores.
+The catalog is split into contiguous shards, MinHash signatures and product
+attributes are computed in a process pool, and the shards are merged in order.
+"""
+from multiprocessing import get_context
+from typing import Dict, List, Tuple
+import os
+import numpy as np
+import config
+from blocking import minhash_permutations, minhash_signatures
+from preprocessing import extract_attributes_batch
+
+
+# Settings read by the workers (copied explicitly for spawn-based start methods)
+WORKER_SETTINGS = ('NGRAM_HASH_BITS', 'SIGNATURE_BATCH_SIZE')
+
+# Per-process permutation parameters, keyed by num_perm
+_permutations = {}
+
+
+def resolve_workers(workers: int = None) -> int:
+    """
+    Get the number of worker processes to use.
+    
+    Args:
+        workers: Requested workers, 0 for all CPU cores (default: from config)
+    
+    Returns:
+        Number of worker processes (at least 1)
+    """
+    workers = config.BUILD_WORKERS if workers is None else workers
+    return max(workers or os.cpu_count() or 1, 1)
+
+
+def shard_ranges(count: int, shard_size: int = None) -> List[Tuple[int, int]]:
+    """
+    Split row range [0, count) into contiguous shards.
+    
+    Args:
+        count: Number of rows
+        shard_size: Rows per shard (default: from config)
+    
+    Returns:
+        List of (start, end) tuples
+    """
+    shard_size = shard_size or config.PARALLEL_SHARD_SIZE
+    return [(start, min(start + shard_size, count)) for start in range(0, count, shard_size)]
+
+
+def _init_worker(settings: Dict) -> None:
+    """Apply the parent's tokenization settings in a worker process."""
+    for name, value in settings.items():
+        setattr(config, name, value)
+
+
+def _signature_shard(args: Tuple[List[str], int, int]) -> np.ndarray:
+    """Compute the signatures of one shard."""
+    product_names, num_perm, n_gram_size = args
+    
+    permutations = _permutations.get(num_perm)
+    if permutations is None:
+        permutations = _permutations[num_perm] = minhash_permutations(num_perm)
+    
+    return minhash_signatures(product_names, permutations, n_gram_size)
+
+
+def _attribute_shard(product_names: List[str]) -> Dict[str, np.ndarray]:
+    """Parse the attributes of one shard."""
+    return extract_attributes_batch(product_names)
+
+
+def _map_shards(function, shards: List, workers: int) -> List:
+    """
+    Run a function over shards in a process pool.
+    
+    Args:
+        function: Module-level function taking one shard
+        shards: Shard arguments
+        workers: Number of worker processes
+    
+    Returns:
+        List of function results in shard order
+    """
+    settings = {name: getattr(config, name) for name in WORKER_SETTINGS}
+    
+    with get_context().Pool(min(workers, len(shards)), initializer=_init_worker, initargs=(settings,)) as pool:
+        return pool.map(function, shards)
+
+
+def parallel_signatures(product_names: List[str], num_perm: int, workers: int = None,
+                        out: np.ndarray = None, n_gram_size: int = None) -> np.ndarray:
+    """
+    Compute MinHash signatures for a catalog across a process pool.
+    Results are identical to minhash_signatures() on the whole list.
+    
+    Args:
+        product_names: List of product name strings
+        num_perm: Number of permutations
+        workers: Worker processes, 0 for all CPU cores (default: from config)
+        out: Optional array (or writable memmap) of shape (len(product_names), num_perm) to fill
+        n_gram_size: Character n-gram size (default: from config)
+    
+    Returns:
+        uint64 array of shape (len(product_names), num_perm)
+    """
+    if out is None:
+        out = np.empty((len(product_names), num_perm), dtype=np.uint64)
+    
+    n_gram_size = n_gram_size or config.N_GRAM_SIZE
+    ranges = shard_ranges(len(product_names))
+    workers = resolve_workers(workers)
+    
+    if workers == 1 or len(ranges) <= 1:
+        permutations = minhash_permutations(num_perm)
+        for start, end in ranges:
+            out[start:end] = minhash_signatures(product_names[start:end], permutations, n_gram_size)
+        return out
+    
+    shards = [(product_names[start:end], num_perm, n_gram_size) for start, end in ranges]
+    for (start, end), signatures in zip(ranges, _map_shards(_signature_shard, shards, workers)):
+        out[start:end] = signatures
+    
+    return out
+
+
+def parallel_attributes(product_names: List[str], workers: int = None) -> Dict[str, np.ndarray]:
+    """
+    Parse product attributes for a catalog across a process pool.
+    Results are identical to extract_attributes_batch() on the whole list.
+    
+    Args:
+        product_names: List of product name strings
+        workers: Worker processes, 0 for all CPU cores (default: from config)
+    
+    Returns:
+        Dictionary of columnar arrays aligned with the input order
+        (see extract_attributes_batch())
+    """
+    ranges = shard_ranges(len(product_names))
+    workers = resolve_workers(workers)
+    
+    if workers == 1 or len(ranges) <= 1:
+        return extract_attributes_batch(product_names)
+    
+    shards = [product_names[start:end] for start, end in ranges]
+    columns = _map_shards(_attribute_shard, shards, workers)
+    
+    return {
+        name: np.concatenate([shard[name] for shard in columns])
+        for name in ('brand', 'product_type', 'size', 'unit')
+    }
+
+
+if __name__ == "__main__":
+    import time
+    
+    names = [
+        'National Banana Jelly 80gm',
+        'National Strawberry Jelly 80gm',
+        'Nestle KitKat 500ml',
+        'Shan Biryani Masala 50g'
+    ] * 25000
+    
+    workers = resolve_workers(0)
+    print(f"Sharded build of {len(names)} names on {workers} workers")
+    
+    start_time = time.time()
+    signatures = parallel_signatures(names, config.LSH_NUM_PERM, workers)
+    print(f"  Signatures {signatures.shape} in {time.time() - start_time:.2f} seconds")
+    
+    start_time = time.time()
+    attributes = parallel_attributes(names, workers)
+    print(f"  Attributes for {len(attributes['brand'])} names in {time.time() - start_time:.2f} seconds")
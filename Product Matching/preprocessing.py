@@ -2,8 +2,31 @@
 Text preprocessing utilities for product name matching.
 """
 import re
-from typing import List, Set
+from typing import Dict, Iterable, List, Set
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import config
+from brand_lexicon import BrandLexicon
+
+
+# Precompiled patterns (shared by the scalar and batch extractors)
+_NON_ALNUM_PATTERN = re.compile(r'[^a-z0-9\s]')
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+# 64-bit FNV-1a constants and MurmurHash3 finalizer multipliers for n-gram hashing
+_FNV_OFFSET = np.uint64(0xCBF29CE484222325)
+_FNV_PRIME = np.uint64(0x100000001B3)
+_FMIX_MULTIPLIERS = (np.uint64(0xFF51AFD7ED558CCD), np.uint64(0xC4CEB9FE1A85EC53))
+
+# Pattern to match sizes: 80gm, 1.5L, 500ml, 250g, etc.
+SIZE_PATTERN = re.compile(
+    r'(\d+(?:\.\d+)?)\s*(gm|g|kg|ml|l|ltr|litre|oz|pack|pcs|piece|gram|grams|kilogram|liter|liters|litre|litres)',
+    re.IGNORECASE
+)
+
+# Version of the parsing rules. Persisted attributes and canonical keys record it and are
+# discarded when it changes, so bump it whenever a parser change alters extracted attributes
+PARSER_VERSION = 1
 
 
 def clean_product_name(product_name: str) -> str:
@@ -23,10 +46,10 @@ def clean_product_name(product_name: str) -> str:
     cleaned = product_name.lower()
     
     # Remove special characters but keep alphanumeric and spaces
-    cleaned = re.sub(r'[^a-z0-9\s]', ' ', cleaned)
+    cleaned = _NON_ALNUM_PATTERN.sub(' ', cleaned)
     
     # Normalize whitespace (replace multiple spaces with single space)
-    cleaned = re.sub(r'\s+', ' ', cleaned)
+    cleaned = _WHITESPACE_PATTERN.sub(' ', cleaned)
     
     # Strip leading/trailing whitespace
     cleaned = cleaned.strip()
@@ -58,6 +81,126 @@ def generate_ngrams(text: str, n: int = None) -> Set[str]:
     return ngrams
 
 
+def generate_ngram_hashes(text: str, n: int = None, bits: int = None) -> np.ndarray:
+    """
+    Generate hashed character-level n-grams from text without building n-gram strings.
+    N-grams are taken over the UTF-8 bytes, which equals character n-grams for
+    cleaned (ASCII) product names.
+    
+    Args:
+        text: Input text string
+        n: N-gram size (default: from config)
+        bits: Hash width, 32 or 64 (default: from config)
+        
+    Returns:
+        Sorted array of unique n-gram hashes (uint32 or uint64)
+    """
+    if n is None:
+        n = config.N_GRAM_SIZE
+    
+    if bits is None:
+        bits = config.NGRAM_HASH_BITS
+    
+    if bits not in (32, 64):
+        raise ValueError(f"bits must be 32 or 64, got {bits}")
+    
+    data = np.frombuffer(text.encode('utf-8'), dtype=np.uint8) if text else np.empty(0, dtype=np.uint8)
+    
+    if len(data) == 0:
+        return np.empty(0, dtype=np.uint32 if bits == 32 else np.uint64)
+    
+    # Texts shorter than n are a single shingle (same as generate_ngrams)
+    if len(data) < n:
+        windows = data[np.newaxis, :]
+    else:
+        windows = sliding_window_view(data, n)
+    
+    return np.unique(_hash_windows(windows, bits))
+
+
+def generate_ngram_hashes_batch(texts: List[str], n: int = None, bits: int = None) -> tuple:
+    """
+    Generate hashed character-level n-grams for many texts in one vectorized pass.
+    Hashes are identical to generate_ngram_hashes, but are not deduplicated.
+    
+    Args:
+        texts: List of input text strings
+        n: N-gram size (default: from config)
+        bits: Hash width, 32 or 64 (default: from config)
+        
+    Returns:
+        Tuple of (hashes, offsets): the n-gram hashes of texts[i] are
+        hashes[offsets[i]:offsets[i + 1]]
+    """
+    if n is None:
+        n = config.N_GRAM_SIZE
+    
+    if bits is None:
+        bits = config.NGRAM_HASH_BITS
+    
+    if bits not in (32, 64):
+        raise ValueError(f"bits must be 32 or 64, got {bits}")
+    
+    encoded = [text.encode('utf-8') if text else b'' for text in texts]
+    buffer = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    
+    lengths = np.fromiter((len(e) for e in encoded), dtype=np.int64, count=len(encoded))
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
+    
+    # Texts shorter than n are a single shingle, empty texts have none
+    counts = np.where(lengths >= n, lengths - n + 1, np.minimum(lengths, 1))
+    offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+    
+    hashes = np.empty(offsets[-1], dtype=np.uint32 if bits == 32 else np.uint64)
+    
+    # All full-length windows of all texts, gathered from the shared buffer
+    regular = np.flatnonzero(lengths >= n)
+    if len(regular) > 0:
+        regular_counts = counts[regular]
+        text_index = np.repeat(regular, regular_counts)
+        local = np.arange(regular_counts.sum()) - np.repeat(
+            np.cumsum(regular_counts) - regular_counts, regular_counts
+        )
+        windows = buffer[(starts[text_index] + local)[:, np.newaxis] + np.arange(n)]
+        hashes[offsets[text_index] + local] = _hash_windows(windows, bits)
+    
+    for i in np.flatnonzero((lengths > 0) & (lengths < n)):
+        window = buffer[starts[i]:starts[i] + lengths[i]][np.newaxis, :]
+        hashes[offsets[i]] = _hash_windows(window, bits)[0]
+    
+    return hashes, offsets
+
+
+def _hash_windows(windows: np.ndarray, bits: int) -> np.ndarray:
+    """
+    Hash each row of a 2-D uint8 array (FNV-1a followed by a 64-bit finalizer).
+    
+    Args:
+        windows: Array of shape (num_ngrams, n)
+        bits: Hash width, 32 or 64
+        
+    Returns:
+        Array of hashes (uint32 or uint64)
+    """
+    hashes = np.full(windows.shape[0], _FNV_OFFSET, dtype=np.uint64)
+    
+    for column in range(windows.shape[1]):
+        hashes ^= windows[:, column].astype(np.uint64)
+        hashes *= _FNV_PRIME
+    
+    # Finalize so every input bit affects every output bit
+    hashes ^= hashes >> np.uint64(33)
+    hashes *= _FMIX_MULTIPLIERS[0]
+    hashes ^= hashes >> np.uint64(33)
+    hashes *= _FMIX_MULTIPLIERS[1]
+    hashes ^= hashes >> np.uint64(33)
+    
+    if bits == 32:
+        return (hashes ^ (hashes >> np.uint64(32))).astype(np.uint32)
+    
+    return hashes
+
+
 def tokenize(text: str) -> List[str]:
     """
     Split text into word tokens.
@@ -101,6 +244,9 @@ BRAND_ALIASES = {
     'english biscuit': 'englishbiscuit'
 }
 
+# Compiled brand lexicon (sorted for deterministic partial matches)
+BRAND_LEXICON = BrandLexicon(sorted(COMMON_BRANDS), BRAND_ALIASES)
+
 
 def normalize_unit(size: float, unit: str) -> tuple:
     """
@@ -146,25 +292,26 @@ def extract_brand(product_name: str) -> str:
         Brand name (lowercase) or empty string if not found
     """
     cleaned = clean_product_name(product_name)
-    tokens = cleaned.split()
+    return _brand_from_tokens(cleaned.split())
+
+
+def _brand_from_tokens(tokens: List[str]) -> str:
+    """
+    Resolve the brand from the tokens of an already cleaned product name.
     
+    Args:
+        tokens: Word tokens of the cleaned product name
+        
+    Returns:
+        Brand name (lowercase) or empty string if there are no tokens
+    """
     if not tokens:
         return ''
     
-    # Check first 1-3 words for brand match
-    for length in [3, 2, 1]:
-        if len(tokens) >= length:
-            potential_brand = ' '.join(tokens[:length])
-            
-            # Check if it's a known brand
-            if potential_brand in COMMON_BRANDS:
-                # Normalize using aliases
-                return BRAND_ALIASES.get(potential_brand, potential_brand)
-            
-            # Check for partial matches
-            for brand in COMMON_BRANDS:
-                if potential_brand.startswith(brand) or brand.startswith(potential_brand):
-                    return BRAND_ALIASES.get(brand, brand)
+    # Check first 1-3 words for a known brand (exact, prefix or partial match)
+    brand = BRAND_LEXICON.match_tokens(tokens, max_tokens=3)
+    if brand:
+        return brand
     
     # Default to first word as brand
     return tokens[0]
@@ -180,21 +327,18 @@ def extract_size_info(product_name: str) -> dict:
     Returns:
         Dictionary with 'size', 'unit', and 'name_without_size'
     """
-    # Pattern to match sizes: 80gm, 1.5L, 500ml, 250g, etc.
-    size_pattern = r'(\d+(?:\.\d+)?)\s*(gm|g|kg|ml|l|ltr|litre|oz|pack|pcs|piece|gram|grams|kilogram|liter|liters|litre|litres)'
-    
-    match = re.search(size_pattern, product_name.lower())
+    match = SIZE_PATTERN.search(product_name)
     
     if match:
         size = float(match.group(1))
-        unit = match.group(2)
+        unit = match.group(2).lower()  # SIZE_PATTERN ignores case
         
         # Normalize unit
         normalized_size, normalized_unit = normalize_unit(size, unit)
         
         # Remove size from product name
-        name_without_size = re.sub(size_pattern, '', product_name, flags=re.IGNORECASE)
-        name_without_size = re.sub(r'\s+', ' ', name_without_size).strip()
+        name_without_size = SIZE_PATTERN.sub('', product_name)
+        name_without_size = _WHITESPACE_PATTERN.sub(' ', name_without_size).strip()
         
         return {
             'size': normalized_size,
@@ -219,35 +363,91 @@ def extract_product_attributes(product_name: str) -> dict:
     Returns:
         Dictionary with brand, product_type, size, unit, and original_name
     """
+    brand, product_type, size, unit = _parse_attributes(product_name)
+    
+    return {
+        'brand': brand,
+        'product_type': product_type,
+        'size': size,
+        'unit': unit,
+        'original_name': product_name
+    }
+
+
+def _parse_attributes(product_name: str) -> tuple:
+    """
+    Parse brand, product type, size and unit in a single pass.
+    The name is cleaned once and the size pattern is matched once.
+    
+    Args:
+        product_name: Product name string
+        
+    Returns:
+        Tuple of (brand, product_type, size, unit)
+    """
+    if not product_name:
+        return '', '', None, None
+    
     # Extract brand
-    brand = extract_brand(product_name)
+    brand = _brand_from_tokens(clean_product_name(product_name).split())
     
     # Extract size info
-    size_info = extract_size_info(product_name)
+    match = SIZE_PATTERN.search(product_name)
+    if match:
+        size, unit = normalize_unit(float(match.group(1)), match.group(2).lower())
+        name_without_size = SIZE_PATTERN.sub('', product_name)
+    else:
+        size, unit = None, None
+        name_without_size = product_name
     
     # Extract product type (name without brand and size)
-    product_type = size_info['name_without_size']
+    product_type = clean_product_name(name_without_size)
     
-    # Remove brand from product type
-    if brand:
-        # Clean product type
-        cleaned_type = clean_product_name(product_type)
-        cleaned_brand = clean_product_name(brand)
+    # Remove brand from beginning (brands are already in cleaned form)
+    if brand and product_type.startswith(brand):
+        product_type = product_type[len(brand):].strip()
+    
+    return brand, product_type, size, unit
+
+
+def extract_attributes_batch(product_names: Iterable[str]) -> Dict[str, np.ndarray]:
+    """
+    Extract product attributes for a whole catalog in one pass.
+    Identical names are parsed only once.
+    
+    Args:
+        product_names: Iterable of product name strings
         
-        # Remove brand from beginning
-        if cleaned_type.startswith(cleaned_brand):
-            cleaned_type = cleaned_type[len(cleaned_brand):].strip()
+    Returns:
+        Dictionary of columnar arrays aligned with the input order:
+        'brand', 'product_type' and 'unit' (object arrays, unit is None
+        when no size was found) and 'size' (float64, NaN when no size was found)
+    """
+    product_names = list(product_names)
+    count = len(product_names)
+    
+    brands = np.empty(count, dtype=object)
+    product_types = np.empty(count, dtype=object)
+    sizes = np.full(count, np.nan, dtype=np.float64)
+    units = np.empty(count, dtype=object)
+    
+    parsed = {}  # product name -> attribute tuple
+    
+    for i, product_name in enumerate(product_names):
+        attrs = parsed.get(product_name)
+        if attrs is None:
+            attrs = _parse_attributes(product_name)
+            parsed[product_name] = attrs
         
-        product_type = cleaned_type
-    else:
-        product_type = clean_product_name(product_type)
+        brands[i], product_types[i], size, units[i] = attrs
+        if size is not None:
+            sizes[i] = size
     
     return {
-        'brand': brand,
-        'product_type': product_type,
-        'size': size_info['size'],
-        'unit': size_info['unit'],
-        'original_name': product_name
+        'brand': brands,
+        'product_type': product_types,
+        'size': sizes,
+        'unit': units
     }
 
 
@@ -293,6 +493,9 @@ if __name__ == "__main__":
         ngrams = generate_ngrams(cleaned, n=3)
         print(f"N-grams (first 10): {list(ngrams)[:10]}")
         
+        ngram_hashes = generate_ngram_hashes(cleaned, n=3)
+        print(f"N-gram hashes: {len(ngram_hashes)} ({ngram_hashes.dtype})")
+        
         tokens = tokenize(cleaned)
         print(f"Tokens: {tokens}")
         
@@ -3,7 +3,8 @@ Price comparison and ranking system for matched products.
 Calculates price-per-unit, normalizes sizes, and ranks by value.
 """
 from typing import List, Dict
-from preprocessing import extract_product_attributes
+import heapq
+from attribute_store import ProductAttributeStore
 
 
 class PriceComparator:
@@ -11,9 +12,14 @@ class PriceComparator:
     Price comparison system for matched products.
     """
     
-    def __init__(self):
-        """Initialize price comparator."""
-        pass
+    def __init__(self, attribute_store: ProductAttributeStore = None):
+        """
+        Initialize price comparator.
+        
+        Args:
+            attribute_store: Shared attribute store (default: a private store)
+        """
+        self.attribute_store = attribute_store or ProductAttributeStore()
     
     def get_effective_price(self, product: Dict) -> float:
         """
@@ -59,7 +65,7 @@ class PriceComparator:
         Returns:
             Dictionary with price analysis
         """
-        attrs = extract_product_attributes(product['productName'])
+        attrs = self.attribute_store.get(product)
         price = self.get_effective_price(product)
         
         if not attrs['size'] or not attrs['unit']:
@@ -132,6 +138,57 @@ class PriceComparator:
         
         return valid_results + invalid_results
     
+    def merge_ranked(self, *ranked_lists: List[Dict]) -> List[Dict]:
+        """
+        Merge lists already ranked by rank_by_value() without re-pricing them.
+        Same order as ranking the concatenated lists (earlier lists win ties).
+        
+        Args:
+            ranked_lists: Ranked lists from rank_by_value()
+            
+        Returns:
+            Merged ranked list with best value first
+        """
+        valid_lists = [
+            [r for r in ranked if r['price_info']['price_per_unit'] is not None]
+            for ranked in ranked_lists
+        ]
+        
+        invalid_results = [
+            r for ranked in ranked_lists for r in ranked
+            if r['price_info']['price_per_unit'] is None
+        ]
+        
+        merged = heapq.merge(*valid_lists, key=lambda x: x['price_info']['price_per_unit'])
+        
+        return list(merged) + invalid_results
+    
+    def promote(self, ranked_results: List[Dict], product_id: str) -> List[Dict]:
+        """
+        Move a product ahead of the products it ties with on price-per-unit.
+        
+        Args:
+            ranked_results: Ranked list from rank_by_value()
+            product_id: Product to move
+            
+        Returns:
+            New ranked list (unchanged order if the product is not in it)
+        """
+        for index, result in enumerate(ranked_results):
+            if result['product']['productID'] == product_id:
+                break
+        else:
+            return list(ranked_results)
+        
+        price_per_unit = result['price_info']['price_per_unit']
+        
+        start = index
+        while start > 0 and ranked_results[start - 1]['price_info']['price_per_unit'] == price_per_unit:
+            start -= 1
+        
+        return (ranked_results[:start] + [result] +
+                ranked_results[start:index] + ranked_results[index + 1:])
+    
     def get_savings_analysis(self, ranked_results: List[Dict]) -> Dict:
         """
         Calculate savings analysis.
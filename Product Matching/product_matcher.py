@@ -2,59 +2,219 @@
 Unified product matching system integrating all three stages.
 Combines LSH blocking, exact matching, and semantic matching.
 """
-from typing import List, Dict
+from typing import Iterable, List, Dict
+import os
 from data_loader import ProductDataLoader
-from blocking import ProductBlocker
 from exact_matcher import ExactMatcher
-from semantic_matcher import SemanticMatcher
-from preprocessing import extract_product_attributes
+from attribute_store import ProductAttributeStore
+import config
+
+
+# Matching stages in build order
+STAGES = ('blocking', 'exact', 'semantic')
 
 
 class ProductMatcher:
     """
     Unified product matching system combining all stages.
+    Stages are built lazily on first use, so unused stages cost nothing.
     """
     
-    def __init__(self):
-        """Initialize all matchers."""
+    def __init__(self, attribute_store_path: str = None, blocked: bool = None,
+                 stages: Iterable[str] = None, blocking_engine: str = None):
+        """
+        Initialize all matchers.
+        
+        Args:
+            attribute_store_path: Optional file to persist parsed attributes (default: from config)
+            blocked: Restrict semantic matching to LSH candidates (default: from config)
+            stages: Stages to enable, any of 'blocking', 'exact', 'semantic' (default: from config)
+            blocking_engine: 'datasketch', 'array' or 'sorted' (default: from config)
+        """
         print("Initializing Product Matcher...")
         
-        self.blocker = None
-        self.exact_matcher = None
-        self.semantic_matcher = None
+        self.stages = tuple(stages or config.MATCHING_STAGES)
+        unknown = set(self.stages) - set(STAGES)
+        if unknown:
+            raise ValueError(f"Unknown matching stages: {sorted(unknown)}")
+        
+        self.blocked = config.BLOCKED_MATCHING if blocked is None else blocked
+        self.blocking_engine = blocking_engine or config.BLOCKING_ENGINE
+        
+        self.attribute_store = ProductAttributeStore(
+            path=attribute_store_path or config.ATTRIBUTE_STORE_PATH
+        )
+        
+        self._blocker = None
+        self._exact_matcher = None
+        self._semantic_matcher = None
+        self.catalog = []  # product list in load order
         self.products = {}
     
     def build_index(self, products: List[Dict]) -> None:
         """
-        Build indices for all matching stages.
+        Register the catalog. Enabled stages are built on first use.
         
         Args:
             products: List of product dictionaries
         """
-        print(f"\nBuilding indices for {len(products)} products...")
+        print(f"\nRegistering {len(products)} products (stages: {', '.join(self.stages)})...")
         
+        self.catalog = products
         self.products = {p['productID']: p for p in products}
         
-        print("\n[Stage 1] Building LSH Blocker...")
-        self.blocker = ProductBlocker()
-        self.blocker.build_index(products)
+        self._blocker = None
+        self._exact_matcher = None
+        self._semantic_matcher = None
         
-        print("\n[Stage 2] Building Exact Matcher...")
-        self.exact_matcher = ExactMatcher()
-        self.exact_matcher.build_exact_matches(products)
+        self.attribute_store.build(products)
+    
+    def build_blocker(self):
+        """
+        Build the blocker if the stage is enabled and not built yet.
         
-        print("\n[Stage 3] Building Semantic Matcher...")
-        self.semantic_matcher = SemanticMatcher()
-        self.semantic_matcher.build_faiss_index(products)
+        Returns:
+            The blocker (None if the stage is disabled)
+        """
+        if self._blocker is None and 'blocking' in self.stages:
+            self._blocker = self._build_blocker()
+        return self._blocker
+    
+    def build_exact_matcher(self) -> ExactMatcher:
+        """
+        Build the exact matcher if the stage is enabled and not built yet.
+        
+        Returns:
+            The exact matcher (None if the stage is disabled)
+        """
+        if self._exact_matcher is None and 'exact' in self.stages:
+            print("\n[Stage 2] Building Exact Matcher...")
+            self._exact_matcher = ExactMatcher(
+                attribute_store=self.attribute_store,
+                key_store_path=config.CANONICAL_KEY_STORE_PATH
+            )
+            self._exact_matcher.build_exact_matches(self.catalog)
+        return self._exact_matcher
+    
+    def build_semantic_matcher(self):
+        """
+        Build the semantic matcher if the stage is enabled and not built yet.
+        
+        Returns:
+            The semantic matcher (None if the stage is disabled)
+        """
+        if self._semantic_matcher is None and 'semantic' in self.stages:
+            print("\n[Stage 3] Building Semantic Matcher...")
+            self._semantic_matcher = self._build_semantic_matcher()
+        return self._semantic_matcher
+    
+    @property
+    def blocker(self):
+        """LSH blocker, built on first use (None if the stage is disabled)."""
+        return self.build_blocker()
+    
+    @property
+    def exact_matcher(self) -> ExactMatcher:
+        """Exact matcher, built on first use (None if the stage is disabled)."""
+        return self.build_exact_matcher()
+    
+    @property
+    def semantic_matcher(self):
+        """Semantic matcher, built on first use (None if the stage is disabled)."""
+        return self.build_semantic_matcher()
+    
+    def set_blocking_engine(self, engine: str) -> None:
+        """
+        Switch the blocking engine; the new blocker is built on next use.
+        
+        Args:
+            engine: 'datasketch', 'array' or 'sorted'
+        """
+        self.blocking_engine = engine
+        self._blocker = None
+    
+    def _build_blocker(self):
+        """
+        Build the configured blocker, refreshing a saved LSH snapshot if one exists.
+        
+        Returns:
+            ProductBlocker, ArrayLSHBlocker or SortedNeighbourhoodBlocker
+        """
+        print(f"\n[Stage 1] Building Blocker ({self.blocking_engine})...")
+        if self.blocking_engine == 'sorted':
+            from sorted_blocking import SortedNeighbourhoodBlocker
+            blocker = SortedNeighbourhoodBlocker(attribute_store=self.attribute_store)
+        elif self.blocking_engine == 'array':
+            from array_blocking import ArrayLSHBlocker
+            blocker = ArrayLSHBlocker(signature_path=config.SIGNATURE_MATRIX_PATH)
+        else:
+            from blocking import ProductBlocker
+            blocker = ProductBlocker()
+        
+        snapshot_path = config.LSH_SNAPSHOT_PATH
+        if snapshot_path and os.path.exists(os.path.join(snapshot_path, 'manifest.json')) \
+                and blocker.load_snapshot(snapshot_path):
+            changes = blocker.sync_products(self.catalog)
+            print(f"  Refreshed LSH snapshot: {changes}")
+            snapshot_stale = changes['added'] or changes['updated'] or changes['removed']
+        else:
+            blocker.build_index(self.catalog)
+            snapshot_stale = True
+        
+        if snapshot_path and snapshot_stale:
+            blocker.save_snapshot(snapshot_path)
+        
+        return blocker
+    
+    def _build_semantic_matcher(self):
+        """
+        Build the semantic matcher, refreshing a saved FAISS snapshot if one exists.
+        
+        Returns:
+            SemanticMatcher
+        """
+        # Imported here so exact-only runs never load torch or FAISS
+        from semantic_matcher import SemanticMatcher
+        
+        matcher = SemanticMatcher(attribute_store=self.attribute_store)
+        
+        snapshot_path = config.SEMANTIC_INDEX_PATH
+        snapshot_hash = None
+        if snapshot_path and os.path.exists(os.path.join(snapshot_path, 'manifest.json')):
+            snapshot_hash = matcher.load_snapshot(snapshot_path)
+        
+        if snapshot_hash is not None:
+            changes = matcher.sync_products(self.catalog)
+            print(f"  Refreshed FAISS snapshot: {changes}")
+        else:
+            matcher.build_faiss_index(self.catalog)
+        
+        if snapshot_path and matcher.catalog_hash() != snapshot_hash:
+            matcher.save_snapshot(snapshot_path)
+        
+        return matcher
+    
+    def build_all(self) -> None:
+        """Build every enabled stage now instead of on first use."""
+        builders = {
+            'blocking': self.build_blocker,
+            'exact': self.build_exact_matcher,
+            'semantic': self.build_semantic_matcher
+        }
+        for stage in self.stages:
+            builders[stage]()
         
         print("\nAll indices built successfully!")
     
-    def find_all_matches(self, product_id: str) -> Dict:
+    def find_all_matches(self, product_id: str, blocked: bool = None) -> Dict:
         """
         Find all matches for a product using all stages.
+        In blocked mode, semantic scoring and brand verification only run on
+        the product's LSH candidates instead of a search over the whole catalog.
         
         Args:
             product_id: Product ID to query
+            blocked: Override the matcher's blocked mode for this query
             
         Returns:
             Dictionary with exact and semantic matches
@@ -62,11 +222,23 @@ class ProductMatcher:
         if product_id not in self.products:
             return {'exact_matches': [], 'semantic_matches': []}
         
-        exact_matches = self.exact_matcher.get_exact_matches(product_id)
+        blocked = (self.blocked if blocked is None else blocked) and 'blocking' in self.stages
         
-        semantic_matches = self.semantic_matcher.get_semantic_matches(
-            product_id, k=20, min_similarity=0.85
-        )
+        exact_matches = []
+        if 'exact' in self.stages:
+            exact_matches = self.exact_matcher.get_exact_matches(product_id)
+        
+        semantic_matches = []
+        if 'semantic' in self.stages:
+            candidate_ids = None
+            if blocked:
+                candidates = self.blocker.query_candidates(product_id, config.BLOCKED_MAX_CANDIDATES)
+                candidate_ids = [c['productID'] for c in candidates]
+            
+            semantic_matches = self.semantic_matcher.get_semantic_matches(
+                product_id, k=config.SEMANTIC_TOP_K, min_similarity=config.SEMANTIC_MIN_SIMILARITY,
+                candidate_ids=candidate_ids
+            )
         
         exact_ids = {m['productID'] for m in exact_matches}
         semantic_matches = [
@@ -79,17 +251,18 @@ class ProductMatcher:
             'semantic_matches': semantic_matches
         }
     
-    def get_match_results(self, product_id: str) -> List[Dict]:
+    def get_match_results(self, product_id: str, blocked: bool = None) -> List[Dict]:
         """
         Get structured match results with confidence levels.
         
         Args:
             product_id: Product ID to query
+            blocked: Override the matcher's blocked mode for this query
             
         Returns:
             List of match dictionaries sorted by confidence
         """
-        matches = self.find_all_matches(product_id)
+        matches = self.find_all_matches(product_id, blocked)
         
         results = []
         
@@ -118,20 +291,25 @@ class ProductMatcher:
         Get overall matching statistics.
         
         Returns:
-            Dictionary with statistics from all stages
+            Dictionary with statistics from the enabled stages
         """
-        exact_stats = self.exact_matcher.get_match_statistics()
-        semantic_stats = self.semantic_matcher.get_statistics()
-        blocking_stats = self.blocker.get_statistics()
+        stats = {'total_products': len(self.products)}
         
-        return {
-            'total_products': exact_stats['total_products'],
-            'exact_match_coverage': exact_stats['coverage_percentage'],
-            'semantic_match_coverage': semantic_stats['estimated_coverage'],
-            'avg_exact_matches': exact_stats['avg_products_per_group'],
-            'avg_semantic_matches': semantic_stats['avg_matches_per_product'],
-            'blocking_reduction': blocking_stats['reduction_ratio']
-        }
+        if 'exact' in self.stages:
+            exact_stats = self.exact_matcher.get_match_statistics()
+            stats['exact_match_coverage'] = exact_stats['coverage_percentage']
+            stats['avg_exact_matches'] = exact_stats['avg_products_per_group']
+        
+        if 'semantic' in self.stages:
+            semantic_stats = self.semantic_matcher.get_statistics()
+            stats['semantic_match_coverage'] = semantic_stats['estimated_coverage']
+            stats['avg_semantic_matches'] = semantic_stats['avg_matches_per_product']
+        
+        if 'blocking' in self.stages:
+            blocking_stats = self.blocker.get_statistics()
+            stats['blocking_reduction'] = blocking_stats['reduction_ratio']
+        
+        return stats
     
     def get_price_comparison(self, product_id: str) -> Dict:
         """
@@ -151,11 +329,21 @@ class ProductMatcher:
         product = self.products[product_id]
         results = self.get_match_results(product_id)
         
-        all_products = [product] + [r['product'] for r in results]
+        comparator = PriceComparator(attribute_store=self.attribute_store)
+        
+        if 'exact' in self.stages:
+            # The exact-match group is priced and ranked once per group;
+            # only the semantic matches are priced for each query
+            group = self.exact_matcher.get_price_summary(product_id)['price_comparison']
+            semantic = [r['product'] for r in results if r['match_type'] == 'semantic']
+            ranked = comparator.merge_ranked(
+                comparator.promote(group, product_id),
+                comparator.rank_by_value(comparator.compare_products(semantic))
+            )
+        else:
+            all_products = [product] + [r['product'] for r in results]
+            ranked = comparator.rank_by_value(comparator.compare_products(all_products))
         
-        comparator = PriceComparator()
-        comparison = comparator.compare_products(all_products)
-        ranked = comparator.rank_by_value(comparison)
         savings = comparator.get_savings_analysis(ranked)
         
         return {
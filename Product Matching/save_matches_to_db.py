@@ -12,10 +12,9 @@ import numpy as np
 from pymongo import MongoClient
 from datetime import datetime
 from tqdm import tqdm
+import config
 from data_loader import ProductDataLoader
 from product_matcher import ProductMatcher
-from price_comparator import PriceComparator
-from preprocessing import extract_product_attributes
 
 
 class ProductMatchSaver:
@@ -43,6 +42,13 @@ class ProductMatchSaver:
         print("\nBuilding matcher indices...")
         self.matcher = ProductMatcher()
         self.matcher.build_index(self.products)
+        self.matcher.build_all()
+        
+        if 'semantic' in self.matcher.stages and not self.matcher.blocked:
+            # One batched kNN pass instead of a FAISS search per product
+            self.matcher.semantic_matcher.precompute_neighbours(
+                k=config.SEMANTIC_TOP_K, min_similarity=config.SEMANTIC_MIN_SIMILARITY
+            )
         
         print(f"System: READY!\n")
     
@@ -58,7 +64,7 @@ class ProductMatchSaver:
         print(f"  Match types: Exact + Semantic")
         
         documents = []
-        comparator = PriceComparator()
+        attribute_store = self.matcher.attribute_store
         
         for product in tqdm(self.products, desc="Generating matches"):
             product_id = product['productID']
@@ -73,8 +79,11 @@ class ProductMatchSaver:
             price_comparison = price_data['price_comparison']
             savings = price_data['savings_analysis']
             
-            query_attrs = extract_product_attributes(query_product['productName'])
-            query_price_info = comparator.calculate_price_per_unit(query_product)
+            # Price info of every compared product (exact groups come from the cached group summary)
+            price_infos = {r['product']['productID']: r['price_info'] for r in price_comparison}
+            
+            query_attrs = attribute_store.get(query_product)
+            query_price_info = price_infos[product_id]
             
             exact_matches = []
             semantic_matches = []
@@ -84,8 +93,8 @@ class ProductMatchSaver:
                 match_type = match['match_type']
                 confidence = match['confidence']
                 
-                match_attrs = extract_product_attributes(match_product['productName'])
-                match_price_info = comparator.calculate_price_per_unit(match_product)
+                match_attrs = attribute_store.get(match_product)
+                match_price_info = price_infos[match_product['productID']]
                 
                 savings_amount = query_product['originalPrice'] - match_product['originalPrice']
                 savings_pct = (savings_amount / query_product['originalPrice'] * 100) if query_product['originalPrice'] > 0 else 0
@@ -122,7 +131,7 @@ class ProductMatchSaver:
                 best_price_info = best_price_comparison['price_info']
                 
                 if best_product['productID'] != product_id:
-                    best_attrs = extract_product_attributes(best_product['productName'])
+                    best_attrs = attribute_store.get(best_product)
                     best_deal = {
                         'product_id': best_product['productID'],
                         'name': best_product['productName'],
@@ -5,9 +5,16 @@ Matches same products in different sizes with brand verification.
 from sentence_transformers import SentenceTransformer
 import faiss
 import numpy as np
-from typing import List, Dict, Tuple
+from typing import Iterable, List, Dict, Tuple
+import hashlib
+import json
+import os
 import time
-from preprocessing import extract_product_attributes, extract_size_info, fuzzy_brand_match
+import config
+from preprocessing import extract_size_info, fuzzy_brand_match
+from attribute_store import ProductAttributeStore
+from embedding_cache import EmbeddingCache, normalize_text
+from snapshot_store import generation_file, new_generation, publish, read_manifest
 
 
 class SemanticMatcher:
@@ -16,21 +23,41 @@ class SemanticMatcher:
     Identifies same products in different sizes.
     """
     
-    def __init__(self, model_name: str = 'all-MiniLM-L6-v2'):
+    SNAPSHOT_VERSION = 3  # 2: embeddings of whitespace-normalized size-agnostic names, 3: generation directories
+    
+    def __init__(self, model_name: str = 'all-MiniLM-L6-v2',
+                 attribute_store: ProductAttributeStore = None,
+                 embedding_cache_path: str = None):
         """
         Initialize semantic matcher.
         
         Args:
             model_name: Sentence Transformer model name
+            attribute_store: Shared attribute store (default: a private store)
+            embedding_cache_path: Directory of the on-disk embedding cache
+                (default: from config; None disables the cache)
         """
         print(f"Loading Sentence Transformer model: {model_name}")
+        self.model_name = model_name
         self.model = SentenceTransformer(model_name)
         self.dimension = self.model.get_sentence_embedding_dimension()
         
+        self.attribute_store = attribute_store or ProductAttributeStore()
+        
+        embedding_cache_path = embedding_cache_path or config.EMBEDDING_CACHE_PATH
+        self.embedding_cache = EmbeddingCache(embedding_cache_path, model_name) if embedding_cache_path else None
+        
         self.index = None
         self.products = {}
         self.product_ids = []
+        self.id_to_row = {}  # productID -> row in the embedding matrix
         self.embeddings = None
+        self.mmapped = False  # embeddings and index are read-only maps of a snapshot
+        
+        # Precomputed all-pairs kNN (see precompute_neighbours())
+        self.neighbours = None  # row -> neighbour rows, most similar first (-1: none)
+        self.neighbour_similarities = None  # row -> neighbour cosine similarities
+        self.neighbour_min_similarity = None
         
         print(f"Model loaded. Embedding dimension: {self.dimension}")
     
@@ -47,6 +74,25 @@ class SemanticMatcher:
         size_info = extract_size_info(product_name)
         return size_info['name_without_size']
     
+    def encode_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts with the Sentence Transformer model.
+        
+        Args:
+            texts: List of texts
+            
+        Returns:
+            float32 array of shape (len(texts), dimension)
+        """
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        
+        return np.asarray(self.model.encode(
+            texts,
+            show_progress_bar=True,
+            batch_size=32
+        ), dtype=np.float32)
+    
     def generate_embeddings(self, products: List[Dict]) -> np.ndarray:
         """
         Generate embeddings for all products.
@@ -63,17 +109,22 @@ class SemanticMatcher:
         size_agnostic_names = []
         for product in products:
             name = self.create_size_agnostic_name(product['productName'])
-            size_agnostic_names.append(name)
+            size_agnostic_names.append(normalize_text(name))
         
-        embeddings = self.model.encode(
-            size_agnostic_names,
-            show_progress_bar=True,
-            batch_size=32
-        )
+        # Encode each distinct name once; the cache skips names encoded in earlier runs
+        unique_names = list(dict.fromkeys(size_agnostic_names))
+        
+        if self.embedding_cache is not None:
+            unique_embeddings = self.embedding_cache.get_or_encode(unique_names, self.encode_texts)
+        else:
+            unique_embeddings = self.encode_texts(unique_names)
+        
+        name_to_row = {name: row for row, name in enumerate(unique_names)}
+        embeddings = unique_embeddings[[name_to_row[name] for name in size_agnostic_names]]
         
         elapsed_time = time.time() - start_time
         print(f"Embeddings generated in {elapsed_time:.2f} seconds")
-        print(f"  Average: {elapsed_time/len(products)*1000:.2f} ms per product")
+        print(f"  Average: {elapsed_time/max(len(products), 1)*1000:.2f} ms per product")
         
         return embeddings
     
@@ -89,27 +140,254 @@ class SemanticMatcher:
         
         self.products = {p['productID']: p for p in products}
         self.product_ids = [p['productID'] for p in products]
+        self.id_to_row = {pid: row for row, pid in enumerate(self.product_ids)}
+        
+        self.attribute_store.build(products)
         
         self.embeddings = self.generate_embeddings(products)
         
         faiss.normalize_L2(self.embeddings)
         
-        self.index = faiss.IndexFlatIP(self.dimension)
-        self.index.add(self.embeddings)
+        self._rebuild_index()
+        self.mmapped = False
         
         elapsed_time = time.time() - start_time
         print(f"FAISS index built in {elapsed_time:.2f} seconds")
         print(f"  Index size: {self.index.ntotal} vectors")
     
+    def _rebuild_index(self) -> None:
+        """Rebuild the FAISS index from the embedding matrix (rows stay aligned)."""
+        self.index = faiss.IndexFlatIP(self.dimension)
+        self.index.add(self.embeddings)
+        self.neighbours = None
+    
+    def _materialize(self) -> None:
+        """Copy memory-mapped snapshot data into memory before modifying it."""
+        if self.mmapped:
+            self.embeddings = np.array(self.embeddings)
+            self._rebuild_index()
+            self.mmapped = False
+    
+    def catalog_hash(self) -> str:
+        """
+        Hash of the indexed products (productID and name, in row order).
+        
+        Returns:
+            Hex digest string
+        """
+        digest = hashlib.sha256()
+        for product_id in self.product_ids:
+            digest.update(f"{product_id}\t{self.products[product_id]['productName']}\n".encode('utf-8'))
+        return digest.hexdigest()
+    
+    def save_snapshot(self, path: str) -> None:
+        """
+        Save the embedding matrix, FAISS index and product-ID mapping to a snapshot directory.
+        Files go to a new generation that the manifest points to once complete, so an
+        interrupted save leaves the previous snapshot readable and a load never mixes
+        the embeddings, index and product list of two saves.
+        
+        Args:
+            path: Snapshot directory (created if missing)
+        """
+        generation = new_generation(path)
+        
+        with open(os.path.join(path, generation, 'embeddings.npy'), 'wb') as f:
+            np.save(f, np.asarray(self.embeddings, dtype=np.float32))
+        
+        faiss.write_index(self.index, os.path.join(path, generation, 'index.faiss'))
+        
+        with open(os.path.join(path, generation, 'products.json'), 'w', encoding='utf-8') as f:
+            json.dump([[pid, self.products[pid]['productName']] for pid in self.product_ids], f)
+        
+        publish(path, generation, {
+            'version': self.SNAPSHOT_VERSION,
+            'model_name': self.model_name,
+            'dimension': self.dimension,
+            'num_products': len(self.product_ids),
+            'catalog_hash': self.catalog_hash(),
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+        })
+        
+        print(f"Saved FAISS snapshot of {len(self.product_ids)} products to {path}")
+    
+    def load_snapshot(self, path: str, mmap: bool = True) -> str:
+        """
+        Load a snapshot written by save_snapshot() into an empty matcher.
+        Missing snapshots and snapshots from a different version, model or embedding dimension are ignored.
+        Loaded products only carry productID and productName until they are
+        refreshed with upsert_products() or sync_products().
+        
+        Args:
+            path: Snapshot directory
+            mmap: Memory-map the embeddings and index read-only, so processes
+                loading the same snapshot share one copy (copied on first update)
+            
+        Returns:
+            Catalog hash recorded in the snapshot, or None if it was ignored
+        """
+        if self.product_ids:
+            raise ValueError("Snapshots can only be loaded into an empty index")
+        
+        manifest = read_manifest(path)
+        if manifest is None:
+            print(f"Ignoring FAISS snapshot {path}: no readable manifest")
+            return None
+        
+        if manifest.get('version') != self.SNAPSHOT_VERSION or manifest.get('model_name') != self.model_name \
+                or manifest.get('dimension') != self.dimension:
+            print(f"Ignoring FAISS snapshot {path}: version {manifest.get('version')}, "
+                  f"model {manifest.get('model_name')}, dimension {manifest.get('dimension')}")
+            return None
+        
+        start_time = time.time()
+        
+        try:
+            embeddings = np.load(generation_file(path, manifest, 'embeddings.npy'), mmap_mode='r' if mmap else None)
+            index_flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if mmap else 0
+            index = faiss.read_index(generation_file(path, manifest, 'index.faiss'), index_flags)
+            with open(generation_file(path, manifest, 'products.json'), 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError, RuntimeError) as e:
+            # faiss reports unreadable files as RuntimeError
+            print(f"Ignoring FAISS snapshot {path}: {e}")
+            return None
+        
+        if embeddings.shape != (len(entries), self.dimension) or index.ntotal != len(entries) \
+                or len(entries) != manifest.get('num_products'):
+            print(f"Ignoring FAISS snapshot {path}: embeddings or index do not match product list")
+            return None
+        
+        self.products = {pid: {'productID': pid, 'productName': name} for pid, name in entries}
+        self.product_ids = [pid for pid, _ in entries]
+        self.id_to_row = {pid: row for row, pid in enumerate(self.product_ids)}
+        self.embeddings = embeddings
+        self.index = index
+        self.mmapped = mmap
+        self.neighbours = None
+        
+        elapsed_time = time.time() - start_time
+        print(f"Loaded FAISS snapshot of {len(entries)} products from {path} in {elapsed_time:.2f} seconds")
+        return manifest['catalog_hash']
+    
+    def upsert_products(self, products: List[Dict]) -> Dict:
+        """
+        Add new products and update existing ones without re-encoding the catalog.
+        Renamed products keep their row, new products are appended.
+        
+        Args:
+            products: List of product dictionaries
+            
+        Returns:
+            Dictionary with counts of added, updated, and unchanged products
+        """
+        added = []
+        updated = []
+        
+        products = {p['productID']: p for p in products}
+        for product_id, product in products.items():
+            current = self.products.get(product_id)
+            if current is None:
+                added.append(product)
+            elif current['productName'] != product['productName']:
+                updated.append(product)
+        
+        changed = updated + added
+        if changed:
+            self._materialize()
+            print(f"\nUpdating FAISS index: {len(added)} new, {len(updated)} renamed products...")
+            
+            self.attribute_store.build(changed, prune=False)
+            embeddings = self.generate_embeddings(changed)
+            faiss.normalize_L2(embeddings)
+            
+            if updated:
+                rows = [self.id_to_row[p['productID']] for p in updated]
+                self.embeddings[rows] = embeddings[:len(updated)]
+            
+            first_row = len(self.product_ids)
+            for i, product in enumerate(added):
+                self.id_to_row[product['productID']] = first_row + i
+            self.product_ids.extend(p['productID'] for p in added)
+            self.embeddings = np.concatenate([self.embeddings, embeddings[len(updated):]])
+            
+            if updated:
+                self._rebuild_index()
+            else:
+                self.index.add(embeddings)
+                self.neighbours = None
+        
+        self.products.update(products)
+        
+        return {
+            'added': len(added),
+            'updated': len(updated),
+            'unchanged': len(products) - len(changed)
+        }
+    
+    def remove_products(self, product_ids: Iterable[str]) -> int:
+        """
+        Remove products from the index, compacting rows.
+        
+        Args:
+            product_ids: Product IDs to remove (unknown IDs are ignored)
+            
+        Returns:
+            Number of products removed
+        """
+        removed = [pid for pid in dict.fromkeys(product_ids) if pid in self.id_to_row]
+        if not removed:
+            return 0
+        
+        self._materialize()
+        keep = np.ones(len(self.product_ids), dtype=bool)
+        keep[[self.id_to_row[pid] for pid in removed]] = False
+        
+        # FAISS flat indices compact removed ids the same way
+        self.index.remove_ids(np.flatnonzero(~keep).astype(np.int64))
+        self.neighbours = None
+        
+        self.embeddings = self.embeddings[keep]
+        self.product_ids = [pid for pid, kept in zip(self.product_ids, keep) if kept]
+        self.id_to_row = {pid: row for row, pid in enumerate(self.product_ids)}
+        
+        for product_id in removed:
+            del self.products[product_id]
+        
+        print(f"Removed {len(removed)} products from FAISS index")
+        return len(removed)
+    
+    def sync_products(self, products: List[Dict]) -> Dict:
+        """
+        Bring the index in line with a full catalog: upsert every product
+        and remove indexed products that are no longer in the catalog.
+        
+        Args:
+            products: Complete list of product dictionaries
+            
+        Returns:
+            Dictionary with counts of added, updated, unchanged, and removed products
+        """
+        current_ids = {p['productID'] for p in products}
+        removed = self.remove_products([pid for pid in self.product_ids if pid not in current_ids])
+        
+        stats = self.upsert_products(products)
+        stats['removed'] = removed
+        
+        return stats
+    
     def find_similar_products(self, product_id: str, k: int = 50, 
-                             min_similarity: float = 0.85) -> List[Tuple[str, float]]:
+                             min_similarity: float = 0.85,
+                             candidate_ids: List[str] = None) -> List[Tuple[str, float]]:
         """
-        Find similar products using FAISS.
+        Find similar products using FAISS, or among given candidates only.
         
         Args:
             product_id: Product ID to query
             k: Number of candidates to return
             min_similarity: Minimum cosine similarity threshold
+            candidate_ids: Optional product IDs to score instead of searching the whole index
+                (e.g. LSH blocking candidates)
             
         Returns:
             List of (product_id, similarity_score) tuples
@@ -117,23 +395,126 @@ class SemanticMatcher:
         if product_id not in self.products:
             return []
         
-        product_idx = self.product_ids.index(product_id)
+        if candidate_ids is not None:
+            return self.score_candidates(product_id, candidate_ids, k, min_similarity)
+        
+        if self.neighbours is not None and k <= self.neighbours.shape[1] \
+                and min_similarity >= self.neighbour_min_similarity:
+            row = self.id_to_row[product_id]
+            return [
+                (self.product_ids[idx], float(similarity))
+                for idx, similarity in zip(self.neighbours[row, :k], self.neighbour_similarities[row, :k])
+                if idx >= 0 and similarity >= min_similarity
+            ]
+        
+        product_idx = self.id_to_row[product_id]
         
         query_embedding = self.embeddings[product_idx:product_idx+1]
         
         distances, indices = self.index.search(query_embedding, k + 1)
         
-        results = []
-        for idx, distance in zip(indices[0], distances[0]):
-            candidate_id = self.product_ids[idx]
+        # k neighbours besides the product itself, as in search_all()
+        neighbours = [
+            (idx, distance) for idx, distance in zip(indices[0], distances[0])
+            if idx >= 0 and idx != product_idx
+        ][:k]
+        
+        return [
+            (self.product_ids[idx], float(distance))
+            for idx, distance in neighbours
+            if distance >= min_similarity
+        ]
+    
+    def search_all(self, k: int = 50, min_similarity: float = 0.85,
+                   batch_size: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k nearest neighbours of every indexed product in one pass.
+        The whole embedding matrix is searched in large query batches, so FAISS
+        uses multi-threaded matrix products instead of one search per product.
+        
+        Args:
+            k: Neighbours per product (excluding the product itself)
+            min_similarity: Minimum cosine similarity threshold
+            batch_size: Query rows per FAISS search (default: from config)
             
-            if candidate_id == product_id:
-                continue
+        Returns:
+            Tuple of (int64 neighbour rows, float32 similarities), both of shape
+            (num_products, k), most similar first; missing neighbours have row -1
+        """
+        batch_size = batch_size or config.SEMANTIC_SEARCH_BATCH_SIZE
+        num_products = len(self.product_ids)
+        
+        neighbours = np.full((num_products, k), -1, dtype=np.int64)
+        similarities = np.zeros((num_products, k), dtype=np.float32)
+        
+        for start in range(0, num_products, batch_size):
+            end = min(start + batch_size, num_products)
+            distances, indices = self.index.search(self.embeddings[start:end], k + 1)
+            
+            # Drop each product's own row (or the last result if it was not returned)
+            own = indices == np.arange(start, end)[:, np.newaxis]
+            own[~own.any(axis=1), -1] = True
+            keep = ~own
+            
+            rows = indices[keep].reshape(end - start, k)
+            scores = distances[keep].reshape(end - start, k)
+            
+            rows[scores < min_similarity] = -1
+            neighbours[start:end] = rows
+            similarities[start:end] = np.where(rows >= 0, scores, 0)
+        
+        return neighbours, similarities
+    
+    def precompute_neighbours(self, k: int = 50, min_similarity: float = 0.85,
+                              batch_size: int = None) -> None:
+        """
+        Run search_all() once; find_similar_products() then reads its results
+        for any k and threshold it covers instead of searching FAISS per product.
+        
+        Args:
+            k: Neighbours per product
+            min_similarity: Minimum cosine similarity threshold
+            batch_size: Query rows per FAISS search (default: from config)
+        """
+        print(f"\nPrecomputing {k} nearest neighbours for {len(self.product_ids)} products...")
+        start_time = time.time()
+        
+        self.neighbours, self.neighbour_similarities = self.search_all(k, min_similarity, batch_size)
+        self.neighbour_min_similarity = min_similarity
+        
+        elapsed_time = time.time() - start_time
+        print(f"Neighbours computed in {elapsed_time:.2f} seconds")
+    
+    def score_candidates(self, product_id: str, candidate_ids: List[str], k: int = 50,
+                         min_similarity: float = 0.85) -> List[Tuple[str, float]]:
+        """
+        Score a product against a fixed candidate list with one matrix-vector product.
+        
+        Args:
+            product_id: Product ID to query
+            candidate_ids: Candidate product IDs
+            k: Number of candidates to return
+            min_similarity: Minimum cosine similarity threshold
             
-            if distance >= min_similarity:
-                results.append((candidate_id, float(distance)))
+        Returns:
+            List of (product_id, similarity_score) tuples, most similar first
+        """
+        rows = np.array([
+            self.id_to_row[cid] for cid in candidate_ids
+            if cid in self.id_to_row and cid != product_id
+        ], dtype=np.int64)
+        
+        if len(rows) == 0:
+            return []
+        
+        similarities = self.embeddings[rows] @ self.embeddings[self.id_to_row[product_id]]
+        
+        order = np.argsort(-similarities, kind='stable')[:k]
         
-        return results
+        return [
+            (self.product_ids[rows[i]], float(similarities[i]))
+            for i in order if similarities[i] >= min_similarity
+        ]
     
     def verify_brand_match(self, product1: Dict, product2: Dict) -> bool:
         """
@@ -146,8 +527,8 @@ class SemanticMatcher:
         Returns:
             True if brands match, False otherwise
         """
-        attrs1 = extract_product_attributes(product1['productName'])
-        attrs2 = extract_product_attributes(product2['productName'])
+        attrs1 = self.attribute_store.get(product1)
+        attrs2 = self.attribute_store.get(product2)
         
         return fuzzy_brand_match(attrs1['brand'], attrs2['brand'])
     
@@ -164,8 +545,8 @@ class SemanticMatcher:
         Returns:
             Confidence score (0.0 to 1.0)
         """
-        attrs1 = extract_product_attributes(product1['productName'])
-        attrs2 = extract_product_attributes(product2['productName'])
+        attrs1 = self.attribute_store.get(product1)
+        attrs2 = self.attribute_store.get(product2)
         
         if attrs1['size'] == attrs2['size'] and attrs1['unit'] == attrs2['unit']:
             return similarity_score
@@ -173,7 +554,8 @@ class SemanticMatcher:
             return similarity_score * 0.95
     
     def get_semantic_matches(self, product_id: str, k: int = 50, 
-                            min_similarity: float = 0.85) -> List[Dict]:
+                            min_similarity: float = 0.85,
+                            candidate_ids: List[str] = None) -> List[Dict]:
         """
         Get semantic matches for a product with brand verification.
         
@@ -181,6 +563,7 @@ class SemanticMatcher:
             product_id: Product ID to query
             k: Number of candidates to consider
             min_similarity: Minimum similarity threshold
+            candidate_ids: Optional product IDs to restrict scoring and brand verification to
             
         Returns:
             List of match dictionaries with confidence scores
@@ -190,7 +573,7 @@ class SemanticMatcher:
         
         product = self.products[product_id]
         
-        similar_products = self.find_similar_products(product_id, k, min_similarity)
+        similar_products = self.find_similar_products(product_id, k, min_similarity, candidate_ids)
         
         matches = []
         for candidate_id, similarity in similar_products:
@@ -227,7 +610,9 @@ class SemanticMatcher:
         total_matches = 0
         
         for product_id in list(self.products.keys())[:100]:
-            matches = self.get_semantic_matches(product_id, k=20, min_similarity=0.85)
+            matches = self.get_semantic_matches(
+                product_id, k=config.SEMANTIC_TOP_K, min_similarity=config.SEMANTIC_MIN_SIMILARITY
+            )
             if matches:
                 products_with_matches += 1
                 total_matches += len(matches)
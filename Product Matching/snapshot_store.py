@@ -0,0 +1,96 @@
+"""
+Generation directories for index snapshots.
+Each save writes its files into a fresh generation directory and then atomically
+replaces manifest.json, which names the current generation. Files of a published
+generation are never rewritten, so a reader never mixes files of two saves.
+"""
+from typing import Dict, Optional
+import glob
+import json
+import os
+import shutil
+
+
+MANIFEST_FILE = 'manifest.json'
+GENERATION_PREFIX = 'generation-'
+
+
+def new_generation(path: str) -> str:
+    """
+    Create the directory for the next snapshot generation.
+    
+    Args:
+        path: Snapshot directory (created if missing)
+    
+    Returns:
+        Name of the new generation (a subdirectory of path)
+    """
+    os.makedirs(path, exist_ok=True)
+    
+    numbers = [
+        int(os.path.basename(directory)[len(GENERATION_PREFIX):])
+        for directory in glob.glob(os.path.join(path, GENERATION_PREFIX + '*'))
+        if os.path.basename(directory)[len(GENERATION_PREFIX):].isdigit()
+    ]
+    generation = f"{GENERATION_PREFIX}{max(numbers, default=0) + 1:06d}"
+    
+    # A leftover directory of an interrupted save is never referenced, so start it afresh
+    shutil.rmtree(os.path.join(path, generation), ignore_errors=True)
+    os.makedirs(os.path.join(path, generation))
+    return generation
+
+
+def publish(path: str, generation: str, manifest: Dict) -> None:
+    """
+    Make a fully written generation current, then delete older generations.
+    Generations still in use (e.g. memory-mapped on Windows) are left for a later save.
+    
+    Args:
+        path: Snapshot directory
+        generation: Generation returned by new_generation()
+        manifest: Manifest to write (the generation name is added)
+    """
+    manifest_file = os.path.join(path, MANIFEST_FILE)
+    with open(manifest_file + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({**manifest, 'generation': generation}, f, indent=2)
+    os.replace(manifest_file + '.tmp', manifest_file)
+    
+    for directory in glob.glob(os.path.join(path, GENERATION_PREFIX + '*')):
+        if os.path.basename(directory) != generation:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def read_manifest(path: str) -> Optional[Dict]:
+    """
+    Read the manifest of the current generation.
+    
+    Args:
+        path: Snapshot directory
+    
+    Returns:
+        Manifest dictionary, or None if there is no readable snapshot
+    """
+    try:
+        with open(os.path.join(path, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('generation'), str):
+        return None
+    return manifest
+
+
+def generation_file(path: str, manifest: Dict, name: str) -> str:
+    """
+    Get the path of a file in the generation named by a manifest.
+    
+    Args:
+        path: Snapshot directory
+        manifest: Manifest from read_manifest()
+        name: File name within the generation
+    
+    Returns:
+        File path
+    """
+    return os.path.join(path, manifest['generation'], name)
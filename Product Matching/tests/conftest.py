@@ -0,0 +1,67 @@
+"""
+Shared fixtures: small synthetic catalogs in the shape returned by ProductDataLoader.
+"""
+import random
+import pytest
+
+
+BRANDS = ['National', 'Shan', 'Nestle', 'Lays', 'Tapal', 'Lipton', 'Knorr', 'Dettol',
+          'Surf Excel', 'Colgate', 'Olpers', 'Peek Freans', 'Dalda', 'Mitchells']
+PRODUCT_TYPES = ['Banana Jelly', 'Strawberry Jelly', 'Biryani Masala', 'Tikka Masala', 'Classic Chips',
+                 'Green Tea', 'Danedar Tea', 'Chicken Soup', 'Washing Powder', 'Toothpaste',
+                 'Full Cream Milk', 'Cooking Oil', 'Cream Biscuits', 'Ketchup']
+SIZES = ['80gm', '80 g', '160gm', '1kg', '1000g', '500ml', '1.5L', '1 Ltr', '12 pcs', '6 Pack', '6 pack', '']
+EXTRAS = ['', '', '', 'Family Pack', 'Pouch', 'Jar', 'New']
+STORES = ['Al-Fatah', 'Jalal Sons', 'Metro', 'Rahim Store', 'Raja Sahib']
+
+
+def make_products(count: int, seed: int = 0, id_prefix: str = 'p'):
+    """
+    Generate a catalog with repeated names across stores and size/unit spelling variants.
+    
+    Args:
+        count: Number of products
+        seed: Random seed
+        id_prefix: Prefix of the generated product IDs
+    
+    Returns:
+        List of product dictionaries
+    """
+    rng = random.Random(seed)
+    products = []
+    
+    for i in range(count):
+        parts = [rng.choice(BRANDS), rng.choice(PRODUCT_TYPES), rng.choice(EXTRAS), rng.choice(SIZES)]
+        products.append({
+            'productID': f'{id_prefix}{i}',
+            'productName': ' '.join(part for part in parts if part),
+            'availableAt': STORES[i % len(STORES)],
+            'originalPrice': 100 + rng.randint(0, 300),
+            'discountedPrice': 0,
+            'discount': 0
+        })
+    
+    return products
+
+
+@pytest.fixture
+def catalog():
+    """A 400-product catalog."""
+    return make_products(400, seed=1)
+
+
+@pytest.fixture
+def changed_catalog(catalog):
+    """
+    The catalog after a refresh: some products renamed, some removed, some added,
+    and some with only a new price.
+    """
+    products = [dict(p) for p in catalog if int(p['productID'][1:]) % 17 != 0]
+    
+    for i, product in enumerate(products):
+        if i % 11 == 0:
+            product['productName'] = f"{product['productName']} Refill"
+        elif i % 13 == 0:
+            product['originalPrice'] += 5
+    
+    return products + make_products(30, seed=2, id_prefix='new')
@@ -0,0 +1,90 @@
+"""
+Attribute store: parsed attributes, persistence across runs and pruning of
+products that left the catalog.
+"""
+import json
+
+import attribute_store
+from attribute_store import ProductAttributeStore
+from preprocessing import extract_product_attributes
+
+
+def test_attributes_match_single_product_parser(catalog):
+    store = ProductAttributeStore()
+    store.build(catalog + [dict(catalog[0], productID='copy')])
+    
+    for product in catalog:
+        attrs = store.get(product)
+        expected = extract_product_attributes(product['productName'])
+        assert {key: attrs[key] for key in expected} == expected
+    
+    # Products missing from the store are parsed on demand
+    unseen = {'productID': 'unseen', 'productName': 'Knorr Chicken Soup 55gm'}
+    assert store.get(unseen)['brand'] == extract_product_attributes(unseen['productName'])['brand']
+
+
+def test_persisted_attributes_are_reused(catalog, tmp_path):
+    path = str(tmp_path / 'attributes.json')
+    ProductAttributeStore(path=path).build(catalog)
+    
+    store = ProductAttributeStore(path=path)
+    assert store.load() == len(catalog)
+    
+    store.build(catalog)
+    for product in catalog:
+        store.get(product)
+    assert store.misses == 0
+
+
+def test_truncated_store_is_a_cold_cache(catalog, tmp_path):
+    path = str(tmp_path / 'attributes.json')
+    ProductAttributeStore(path=path).build(catalog)
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content[:len(content) // 2])
+    
+    store = ProductAttributeStore(path=path)
+    assert store.load() == 0
+    
+    store.build(catalog)
+    assert len(store.attributes) == len(catalog)
+    assert ProductAttributeStore(path=path).load() == len(catalog)
+
+
+def test_other_store_version_is_ignored(catalog, tmp_path):
+    path = str(tmp_path / 'attributes.json')
+    ProductAttributeStore(path=path).build(catalog)
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    data['version'][0] += 1
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    
+    assert ProductAttributeStore(path=path).load() == 0
+
+
+def test_other_parser_version_is_ignored(catalog, tmp_path, monkeypatch):
+    path = str(tmp_path / 'attributes.json')
+    ProductAttributeStore(path=path).build(catalog)
+    
+    monkeypatch.setattr(attribute_store, 'PARSER_VERSION', attribute_store.PARSER_VERSION + 1)
+    assert ProductAttributeStore(path=path).load() == 0
+
+
+def test_products_leaving_the_catalog_are_dropped(catalog, changed_catalog, tmp_path):
+    path = str(tmp_path / 'attributes.json')
+    ProductAttributeStore(path=path).build(catalog)
+    
+    store = ProductAttributeStore(path=path)
+    store.build(changed_catalog)
+    assert set(store.attributes) == {p['productID'] for p in changed_catalog}
+    assert ProductAttributeStore(path=path).load() == len(changed_catalog)
+    
+    # Building part of the catalog keeps the rest
+    store.build(changed_catalog[:10], prune=False)
+    assert len(store.attributes) == len(changed_catalog)
+    
+    # A pure removal is persisted too
+    store.build(changed_catalog[:-5])
+    assert ProductAttributeStore(path=path).load() == len(changed_catalog) - 5
@@ -0,0 +1,288 @@
+"""
+Candidate generation: pair streaming against the per-product candidate lists,
+and the array-backed and sorted engines against a fresh ProductBlocker / rebuild.
+"""
+from types import SimpleNamespace
+import inspect
+import numpy as np
+import pytest
+from datasketch import MinHash
+from datasketch.lsh import _optimal_param
+
+import config
+from array_blocking import ArrayLSHBlocker, optimal_band_params
+from blocking import CandidateBlocker, MinHashSignatureMixin, ProductBlocker, minhash_signatures
+from preprocessing import clean_product_name, generate_ngram_hashes, generate_ngrams
+from sorted_blocking import SortedNeighbourhoodBlocker
+
+
+ALL = 10 ** 6  # max_candidates that never truncates
+
+# datasketch 2 defaults to a 32-bit scheme; blocking.py reproduces the original one
+MINHASH_SCHEME = {'scheme': 'legacy'} if 'scheme' in inspect.signature(MinHash).parameters else {}
+
+
+def candidate_ids(blocker, max_candidates=ALL):
+    """productID -> set of candidate productIDs, as returned by query_candidates()."""
+    return {
+        pid: {c['productID'] for c in blocker.query_candidates(pid, max_candidates)}
+        for pid in blocker.product_ids
+    }
+
+
+def baseline_pairs(blocker, max_candidates):
+    """Union of all (product, candidate) pairs, one per unordered pair."""
+    pairs = set()
+    for pid in blocker.product_ids:
+        for candidate in blocker.query_candidates(pid, max_candidates):
+            pairs.add(tuple(sorted((pid, candidate['productID']))))
+    return pairs
+
+
+def streamed_pairs(blocker, max_candidates, chunk_size):
+    """All pairs from iter_candidate_pairs() as sorted productID tuples (duplicates kept)."""
+    pairs = []
+    for left, right in blocker.iter_candidate_pairs(max_candidates, chunk_size=chunk_size):
+        assert len(left) == len(right)
+        for a, b in zip(blocker.products_at(left), blocker.products_at(right)):
+            pairs.append(tuple(sorted((a['productID'], b['productID']))))
+    return pairs
+
+
+def make_blocker(engine, **kwargs):
+    if engine == 'lsh':
+        return ProductBlocker(**kwargs)
+    if engine == 'array':
+        return ArrayLSHBlocker(**kwargs)
+    return SortedNeighbourhoodBlocker(**kwargs)
+
+
+@pytest.mark.parametrize('engine', ['lsh', 'array', 'sorted'])
+@pytest.mark.parametrize('cross_store_only', [False, True])
+@pytest.mark.parametrize('ranked', [False, True])
+@pytest.mark.parametrize('max_candidates', [3, 10, ALL])
+def test_pair_stream_matches_candidate_lists(catalog, engine, cross_store_only, ranked, max_candidates):
+    blocker = make_blocker(engine, cross_store_only=cross_store_only, ranked=ranked)
+    blocker.build_index(catalog)
+    
+    expected = baseline_pairs(blocker, max_candidates)
+    
+    for chunk_size in (1, 7, 100000):
+        pairs = streamed_pairs(blocker, max_candidates, chunk_size)
+        assert len(pairs) == len(set(pairs)), "a pair was emitted twice"
+        assert set(pairs) == expected
+    
+    assert blocker.get_statistics()['actual_candidate_pairs'] == len(expected)
+
+
+def test_get_all_candidate_pairs_matches_stream(catalog):
+    blocker = ProductBlocker()
+    blocker.build_index(catalog)
+    
+    pairs = {
+        tuple(sorted((a['productID'], b['productID'])))
+        for a, b in blocker.get_all_candidate_pairs(10)
+    }
+    
+    assert pairs == set(streamed_pairs(blocker, 10, 100000))
+
+
+def reference_statistics(blocker, max_candidates):
+    """The counting fields of get_statistics(), from one query per product."""
+    counts = [len(blocker.query_candidates(pid, max_candidates)) for pid in blocker.product_ids]
+    truncated = sum(1 for pid in blocker.product_ids if len(blocker.query_candidates(pid, ALL)) > max_candidates)
+    return {
+        'total_products': len(counts),
+        'avg_candidates_per_product': float(np.mean(counts)),
+        'max_candidates_per_product': max(counts),
+        'truncated_products': truncated,
+        'candidate_limit': max_candidates,
+        'actual_candidate_pairs': len(baseline_pairs(blocker, max_candidates))
+    }
+
+
+@pytest.mark.parametrize('engine', ['lsh', 'array', 'sorted'])
+def test_statistics_are_cached_from_the_pair_pass(catalog, changed_catalog, engine, monkeypatch):
+    blocker = make_blocker(engine, cross_store_only=True)
+    blocker.build_index(catalog)
+    
+    for _ in blocker.iter_candidate_pairs(5):
+        pass
+    expected = reference_statistics(blocker, 5)
+    
+    # A complete pass is reused without querying the index again
+    with monkeypatch.context() as patch:
+        patch.setattr(blocker, 'query_rows', lambda row: pytest.fail("statistics were recomputed"))
+        stats = blocker.get_statistics()
+    assert {key: stats[key] for key in expected} == expected
+    sizes, _ = blocker.bucket_summary()
+    assert stats['total_buckets'] == len(sizes)
+    assert sum(stats['bucket_size_distribution'].values()) == len(sizes)
+    
+    # Any change to the index invalidates them
+    blocker.sync_products(changed_catalog)
+    stats = blocker.get_statistics()
+    expected = reference_statistics(blocker, 200)
+    assert {key: stats[key] for key in expected} == expected
+
+
+def test_lsh_engines_report_the_same_buckets(catalog):
+    blocker = ProductBlocker()
+    blocker.build_index(catalog)
+    array_blocker = ArrayLSHBlocker()
+    array_blocker.build_index(catalog)
+    
+    stats = blocker.get_statistics()
+    array_stats = array_blocker.get_statistics()
+    for key in ('total_buckets', 'bucket_size_distribution', 'actual_candidate_pairs'):
+        assert stats[key] == array_stats[key]
+    assert [b['size'] for b in stats['largest_buckets']] == [b['size'] for b in array_stats['largest_buckets']]
+
+
+def datasketch_minhash(product_name, num_perm, n_gram_size):
+    """datasketch MinHash of the cleaned name's n-grams, hashed like generate_ngram_hashes()."""
+    minhash = MinHash(num_perm=num_perm, seed=1, **MINHASH_SCHEME,
+                      hashfunc=lambda ngram: int(generate_ngram_hashes(ngram, len(ngram))[0]))
+    for ngram in generate_ngrams(clean_product_name(product_name), n_gram_size):
+        minhash.update(ngram)
+    return minhash.hashvalues
+
+
+@pytest.mark.parametrize('n_gram_size', [3, 4])
+def test_signature_matrix_matches_single_signatures(catalog, monkeypatch, n_gram_size):
+    # Small batches put batch boundaries and names without n-grams inside the catalog
+    monkeypatch.setattr(config, 'SIGNATURE_BATCH_SIZE', 7)
+    names = [p['productName'] for p in catalog[:60]] + ['', '!!', 'ab', 'Tapal Danedar Tea 1KG']
+    blocker = ProductBlocker(num_perm=64, n_gram_size=n_gram_size)
+    
+    signatures = minhash_signatures(names, blocker.permutations, n_gram_size)
+    assert signatures.shape == (len(names), 64)
+    for name, signature in zip(names, signatures):
+        assert np.array_equal(signature, blocker.create_minhash(name).hashvalues), name
+        assert np.array_equal(signature, datasketch_minhash(name, 64, n_gram_size)), name
+
+
+@pytest.mark.parametrize('threshold', [0.3, 0.5, 0.7, 0.9])
+@pytest.mark.parametrize('num_perm', [64, 128, 256])
+def test_band_params_match_datasketch(threshold, num_perm):
+    assert optimal_band_params(threshold, num_perm) == _optimal_param(threshold, num_perm, 0.5, 0.5)
+
+
+@pytest.mark.parametrize('threshold', [0.3, 0.5, 0.8])
+def test_array_blocker_matches_product_blocker(catalog, threshold):
+    reference = ProductBlocker(threshold=threshold)
+    reference.build_index(catalog)
+    blocker = ArrayLSHBlocker(threshold=threshold)
+    blocker.build_index(catalog)
+    
+    assert (blocker.bands, blocker.rows_per_band) == (reference.lsh.b, reference.lsh.r)
+    assert candidate_ids(blocker) == candidate_ids(reference)
+
+
+@pytest.mark.parametrize('engine', ['lsh', 'array', 'sorted'])
+def test_sync_matches_fresh_build(catalog, changed_catalog, engine):
+    blocker = make_blocker(engine)
+    blocker.build_index(catalog)
+    stats = blocker.sync_products(changed_catalog)
+    
+    fresh = make_blocker(engine)
+    fresh.build_index(changed_catalog)
+    
+    assert stats['removed'] == len(catalog) - (len(changed_catalog) - 30)
+    assert blocker.products == fresh.products
+    assert candidate_ids(blocker) == candidate_ids(fresh)
+
+
+@pytest.mark.parametrize('engine', ['lsh', 'array', 'sorted'])
+def test_cross_store_filter_follows_updates(catalog, changed_catalog, engine):
+    blocker = make_blocker(engine, cross_store_only=True)
+    blocker.build_index(catalog)
+    
+    # Products that only moved to another store keep their row but change their store code
+    moved = [dict(p, availableAt='Carrefour') for p in changed_catalog[::7]]
+    blocker.sync_products(changed_catalog)
+    blocker.upsert_products(moved)
+    
+    assert len(blocker.store_codes) == len(blocker.product_ids)
+    for pid, row in blocker.id_to_row.items():
+        rows = blocker.query_rows(row)
+        rows = rows[rows != row]
+        store = blocker.products[pid].get('availableAt')
+        expected = {r for r in rows.tolist() if blocker.products_at([r])[0].get('availableAt') != store}
+        assert set(blocker._other_stores(row, rows).tolist()) == expected
+    
+    fresh = make_blocker(engine, cross_store_only=True)
+    fresh.build_index([blocker.products[pid] for pid in blocker.product_ids])
+    assert candidate_ids(blocker) == candidate_ids(fresh)
+
+
+def test_sorted_blocker_has_no_snapshot(catalog, tmp_path):
+    blocker = SortedNeighbourhoodBlocker()
+    blocker.build_index(catalog)
+    blocker.save_snapshot(str(tmp_path))
+    
+    assert SortedNeighbourhoodBlocker().load_snapshot(str(tmp_path)) == 0
+    assert not any(tmp_path.iterdir())
+
+
+def test_query_top_k_is_ranked(catalog):
+    blocker = ArrayLSHBlocker()
+    blocker.build_index(catalog)
+    
+    for pid in blocker.product_ids[:50]:
+        similarities = [similarity for _, similarity in blocker.query_top_k(pid, k=5)]
+        assert len(similarities) <= 5
+        assert similarities == sorted(similarities, reverse=True)
+        assert np.all(np.array(similarities) >= 0)
+
+
+def bucket_members(blocker):
+    """Per band, the sorted (bucket key, productID) pairs of the array buckets."""
+    assert np.all(np.diff(blocker.band_keys.astype(object), axis=1) >= 0)
+    for band in range(blocker.bands):
+        assert np.array_equal(blocker.band_rows[band, blocker.band_positions[band]],
+                              np.arange(len(blocker.product_ids)))
+    return [
+        sorted(zip(keys.tolist(), (blocker.product_ids[row] for row in rows.tolist())))
+        for keys, rows in zip(blocker.band_keys, blocker.band_rows)
+    ]
+
+
+def test_array_blocker_updates_buckets_without_resorting(catalog, changed_catalog, monkeypatch):
+    blocker = ArrayLSHBlocker()
+    blocker.build_index(catalog)
+    
+    def resort():
+        raise AssertionError("band buckets were rebuilt")
+    monkeypatch.setattr(blocker, '_build_buckets', resort)
+    blocker.sync_products(changed_catalog)
+    
+    fresh = ArrayLSHBlocker()
+    fresh.build_index(changed_catalog)
+    
+    assert bucket_members(blocker) == bucket_members(fresh)
+
+
+def test_lsh_engines_share_the_candidate_blocker_state():
+    base = SimpleNamespace()
+    CandidateBlocker.__init__(base)
+    
+    for blocker in (ProductBlocker(), ArrayLSHBlocker(), SortedNeighbourhoodBlocker()):
+        assert isinstance(blocker, CandidateBlocker)
+        assert set(vars(base)) <= set(vars(blocker))
+    assert not isinstance(ArrayLSHBlocker(), ProductBlocker)
+
+
+def test_incomplete_engines_cannot_be_created():
+    with pytest.raises(TypeError):
+        CandidateBlocker()
+    
+    class WithoutBuckets(MinHashSignatureMixin, CandidateBlocker):
+        def query_rows(self, row):
+            return np.array([row])
+        
+        def bucket_summary(self, top=5):
+            return np.empty(0), []
+    
+    with pytest.raises(TypeError, match='_insert_signatures'):
+        WithoutBuckets()
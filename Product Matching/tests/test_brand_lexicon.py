@@ -0,0 +1,128 @@
+"""
+Aho-Corasick brand lexicon against the naive scans it replaces.
+"""
+import os
+import random
+import pytest
+
+import preprocessing
+from brand_lexicon import BrandLexicon, KeywordAutomaton
+from preprocessing import BRAND_ALIASES, COMMON_BRANDS, clean_product_name, extract_brand
+
+
+KEYWORDS = ['he', 'she', 'his', 'hers', 'a', 'ab', 'abc', 'bc', 'c', 'shan', 'shan foods', 'an']
+
+
+def random_texts(alphabet, count, seed=0, max_length=30):
+    rng = random.Random(seed)
+    return [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, max_length))) for _ in range(count)]
+
+
+def naive_matches(keywords, text):
+    """Set of (end_position, keyword) of every occurrence."""
+    return {
+        (start + len(keyword), keyword)
+        for keyword in keywords
+        for start in range(len(text) - len(keyword) + 1)
+        if text.startswith(keyword, start)
+    }
+
+
+def baseline_brand_options(tokens):
+    """
+    Every brand the original extract_brand() loop could return: partial matches were
+    taken from an unordered set, so any matching brand was a possible answer.
+    """
+    for length in [3, 2, 1]:
+        if len(tokens) >= length:
+            potential_brand = ' '.join(tokens[:length])
+            if potential_brand in COMMON_BRANDS:
+                return {BRAND_ALIASES.get(potential_brand, potential_brand)}
+            partial = {
+                BRAND_ALIASES.get(brand, brand) for brand in COMMON_BRANDS
+                if potential_brand.startswith(brand) or brand.startswith(potential_brand)
+            }
+            if partial:
+                return partial
+    return {tokens[0]} if tokens else {''}
+
+
+def reference_brand(tokens):
+    """The deterministic choice: longest brand prefixing the text, else the shortest completion."""
+    if not tokens:
+        return ''
+    text = ' '.join(tokens[:3])
+    prefixes = [brand for brand in COMMON_BRANDS if text.startswith(brand)]
+    if prefixes:
+        brand = max(prefixes, key=len)
+        return BRAND_ALIASES.get(brand, brand)
+    for length in [3, 2, 1]:
+        if len(tokens) >= length:
+            cut = ' '.join(tokens[:length])
+            completions = [brand for brand in COMMON_BRANDS if brand.startswith(cut)]
+            if completions:
+                brand = min(completions, key=lambda b: (len(b), b))
+                return BRAND_ALIASES.get(brand, brand)
+    return tokens[0]
+
+
+def test_find_all_matches_naive_scan():
+    automaton = KeywordAutomaton(KEYWORDS)
+    for text in random_texts('abcehirsnf o', 500):
+        found = {(end, automaton.keywords[index]) for end, index in automaton.iter_matches(text)}
+        assert found == naive_matches(KEYWORDS, text)
+        assert automaton.find_all(text) == {automaton.keyword_index[k] for _, k in found}
+
+
+def test_duplicates_and_empty_keywords_are_skipped():
+    automaton = KeywordAutomaton(['ab', '', 'ab', 'b'])
+    assert automaton.keywords == ['ab', 'b']
+    assert len(automaton) == 2
+    assert automaton.find_first('xab') == 'ab'
+    assert automaton.find_first('xyz') is None
+
+
+def test_find_returns_lowest_index_brand():
+    brands = ['lipton yellow label', 'lipton', 'tapal', 'national']
+    lexicon = BrandLexicon(brands, {'lipton yellow label': 'lipton'})
+    for text in random_texts(['lipton ', 'yellow ', 'label ', 'tapal ', 'nation', 'al ', 'x '], 300, max_length=8):
+        expected = next((brand for brand in brands if brand in text), None)
+        assert lexicon.find(text) == (lexicon.normalize(expected) if expected else None)
+
+
+def test_match_prefix_examples():
+    automaton = KeywordAutomaton(['shan', 'shan foods', 'peek freans', 'rio', 'surf'])
+    assert automaton.match_prefix('shan foods biryani', [4, 10, 18]) == 'shan foods'
+    assert automaton.match_prefix('shan biryani masala', [4, 12, 19]) == 'shan'
+    assert automaton.match_prefix('riomix biscuits', [6, 15]) == 'rio'
+    assert automaton.match_prefix('peek cream', [4, 10]) == 'peek freans'
+    assert automaton.match_prefix('su', [2]) == 'surf'
+    assert automaton.match_prefix('tapal tea', [5, 9]) is None
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_extract_brand_matches_baseline(seed):
+    words = sorted({word for brand in COMMON_BRANDS for word in brand.split()})
+    prefixes = [word[:n] for word in words for n in (1, 2, 3)]
+    rng = random.Random(seed)
+    vocabulary = words + prefixes + ['biryani', 'masala', 'tea', 'jelly', '80gm', 'x']
+    
+    names = [' '.join(rng.choice(vocabulary) for _ in range(rng.randint(1, 5))) for _ in range(2000)]
+    names += ['Shan Foods Biryani Masala', 'LIPTON Yellow-Label Tea', 'Coca Cola 1.5L', 'Head & Shoulders', '']
+    
+    for name in names:
+        tokens = clean_product_name(name).split()
+        brand = extract_brand(name)
+        assert brand in baseline_brand_options(tokens), name
+        assert brand == reference_brand(tokens), name
+
+
+def test_lexicon_is_sorted():
+    assert preprocessing.BRAND_LEXICON.automaton.keywords == sorted(COMMON_BRANDS)
+
+
+def test_recommendation_model_copy_is_identical():
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    copy = os.path.join(os.path.dirname(here), 'Recommendation Model', 'brand_lexicon.py')
+    with open(os.path.join(here, 'brand_lexicon.py'), 'rb') as f, open(copy, 'rb') as g:
+        assert f.read() == g.read()
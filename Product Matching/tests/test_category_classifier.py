@@ -0,0 +1,77 @@
+"""
+Recommendation Model category classifier: the single-scan keyword scorer against
+the original per-category loop.
+"""
+import importlib.util
+import os
+import random
+import pytest
+
+pytest.importorskip('pandas')
+pytest.importorskip('sklearn')
+pytest.importorskip('sentence_transformers')
+
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULE_PATH = os.path.join(os.path.dirname(HERE), 'Recommendation Model', 'feature_extraction_v5.py')
+
+
+@pytest.fixture(scope='module')
+def extractor():
+    # brand_lexicon resolves to the identical copy in this directory
+    spec = importlib.util.spec_from_file_location('feature_extraction_v5', MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.SemanticFeatureExtractorV5()
+
+
+def loop_category(extractor, text):
+    """infer_category_priority() as one substring test per category keyword."""
+    brand = extractor.extract_brand(text)
+    if brand in extractor.brand_category_map:
+        return extractor.brand_category_map[brand]
+    
+    category_scores = {}
+    for category, keywords in extractor.category_keywords.items():
+        if category == 'other':
+            continue
+        score = sum(1 for keyword in keywords if keyword in text.lower())
+        if score > 0:
+            category_scores[category] = score
+    
+    if category_scores:
+        return max(category_scores, key=category_scores.get)
+    return 'other'
+
+
+def loop_parent(extractor, category):
+    for parent, children in extractor.category_hierarchy.items():
+        if category in children:
+            return parent
+    return 'other'
+
+
+def sample_names(extractor, catalog, count=3000, seed=0):
+    keywords = sorted({k for keywords in extractor.category_keywords.values() for k in keywords})
+    vocabulary = keywords + extractor.brands + ['pack', '500ml', 'x', 'new', 'family']
+    rng = random.Random(seed)
+    names = [' '.join(rng.choice(vocabulary) for _ in range(rng.randint(1, 5))) for _ in range(count)]
+    return names + [p['productName'] for p in catalog] + ['', 'SHAN Biryani MASALA', 'Milk Chocolate Biscuit']
+
+
+def test_category_matches_keyword_loop(extractor, catalog):
+    for name in sample_names(extractor, catalog):
+        category = extractor.infer_category_priority(name)
+        assert category == loop_category(extractor, name), name
+        assert extractor.get_parent_category(category) == loop_parent(extractor, category)
+
+
+def test_batch_matches_single_product(extractor, catalog):
+    names = sample_names(extractor, catalog, count=500, seed=1) * 2
+    classified = extractor.infer_categories_batch(names)
+    
+    assert len(classified) == len(names)
+    for name, row in zip(names, classified.itertuples()):
+        category = extractor.infer_category_priority(name)
+        assert (row.brand, row.category, row.parent_category) == \
+            (extractor.extract_brand(name), category, extractor.get_parent_category(category))
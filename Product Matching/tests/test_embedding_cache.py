@@ -0,0 +1,127 @@
+"""
+Embedding cache: hits and misses across runs, shard compaction and eviction.
+"""
+import os
+import zlib
+import numpy as np
+import pytest
+
+from embedding_cache import EmbeddingCache
+
+
+class Encoder:
+    """Deterministic stand-in for the model that records what it was asked to encode."""
+    
+    def __init__(self, dimension=8):
+        self.dimension = dimension
+        self.calls = []
+    
+    def vector(self, text):
+        return np.random.RandomState(zlib.crc32(text.encode('utf-8'))).rand(self.dimension).astype(np.float32)
+    
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([self.vector(text) for text in texts], dtype=np.float32).reshape(-1, self.dimension)
+    
+    def encoded(self):
+        return [text for call in self.calls for text in call]
+
+
+def names(count, prefix='name'):
+    return [f'{prefix} {i}' for i in range(count)]
+
+
+def expected(encoder, texts):
+    return np.array([encoder.vector(text) for text in texts])
+
+
+def shard_count(cache):
+    return len([f for f in os.listdir(cache.path) if f.endswith('.keys.npy')])
+
+
+def test_only_misses_are_encoded_once(tmp_path):
+    encoder = Encoder()
+    cache = EmbeddingCache(str(tmp_path), 'model')
+    texts = names(20) + names(5)
+    
+    assert np.array_equal(cache.get_or_encode(texts, encoder), expected(encoder, texts))
+    assert sorted(encoder.encoded()) == sorted(names(20))
+    assert (cache.hits, cache.misses) == (5, 20)
+    
+    texts = names(30)
+    assert np.array_equal(cache.get_or_encode(texts, encoder), expected(encoder, texts))
+    assert encoder.calls[-1] == names(30)[20:]
+    assert (cache.hits, cache.misses) == (25, 30)
+
+
+def test_entries_persist_per_model(tmp_path):
+    encoder = Encoder()
+    EmbeddingCache(str(tmp_path), 'org/model').get_or_encode(names(10), encoder)
+    
+    reloaded = EmbeddingCache(str(tmp_path), 'org/model')
+    assert len(reloaded) == 10
+    assert np.array_equal(reloaded.get_or_encode(names(10), encoder), expected(encoder, names(10)))
+    assert len(encoder.calls) == 1
+    
+    other = EmbeddingCache(str(tmp_path), 'other-model')
+    other.get_or_encode(names(10), encoder)
+    assert other.misses == 10
+
+
+def test_incomplete_shard_is_ignored(tmp_path):
+    encoder = Encoder()
+    cache = EmbeddingCache(str(tmp_path), 'model')
+    cache.get_or_encode(names(10), encoder)
+    cache.get_or_encode(names(15), encoder)
+    
+    # The second shard lost its key file, as if the process died before writing it
+    os.remove(os.path.join(cache.path, '000001.keys.npy'))
+    
+    reloaded = EmbeddingCache(str(tmp_path), 'model')
+    assert len(reloaded) == 10
+    assert np.array_equal(reloaded.get_or_encode(names(15), encoder), expected(encoder, names(15)))
+    assert encoder.calls[-1] == names(15)[10:]
+
+
+def test_shards_are_merged(tmp_path):
+    encoder = Encoder()
+    cache = EmbeddingCache(str(tmp_path), 'model', max_shards=3)
+    
+    for batch in range(3):
+        cache.get_or_encode(names(5, f'batch {batch}'), encoder)
+    assert shard_count(cache) == 3
+    
+    cache.get_or_encode(names(5, 'batch 3'), encoder)
+    assert shard_count(cache) == 1
+    assert len(cache) == 20
+    
+    reloaded = EmbeddingCache(str(tmp_path), 'model', max_shards=3)
+    texts = [text for batch in range(4) for text in names(5, f'batch {batch}')]
+    assert np.array_equal(reloaded.get_or_encode(texts, encoder), expected(encoder, texts))
+    assert reloaded.misses == 0
+
+
+def test_oldest_unused_entries_are_evicted(tmp_path):
+    encoder = Encoder()
+    EmbeddingCache(str(tmp_path), 'model').get_or_encode(names(20, 'old'), encoder)
+    
+    # A new run uses a few old entries and adds new ones beyond the cap
+    cache = EmbeddingCache(str(tmp_path), 'model', max_entries=25)
+    used = names(20, 'old')[:3]
+    texts = used + names(10, 'new')
+    assert np.array_equal(cache.get_or_encode(texts, encoder), expected(encoder, texts))
+    
+    assert len(cache) == 25
+    assert shard_count(cache) == 1
+    
+    # Entries used by this run survive; the oldest unused ones are gone
+    reloaded = EmbeddingCache(str(tmp_path), 'model', max_entries=25)
+    kept = reloaded.key_to_position
+    assert all(reloaded.key(text) in kept for text in texts)
+    assert [text for text in names(20, 'old') if reloaded.key(text) not in kept] == names(20, 'old')[3:8]
+
+
+def test_empty_request(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), 'model')
+    assert cache.get_or_encode([], Encoder()).shape == (0, 8)
+    assert not os.path.exists(cache.path)
@@ -0,0 +1,180 @@
+"""
+Exact match groups: batch build and incremental maintenance against grouping
+by create_canonical_key(), cached price summaries, and reuse of the persisted
+canonical keys.
+"""
+from collections import defaultdict
+import pytest
+
+import exact_matcher
+from exact_matcher import ExactMatcher, hash_canonical_key
+from price_comparator import PriceComparator
+
+
+def baseline_groups(products):
+    """canonical_key -> set of productIDs, grouped one product at a time."""
+    matcher = ExactMatcher()
+    groups = defaultdict(set)
+    for product in products:
+        groups[matcher.create_canonical_key(product['productName'])].add(product['productID'])
+    return dict(groups)
+
+
+def groups_of(matcher):
+    """Readable canonical_key -> set of productIDs of the matcher's groups."""
+    groups = {}
+    for key, rows in matcher.match_groups.items():
+        assert list(rows) == sorted(rows)
+        assert not rows.flags.writeable
+        members = matcher.products_at(rows)
+        assert None not in members
+        readable = matcher.readable_key(key)
+        groups[readable] = {p['productID'] for p in members}
+    return groups
+
+
+def hashed(groups):
+    return {hash_canonical_key(key): members for key, members in groups.items()}
+
+
+def apply_changes(matcher, catalog, changed_catalog):
+    """Bring the matcher from catalog to changed_catalog with add_or_update() / remove()."""
+    current_ids = {p['productID'] for p in changed_catalog}
+    for product in catalog:
+        if product['productID'] not in current_ids:
+            matcher.remove(product['productID'])
+    for product in changed_catalog:
+        matcher.add_or_update(product)
+
+
+def test_units_are_case_insensitive():
+    matcher = ExactMatcher()
+    assert matcher.create_canonical_key('Lays Classic Chips 6 Pack') == \
+        matcher.create_canonical_key('Lays Classic Chips 6 pack')
+    assert matcher.create_canonical_key('Tapal Danedar Tea 1KG') == \
+        matcher.create_canonical_key('Tapal Danedar Tea 1000g')
+
+
+@pytest.mark.parametrize('hashed_keys', [False, True])
+def test_build_matches_baseline(catalog, hashed_keys):
+    matcher = ExactMatcher(hashed_keys=hashed_keys, keep_key_names=True)
+    matcher.build_exact_matches(catalog)
+    
+    expected = baseline_groups(catalog)
+    assert groups_of(matcher) == expected
+    if hashed_keys:
+        assert set(matcher.match_groups) == set(hashed(expected))
+    
+    for product in catalog:
+        members = {p['productID'] for p in matcher.get_match_group(product['productID'])}
+        matches = {p['productID'] for p in matcher.get_exact_matches(product['productID'])}
+        assert product['productID'] in members
+        assert matches == members - {product['productID']}
+
+
+@pytest.mark.parametrize('hashed_keys', [False, True])
+def test_incremental_updates_match_rebuild(catalog, changed_catalog, hashed_keys):
+    matcher = ExactMatcher(hashed_keys=hashed_keys, keep_key_names=True)
+    matcher.build_exact_matches(catalog)
+    apply_changes(matcher, catalog, changed_catalog)
+    
+    assert groups_of(matcher) == baseline_groups(changed_catalog)
+    
+    rebuilt = ExactMatcher(hashed_keys=hashed_keys, keep_key_names=True)
+    rebuilt.build_exact_matches(changed_catalog)
+    for product in changed_catalog:
+        pid = product['productID']
+        assert matcher.get_canonical_key(pid) == rebuilt.get_canonical_key(pid)
+        assert matcher.get_price_summary(pid) == rebuilt.get_price_summary(pid)
+
+
+def test_add_or_update_reports_changed_groups(catalog):
+    matcher = ExactMatcher()
+    matcher.build_exact_matches(catalog)
+    product = catalog[0]
+    old_key = matcher.get_canonical_key(product['productID'])
+    
+    assert matcher.add_or_update(dict(product)) == set()
+    assert matcher.add_or_update(dict(product, originalPrice=1)) == {old_key}
+    
+    renamed = dict(product, productName='Knorr Chicken Soup 55gm')
+    new_key = matcher.create_canonical_key(renamed['productName'])
+    assert matcher.add_or_update(renamed) == {old_key, new_key}
+    assert matcher.remove(product['productID']) == {new_key}
+    assert matcher.remove(product['productID']) == set()
+    assert matcher.get_exact_matches(product['productID']) == []
+
+
+def price_summary(products):
+    """A group's price summary, priced and ranked from scratch."""
+    comparator = PriceComparator()
+    ranked = comparator.rank_by_value(comparator.compare_products(products))
+    return {'price_comparison': ranked, 'savings_analysis': comparator.get_savings_analysis(ranked)}
+
+
+@pytest.mark.parametrize('hashed_keys', [False, True])
+def test_price_summaries_match_recomputation(catalog, changed_catalog, hashed_keys):
+    matcher = ExactMatcher(hashed_keys=hashed_keys)
+    matcher.build_exact_matches(catalog)
+    for product in catalog:
+        assert matcher.get_price_summary(product['productID']) == price_summary(
+            matcher.get_match_group(product['productID']))
+    
+    # Joins, leaves, renames and price-only updates all refresh the cached summaries
+    apply_changes(matcher, catalog, changed_catalog)
+    for product in changed_catalog:
+        group = matcher.get_match_group(product['productID'])
+        summary = matcher.get_price_summary(product['productID'])
+        assert summary == price_summary(group)
+        assert all(matcher.get_price_summary(p['productID']) is summary for p in group)
+    
+    assert matcher.get_price_summary('missing') is None
+
+
+def test_key_store_reuses_keys(catalog, changed_catalog, tmp_path):
+    path = str(tmp_path / 'keys.jsonl')
+    
+    first = ExactMatcher(key_store_path=path)
+    first.build_exact_matches(catalog)
+    apply_changes(first, catalog, changed_catalog)
+    
+    # The store already holds every key of the changed catalog, so nothing is parsed
+    second = ExactMatcher(key_store_path=path)
+    second.build_exact_matches(changed_catalog)
+    assert len(second.attribute_store.attributes) == 0
+    assert groups_of(second) == baseline_groups(changed_catalog)
+    
+    third = ExactMatcher(key_store_path=path)
+    third.build_exact_matches(catalog)
+    stored = {(p['productID'], p['productName']) for p in changed_catalog}
+    assert len(third.attribute_store.attributes) == \
+        sum(1 for p in catalog if (p['productID'], p['productName']) not in stored)
+    assert groups_of(third) == baseline_groups(catalog)
+
+
+@pytest.mark.parametrize('module, name', [(exact_matcher, 'PARSER_VERSION'),
+                                          (ExactMatcher, 'KEY_FORMAT_VERSION')])
+def test_key_store_from_other_version_is_ignored(catalog, tmp_path, monkeypatch, module, name):
+    path = str(tmp_path / 'keys.jsonl')
+    
+    ExactMatcher(key_store_path=path).build_exact_matches(catalog)
+    assert ExactMatcher(key_store_path=path).key_store.load()
+    
+    monkeypatch.setattr(module, name, getattr(module, name) + 1)
+    matcher = ExactMatcher(key_store_path=path)
+    assert matcher.key_store.load() == {}
+    
+    matcher.build_exact_matches(catalog)
+    assert len(matcher.attribute_store.attributes) == len(catalog)
+    assert groups_of(matcher) == baseline_groups(catalog)
+
+
+def test_key_hashes_do_not_block_updates(catalog):
+    matcher = ExactMatcher(hashed_keys=True)
+    matcher.build_exact_matches(catalog[:-1])
+    
+    key_hashes = matcher.get_key_hashes()
+    matcher.add_or_update(catalog[-1])
+    
+    assert len(key_hashes) == len(catalog) - 1
+    assert list(matcher.get_key_hashes()) == [matcher.get_canonical_key(p['productID']) for p in catalog]
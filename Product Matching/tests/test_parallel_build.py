@@ -0,0 +1,65 @@
+"""
+Sharded builds: process-pool results against the same computation in one process.
+"""
+import numpy as np
+import pytest
+
+import config
+from array_blocking import ArrayLSHBlocker
+from attribute_store import ProductAttributeStore
+from blocking import ProductBlocker, minhash_permutations, minhash_signatures
+from parallel_build import parallel_attributes, parallel_signatures, shard_ranges
+from preprocessing import extract_attributes_batch
+
+
+@pytest.fixture
+def small_shards(monkeypatch):
+    """Shards small enough that the 400-product catalog is split across workers."""
+    monkeypatch.setattr(config, 'PARALLEL_SHARD_SIZE', 37)
+
+
+def test_shards_cover_all_rows():
+    assert shard_ranges(100, 37) == [(0, 37), (37, 74), (74, 100)]
+    assert shard_ranges(0, 37) == []
+
+
+@pytest.mark.parametrize('n_gram_size', [3, 4])
+def test_signatures_match_serial(catalog, small_shards, n_gram_size):
+    names = [p['productName'] for p in catalog]
+    expected = minhash_signatures(names, minhash_permutations(64), n_gram_size)
+    
+    assert np.array_equal(parallel_signatures(names, 64, workers=2, n_gram_size=n_gram_size), expected)
+    
+    out = np.zeros_like(expected)
+    assert parallel_signatures(names, 64, workers=2, out=out, n_gram_size=n_gram_size) is out
+    assert np.array_equal(out, expected)
+
+
+def test_attributes_match_serial(catalog, small_shards):
+    names = [p['productName'] for p in catalog]
+    expected = extract_attributes_batch(names)
+    columns = parallel_attributes(names, workers=2)
+    
+    assert set(columns) == set(expected)
+    for name in ('brand', 'product_type', 'unit'):
+        assert list(columns[name]) == list(expected[name])
+    assert np.array_equal(columns['size'], expected['size'], equal_nan=True)
+
+
+@pytest.mark.parametrize('blocker_class', [ProductBlocker, ArrayLSHBlocker])
+def test_parallel_blocker_build_matches_serial(catalog, small_shards, blocker_class):
+    serial = blocker_class(build_workers=1)
+    serial.build_index(catalog)
+    parallel = blocker_class(build_workers=2)
+    parallel.build_index(catalog)
+    
+    assert np.array_equal(parallel.signatures, serial.signatures)
+
+
+def test_parallel_attribute_store_matches_serial(catalog, small_shards):
+    serial = ProductAttributeStore(build_workers=1)
+    serial.build(catalog)
+    parallel = ProductAttributeStore(build_workers=2)
+    parallel.build(catalog)
+    
+    assert parallel.attributes == serial.attributes
@@ -0,0 +1,111 @@
+"""
+Name parsing and shingling: batch attribute extraction against the per-product
+parser, and hashed n-grams against the n-gram strings they replace.
+"""
+import math
+import numpy as np
+import pytest
+
+from preprocessing import (clean_product_name, extract_attributes_batch, extract_brand,
+                           extract_product_attributes, extract_size_info, generate_ngram_hashes,
+                           generate_ngram_hashes_batch, generate_ngrams)
+
+
+EDGE_CASES = ['', 'Shan', '80gm', 'NESTLE MILKPAK 1.5 LTR', 'Lays Classic Chips 6 Pack',
+              'Tapal Danedar Tea 1KG', 'Head & Shoulders 200 ml', 'Dalda  Cooking   Oil 5 litres',
+              'National Ketchup 800g Pouch 2 Pack']
+
+
+def multi_pass_attributes(product_name):
+    """Attributes as the original parser derived them: one helper per field."""
+    brand = extract_brand(product_name)
+    size_info = extract_size_info(product_name)
+    product_type = clean_product_name(size_info['name_without_size'])
+    if brand and product_type.startswith(clean_product_name(brand)):
+        product_type = product_type[len(clean_product_name(brand)):].strip()
+    
+    return {
+        'brand': brand,
+        'product_type': product_type,
+        'size': size_info['size'],
+        'unit': size_info['unit'],
+        'original_name': product_name
+    }
+
+
+def catalog_names(catalog):
+    return [p['productName'] for p in catalog] + EDGE_CASES
+
+
+def test_single_product_matches_multi_pass(catalog):
+    for name in catalog_names(catalog):
+        assert extract_product_attributes(name) == multi_pass_attributes(name), name
+
+
+@pytest.mark.parametrize('repeat', [1, 3])
+def test_batch_matches_single_product(catalog, repeat):
+    names = catalog_names(catalog) * repeat
+    columns = extract_attributes_batch(iter(names))
+    
+    assert all(len(column) == len(names) for column in columns.values())
+    for i, name in enumerate(names):
+        expected = extract_product_attributes(name)
+        assert columns['brand'][i] == expected['brand']
+        assert columns['product_type'][i] == expected['product_type']
+        assert columns['unit'][i] == expected['unit']
+        if expected['size'] is None:
+            assert math.isnan(columns['size'][i])
+        else:
+            assert columns['size'][i] == expected['size']
+
+
+def test_empty_batch():
+    columns = extract_attributes_batch([])
+    assert set(columns) == {'brand', 'product_type', 'size', 'unit'}
+    assert all(len(column) == 0 for column in columns.values())
+
+
+def scalar_hash(ngram, bits):
+    """FNV-1a over the UTF-8 bytes followed by the 64-bit finalizer, one n-gram at a time."""
+    mask = (1 << 64) - 1
+    value = 0xCBF29CE484222325
+    for byte in ngram.encode('utf-8'):
+        value = ((value ^ byte) * 0x100000001B3) & mask
+    for multiplier in (0xFF51AFD7ED558CCD, 0xC4CEB9FE1A85EC53):
+        value ^= value >> 33
+        value = (value * multiplier) & mask
+    value ^= value >> 33
+    return (value ^ (value >> 32)) & 0xFFFFFFFF if bits == 32 else value
+
+
+def shingle_texts(catalog):
+    return [clean_product_name(name) for name in catalog_names(catalog)] + ['a', 'ab', 'abc']
+
+
+@pytest.mark.parametrize('bits', [32, 64])
+@pytest.mark.parametrize('n', [2, 3, 5])
+def test_ngram_hashes_match_ngram_strings(catalog, bits, n):
+    for text in shingle_texts(catalog):
+        hashes = generate_ngram_hashes(text, n, bits)
+        assert hashes.dtype == (np.uint32 if bits == 32 else np.uint64)
+        assert list(hashes) == sorted({scalar_hash(ngram, bits) for ngram in generate_ngrams(text, n)})
+
+
+@pytest.mark.parametrize('bits', [32, 64])
+@pytest.mark.parametrize('n', [2, 3, 5])
+def test_batch_ngram_hashes_match_single_text(catalog, bits, n):
+    texts = shingle_texts(catalog)
+    hashes, offsets = generate_ngram_hashes_batch(texts, n, bits)
+    
+    assert len(offsets) == len(texts) + 1
+    assert offsets[-1] == len(hashes)
+    for i, text in enumerate(texts):
+        single = generate_ngram_hashes(text, n, bits)
+        assert np.array_equal(np.unique(hashes[offsets[i]:offsets[i + 1]]), single), text
+
+
+def test_ngram_hash_width_is_checked():
+    with pytest.raises(ValueError):
+        generate_ngram_hashes('tea', bits=16)
+    with pytest.raises(ValueError):
+        generate_ngram_hashes_batch(['tea'], bits=16)
@@ -0,0 +1,47 @@
+"""
+Price comparison: merging cached group rankings against ranking the whole list again.
+"""
+import random
+import pytest
+
+from price_comparator import PriceComparator
+
+
+def priced(products, seed):
+    """Copies with prices from a small set, so price-per-unit ties are common."""
+    rng = random.Random(seed)
+    return [dict(p, originalPrice=rng.choice([100, 150, 200]), discount=0) for p in products]
+
+
+def ids(ranked):
+    return [r['product']['productID'] for r in ranked]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_merged_ranking_matches_full_ranking(catalog, seed):
+    rng = random.Random(seed)
+    products = priced(rng.sample(catalog, 40), seed)
+    group, semantic = products[:25], products[25:]
+    query = rng.choice(group)
+    comparator = PriceComparator()
+    
+    # Previously: the query first, then its matches, ranked together
+    expected = comparator.rank_by_value(comparator.compare_products(
+        [query] + [p for p in group if p is not query] + semantic))
+    
+    merged = comparator.merge_ranked(
+        comparator.promote(comparator.rank_by_value(comparator.compare_products(group)), query['productID']),
+        comparator.rank_by_value(comparator.compare_products(semantic))
+    )
+    
+    assert ids(merged) == ids(expected)
+    assert comparator.get_savings_analysis(merged) == comparator.get_savings_analysis(expected)
+
+
+def test_promote_unknown_product_keeps_order(catalog):
+    comparator = PriceComparator()
+    ranked = comparator.rank_by_value(comparator.compare_products(priced(catalog[:10], 0)))
+    
+    promoted = comparator.promote(ranked, 'missing')
+    assert ids(promoted) == ids(ranked)
+    assert promoted is not ranked
@@ -0,0 +1,197 @@
+"""
+Semantic matcher: batched kNN against per-product searches, and snapshots and
+incremental updates against a fresh build.
+Needs the Sentence Transformer model, so the module is skipped unless it is
+installed and already downloaded.
+"""
+import os
+import numpy as np
+import pytest
+
+sentence_transformers = pytest.importorskip('sentence_transformers')
+
+import snapshot_store
+from semantic_matcher import SemanticMatcher
+
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+
+@pytest.fixture(scope='module')
+def model_available():
+    try:
+        sentence_transformers.SentenceTransformer(MODEL_NAME, local_files_only=True)
+    except OSError:
+        pytest.skip(f"Sentence Transformer model {MODEL_NAME} is not downloaded")
+
+
+@pytest.fixture
+def make_matcher(model_available, monkeypatch):
+    """Matcher factory without the on-disk embedding cache."""
+    monkeypatch.setattr('config.EMBEDDING_CACHE_PATH', None)
+    return lambda: SemanticMatcher(MODEL_NAME)
+
+
+def vectors_by_id(matcher):
+    return {pid: np.asarray(matcher.embeddings[row]) for pid, row in matcher.id_to_row.items()}
+
+
+def assert_same_index(matcher, expected):
+    assert set(matcher.product_ids) == set(expected.product_ids)
+    assert matcher.index.ntotal == len(matcher.product_ids)
+    vectors = vectors_by_id(expected)
+    for pid, vector in vectors_by_id(matcher).items():
+        assert np.allclose(vector, vectors[pid], atol=1e-6)
+
+
+def assert_same_neighbours(found, expected):
+    """Same similarities in order; same products apart from ties at the cut-off."""
+    assert np.allclose([s for _, s in found], [s for _, s in expected], atol=1e-5)
+    if expected:
+        cutoff = expected[-1][1] + 1e-5
+        assert {pid for pid, s in found if s > cutoff} == {pid for pid, s in expected if s > cutoff}
+
+
+def searched_neighbours(matcher, product_id, k, min_similarity):
+    """find_similar_products() with one FAISS search for the product."""
+    neighbours = matcher.neighbours
+    matcher.neighbours = None
+    try:
+        return matcher.find_similar_products(product_id, k, min_similarity)
+    finally:
+        matcher.neighbours = neighbours
+
+
+@pytest.mark.parametrize('batch_size', [7, 1000])
+def test_search_all_matches_single_searches(make_matcher, catalog, batch_size):
+    matcher = make_matcher()
+    matcher.build_faiss_index(catalog)
+    
+    rows, similarities = matcher.search_all(k=10, min_similarity=0.5, batch_size=batch_size)
+    assert rows.shape == similarities.shape == (len(catalog), 10)
+    
+    for row, product_id in enumerate(matcher.product_ids):
+        assert row not in rows[row]
+        found = [(matcher.product_ids[r], float(s)) for r, s in zip(rows[row], similarities[row]) if r >= 0]
+        assert_same_neighbours(found, searched_neighbours(matcher, product_id, 10, 0.5))
+
+
+def test_precomputed_neighbours_answer_covered_queries(make_matcher, catalog, monkeypatch):
+    matcher = make_matcher()
+    matcher.build_faiss_index(catalog)
+    matcher.precompute_neighbours(k=10, min_similarity=0.5)
+    
+    # Fewer neighbours or a higher threshold than precomputed
+    queries = [(pid, k, min_similarity) for pid in matcher.product_ids[:50]
+               for k, min_similarity in [(10, 0.5), (5, 0.5), (10, 0.8), (3, 0.9)]]
+    expected = [searched_neighbours(matcher, *query) for query in queries]
+    
+    searches = []
+    search = matcher.index.search
+    monkeypatch.setattr(matcher.index, 'search', lambda *args: searches.append(args) or search(*args))
+    
+    for query, neighbours in zip(queries, expected):
+        found = matcher.find_similar_products(*query)
+        assert len(found) <= query[1]
+        assert_same_neighbours(found, neighbours)
+    assert searches == []
+    
+    # More neighbours or a lower threshold fall back to a search
+    for product_id in matcher.product_ids[:5]:
+        matcher.find_similar_products(product_id, 20, 0.5)
+        matcher.find_similar_products(product_id, 10, 0.3)
+    assert len(searches) == 10
+
+
+def assert_rows_consistent(matcher):
+    """id_to_row, product_ids, the embedding matrix and the FAISS index describe the same rows."""
+    assert matcher.id_to_row == {pid: row for row, pid in enumerate(matcher.product_ids)}
+    assert set(matcher.products) == set(matcher.product_ids)
+    assert len(matcher.embeddings) == matcher.index.ntotal == len(matcher.product_ids)
+    
+    stored = np.vstack([matcher.index.reconstruct(row) for row in range(matcher.index.ntotal)])
+    assert np.allclose(stored, matcher.embeddings, atol=1e-6)
+
+
+def test_rows_stay_consistent_through_updates(make_matcher, catalog, changed_catalog):
+    matcher = make_matcher()
+    matcher.build_faiss_index(catalog)
+    assert_rows_consistent(matcher)
+    
+    renamed = dict(catalog[5], productName='Completely Different Name')
+    matcher.upsert_products([renamed])
+    assert matcher.id_to_row[renamed['productID']] == 5
+    assert_rows_consistent(matcher)
+    
+    assert matcher.remove_products([catalog[0]['productID'], catalog[0]['productID'], 'missing']) == 1
+    assert matcher.id_to_row[renamed['productID']] == 4
+    assert_rows_consistent(matcher)
+    
+    matcher.sync_products(changed_catalog)
+    assert_rows_consistent(matcher)
+    
+    fresh = make_matcher()
+    fresh.build_faiss_index(changed_catalog)
+    assert_same_index(matcher, fresh)
+    for product in changed_catalog[::10]:
+        assert_same_neighbours(matcher.find_similar_products(product['productID'], 10, 0.5),
+                               fresh.find_similar_products(product['productID'], 10, 0.5))
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_snapshot_round_trip_then_sync(make_matcher, catalog, changed_catalog, tmp_path, mmap):
+    original = make_matcher()
+    original.build_faiss_index(catalog)
+    original.save_snapshot(str(tmp_path))
+    
+    restored = make_matcher()
+    assert restored.load_snapshot(str(tmp_path), mmap=mmap) == original.catalog_hash()
+    assert restored.product_ids == original.product_ids
+    assert np.array_equal(restored.embeddings, original.embeddings)
+    
+    stats = restored.sync_products(changed_catalog)
+    assert stats['added'] == 30
+    assert stats['removed'] == len(catalog) - (len(changed_catalog) - 30)
+    
+    fresh = make_matcher()
+    fresh.build_faiss_index(changed_catalog)
+    assert restored.products == fresh.products
+    assert_same_index(restored, fresh)
+    
+    # The snapshot on disk is untouched by the update
+    again = make_matcher()
+    assert again.load_snapshot(str(tmp_path)) == original.catalog_hash()
+
+
+def test_interrupted_save_keeps_previous_snapshot(make_matcher, catalog, tmp_path):
+    original = make_matcher()
+    original.build_faiss_index(catalog)
+    original.save_snapshot(str(tmp_path))
+    
+    # A save that died after writing its embeddings never published them
+    generation = snapshot_store.new_generation(str(tmp_path))
+    np.save(str(tmp_path / generation / 'embeddings.npy'), original.embeddings[:10])
+    
+    restored = make_matcher()
+    assert restored.load_snapshot(str(tmp_path)) == original.catalog_hash()
+    assert_same_index(restored, original)
+
+
+def test_resave_replaces_generation(make_matcher, catalog, changed_catalog, tmp_path):
+    matcher = make_matcher()
+    matcher.build_faiss_index(catalog)
+    matcher.save_snapshot(str(tmp_path))
+    
+    restored = make_matcher()
+    restored.load_snapshot(str(tmp_path))
+    restored.sync_products(changed_catalog)
+    restored.save_snapshot(str(tmp_path))
+    
+    assert sorted(os.listdir(tmp_path)) == ['generation-000002', 'manifest.json']
+    again = make_matcher()
+    assert again.load_snapshot(str(tmp_path)) == restored.catalog_hash()
+    assert again.product_ids == restored.product_ids
+
+
+def test_missing_snapshot_loads_nothing(make_matcher, tmp_path):
+    assert make_matcher().load_snapshot(str(tmp_path)) is None
@@ -0,0 +1,165 @@
+"""
+LSH snapshots: save, load into a fresh blocker, then bring up to date with an upsert;
+only complete, published generations are ever read.
+"""
+import json
+import os
+import numpy as np
+import pytest
+
+import snapshot_store
+from array_blocking import ArrayLSHBlocker
+from blocking import ProductBlocker
+from conftest import make_products
+
+
+ALL = 10 ** 6
+
+
+def candidate_ids(blocker):
+    return {
+        pid: {c['productID'] for c in blocker.query_candidates(pid, ALL)}
+        for pid in blocker.product_ids
+    }
+
+
+@pytest.mark.parametrize('blocker_class', [ProductBlocker, ArrayLSHBlocker])
+def test_round_trip_then_upsert(catalog, changed_catalog, tmp_path, blocker_class):
+    original = blocker_class()
+    original.build_index(catalog)
+    original.save_snapshot(str(tmp_path))
+    
+    restored = blocker_class()
+    assert restored.load_snapshot(str(tmp_path)) == len(catalog)
+    assert restored.product_ids == original.product_ids
+    assert np.array_equal(restored.signatures, original.signatures)
+    assert candidate_ids(restored) == candidate_ids(original)
+    
+    # Loaded products only carry ID and name, so a full refresh updates all of them
+    stats = restored.sync_products(changed_catalog)
+    renamed = sum(
+        1 for p in changed_catalog
+        if p['productID'] in original.products
+        and p['productName'] != original.products[p['productID']]['productName']
+    )
+    assert stats['added'] == 30
+    assert stats['removed'] == len(catalog) - (len(changed_catalog) - 30)
+    assert renamed > 0
+    
+    fresh = blocker_class()
+    fresh.build_index(changed_catalog)
+    
+    assert restored.products == fresh.products
+    assert candidate_ids(restored) == candidate_ids(fresh)
+    for pid in fresh.product_ids:
+        assert np.array_equal(restored.signatures[restored.id_to_row[pid]], fresh.signatures[fresh.id_to_row[pid]])
+
+
+@pytest.mark.parametrize('blocker_class', [ProductBlocker, ArrayLSHBlocker])
+def test_snapshot_with_other_parameters_is_ignored(catalog, tmp_path, blocker_class):
+    blocker = blocker_class(n_gram_size=3)
+    blocker.build_index(catalog)
+    blocker.save_snapshot(str(tmp_path))
+    
+    assert blocker_class(n_gram_size=4).load_snapshot(str(tmp_path)) == 0
+    assert blocker_class(num_perm=64).load_snapshot(str(tmp_path)) == 0
+    assert blocker_class(n_gram_size=3).load_snapshot(str(tmp_path)) == len(catalog)
+
+
+def test_snapshot_only_loads_into_empty_index(catalog, tmp_path):
+    blocker = ProductBlocker()
+    blocker.build_index(catalog)
+    blocker.save_snapshot(str(tmp_path))
+    
+    with pytest.raises(ValueError):
+        blocker.load_snapshot(str(tmp_path))
+
+
+def test_mapped_signatures_are_not_written_back(catalog, tmp_path):
+    signature_path = str(tmp_path / 'signatures.npy')
+    blocker = ArrayLSHBlocker(signature_path=signature_path)
+    blocker.build_index(catalog)
+    on_disk = np.load(signature_path).copy()
+    
+    renamed = dict(catalog[0], productName='Completely Different Name')
+    blocker.upsert_products([renamed])
+    
+    assert not np.array_equal(blocker.signatures[0], on_disk[0])
+    assert np.array_equal(np.load(signature_path), on_disk)
+
+
+def test_resave_over_mapped_snapshot(catalog, tmp_path):
+    blocker = ArrayLSHBlocker()
+    blocker.build_index(catalog)
+    blocker.save_snapshot(str(tmp_path))
+    
+    restored = ArrayLSHBlocker()
+    restored.load_snapshot(str(tmp_path))
+    restored.upsert_products([dict(catalog[0], productName='Completely Different Name')])
+    restored.save_snapshot(str(tmp_path))
+    
+    again = ArrayLSHBlocker()
+    assert again.load_snapshot(str(tmp_path)) == len(catalog)
+    assert again.products[catalog[0]['productID']]['productName'] == 'Completely Different Name'
+    assert os.path.exists(tmp_path / 'manifest.json')
+
+
+def test_saving_keeps_signatures_mapped(catalog, tmp_path):
+    blocker = ArrayLSHBlocker()
+    blocker.build_index(catalog)
+    blocker.save_snapshot(str(tmp_path / 'first'))
+    
+    restored = ArrayLSHBlocker()
+    restored.load_snapshot(str(tmp_path / 'first'))
+    restored.save_snapshot(str(tmp_path / 'second'))
+    
+    assert isinstance(restored.signatures, np.memmap)
+    assert ArrayLSHBlocker().load_snapshot(str(tmp_path / 'second')) == len(catalog)
+
+
+@pytest.mark.parametrize('blocker_class', [ProductBlocker, ArrayLSHBlocker])
+def test_interrupted_save_keeps_previous_snapshot(catalog, tmp_path, blocker_class):
+    blocker = blocker_class()
+    blocker.build_index(catalog)
+    blocker.save_snapshot(str(tmp_path))
+    
+    # A save that died after writing its files never published them
+    generation = snapshot_store.new_generation(str(tmp_path))
+    np.save(str(tmp_path / generation / 'signatures.npy'), blocker.signatures[:10])
+    with open(tmp_path / generation / 'products.json', 'w', encoding='utf-8') as f:
+        json.dump([], f)
+    
+    restored = blocker_class()
+    assert restored.load_snapshot(str(tmp_path)) == len(catalog)
+    assert candidate_ids(restored) == candidate_ids(blocker)
+
+
+@pytest.mark.parametrize('blocker_class', [ProductBlocker, ArrayLSHBlocker])
+def test_loaded_snapshot_is_one_generation(catalog, tmp_path, blocker_class):
+    first = blocker_class()
+    first.build_index(catalog)
+    first.save_snapshot(str(tmp_path))
+    
+    # Same size, other products: a mix of the two saves would still load without error
+    other = make_products(len(catalog), seed=2, id_prefix='q')
+    reader = blocker_class()
+    reader_manifest = snapshot_store.read_manifest(str(tmp_path))
+    
+    second = blocker_class()
+    second.build_index(other)
+    second.save_snapshot(str(tmp_path))
+    
+    assert sorted(os.listdir(tmp_path)) == ['generation-000002', 'manifest.json']
+    assert not os.path.exists(snapshot_store.generation_file(str(tmp_path), reader_manifest, 'products.json'))
+    assert reader.load_snapshot(str(tmp_path)) == len(other)
+    assert reader.product_ids == second.product_ids
+    assert candidate_ids(reader) == candidate_ids(second)
+
+
+def test_missing_snapshot_loads_nothing(tmp_path):
+    assert ProductBlocker().load_snapshot(str(tmp_path / 'missing')) == 0
+    
+    os.makedirs(tmp_path / 'empty')
+    with open(tmp_path / 'empty' / 'manifest.json', 'w', encoding='utf-8') as f:
+        json.dump({'version': ProductBlocker.SNAPSHOT_VERSION, 'generation': 'generation-000001'}, f)
+    assert ArrayLSHBlocker().load_snapshot(str(tmp_path / 'empty')) == 0
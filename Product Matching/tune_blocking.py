@@ -0,0 +1,244 @@
+"""
+Tuning harness for the LSH blocking parameters.
+
+Sweeps num_perm, threshold and n-gram size over a set of known matching pairs
+(labeled, or derived from exact-match groups) and recommends the cheapest
+configuration that reaches a target pair completeness (recall).
+"""
+
+import csv
+import itertools
+import random
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+import numpy as np
+import config
+from data_loader import ProductDataLoader
+from exact_matcher import ExactMatcher
+from blocking import ProductBlocker
+from array_blocking import ArrayLSHBlocker
+
+
+def load_labeled_pairs(path: str) -> List[tuple]:
+    """
+    Load labeled matching pairs from a CSV file with productID1,productID2 columns.
+    
+    Args:
+        path: CSV file path
+    
+    Returns:
+        List of (productID, productID) tuples
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return [(row['productID1'], row['productID2']) for row in csv.DictReader(f)]
+
+
+def exact_match_pairs(products: List[Dict]) -> List[tuple]:
+    """
+    Derive matching pairs from exact-match groups (same canonical key).
+    
+    Args:
+        products: List of product dictionaries
+    
+    Returns:
+        List of (productID, productID) tuples
+    """
+    matcher = ExactMatcher()
+    matcher.build_exact_matches(products)
+    
+    pairs = []
+    for group in matcher.match_groups.values():
+        ids = [p['productID'] for p in matcher.products_at(group)]
+        pairs.extend(itertools.combinations(ids, 2))
+    
+    return pairs
+
+
+def pair_keys(rows_a: np.ndarray, rows_b: np.ndarray, num_products: int) -> np.ndarray:
+    """Encode unordered row pairs as int64 keys."""
+    low = np.minimum(rows_a, rows_b).astype(np.int64)
+    high = np.maximum(rows_a, rows_b).astype(np.int64)
+    return low * num_products + high
+
+
+def evaluate_config(products: List[Dict], truth_pairs: List[tuple], num_perm: int,
+                    threshold: float, n_gram_size: int, engine: str = None,
+                    measure_memory: bool = True) -> Dict:
+    """
+    Build a blocker with one parameter set and measure cost and pair completeness.
+    
+    Args:
+        products: List of product dictionaries
+        truth_pairs: Known matching (productID, productID) pairs
+        num_perm: Number of MinHash permutations
+        threshold: LSH Jaccard threshold
+        n_gram_size: Character n-gram size
+        engine: 'datasketch' or 'array' (default: from config)
+        measure_memory: Rebuild once under tracemalloc to measure index memory
+    
+    Returns:
+        Dictionary with parameters and metrics
+    """
+    engine = engine or config.BLOCKING_ENGINE
+    blocker_class = ArrayLSHBlocker if engine == 'array' else ProductBlocker
+    
+    blocker = blocker_class(num_perm=num_perm, threshold=threshold, n_gram_size=n_gram_size)
+    
+    start_time = time.time()
+    blocker.build_index(products)
+    build_time = time.time() - start_time
+    
+    # One candidate pass: query time, candidate pairs and statistics
+    start_time = time.time()
+    candidate_keys = [
+        pair_keys(left, right, len(products))
+        for left, right in blocker.iter_candidate_pairs(config.BLOCKED_MAX_CANDIDATES)
+    ]
+    query_time = time.time() - start_time
+    
+    memory_bytes = None
+    if measure_memory:
+        tracemalloc.start()
+        measured = blocker_class(num_perm=num_perm, threshold=threshold, n_gram_size=n_gram_size)
+        measured.build_index(products)
+        memory_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del measured
+    
+    candidate_keys = np.unique(np.concatenate(candidate_keys)) if candidate_keys else np.empty(0, dtype=np.int64)
+    
+    truth = [
+        (blocker.id_to_row[a], blocker.id_to_row[b]) for a, b in truth_pairs
+        if a in blocker.id_to_row and b in blocker.id_to_row and a != b
+    ]
+    truth_keys = np.unique(pair_keys(
+        np.array([a for a, _ in truth], dtype=np.int64),
+        np.array([b for _, b in truth], dtype=np.int64),
+        len(products)
+    ))
+    
+    stats = blocker.get_statistics()
+    found = np.isin(truth_keys, candidate_keys).sum()
+    
+    return {
+        'num_perm': num_perm,
+        'threshold': threshold,
+        'n_gram_size': n_gram_size,
+        'bands': blocker.bands if engine == 'array' else blocker.lsh.b,
+        'build_time': build_time,
+        'query_time': query_time,
+        'query_ms_per_product': query_time / max(len(products), 1) * 1000,
+        'memory_mb': memory_bytes / 1e6 if memory_bytes is not None else None,
+        'candidate_pairs': stats['actual_candidate_pairs'],
+        'pair_completeness': float(found / len(truth_keys) * 100) if len(truth_keys) > 0 else 100.0,
+        'reduction_ratio': stats['reduction_ratio']
+    }
+
+
+def tune(products: List[Dict], truth_pairs: List[tuple],
+         num_perms=(64, 128, 256), thresholds=(0.3, 0.4, 0.5, 0.6, 0.7),
+         n_gram_sizes=(2, 3, 4), engine: str = None, measure_memory: bool = True) -> List[Dict]:
+    """
+    Evaluate every parameter combination.
+    
+    Args:
+        products: List of product dictionaries
+        truth_pairs: Known matching (productID, productID) pairs
+        num_perms: num_perm values to try
+        thresholds: Threshold values to try
+        n_gram_sizes: N-gram sizes to try
+        engine: 'datasketch' or 'array' (default: from config)
+        measure_memory: Measure index memory for each configuration
+    
+    Returns:
+        List of result dictionaries
+    """
+    results = []
+    grid = list(itertools.product(num_perms, thresholds, n_gram_sizes))
+    
+    for i, (num_perm, threshold, n_gram_size) in enumerate(grid, 1):
+        print(f"\n[{i}/{len(grid)}] num_perm={num_perm}, threshold={threshold}, n_gram_size={n_gram_size}")
+        results.append(evaluate_config(
+            products, truth_pairs, num_perm, threshold, n_gram_size, engine, measure_memory
+        ))
+    
+    return results
+
+
+def recommend(results: List[Dict], target_recall: float = 95.0) -> Optional[Dict]:
+    """
+    Pick the cheapest configuration (build + query time, then candidate pairs)
+    whose pair completeness meets the target.
+    
+    Args:
+        results: Results from tune()
+        target_recall: Minimum pair completeness in percent
+    
+    Returns:
+        Recommended result dictionary, or None if no configuration reaches the target
+    """
+    eligible = [r for r in results if r['pair_completeness'] >= target_recall]
+    if not eligible:
+        return None
+    
+    return min(eligible, key=lambda r: (r['build_time'] + r['query_time'], r['candidate_pairs']))
+
+
+def print_results(results: List[Dict]) -> None:
+    """Print results as a table."""
+    print(f"\n{'perm':>5} {'thr':>5} {'n':>3} {'bands':>5} {'build s':>8} {'query ms':>9} "
+          f"{'mem MB':>8} {'pairs':>10} {'PC %':>7} {'RR %':>8}")
+    
+    for r in results:
+        memory = f"{r['memory_mb']:.1f}" if r['memory_mb'] is not None else '-'
+        print(f"{r['num_perm']:>5} {r['threshold']:>5} {r['n_gram_size']:>3} {r['bands']:>5} "
+              f"{r['build_time']:>8.2f} {r['query_ms_per_product']:>9.3f} {memory:>8} "
+              f"{r['candidate_pairs']:>10} {r['pair_completeness']:>7.2f} {r['reduction_ratio']:>8.3f}")
+
+
+def main():
+    """Main execution function."""
+    print("=" * 80)
+    print("LSH BLOCKING PARAMETER TUNING")
+    print("=" * 80)
+    
+    SAMPLE_SIZE = 5000  # Products to tune on (None: whole catalog)
+    TARGET_RECALL = 95.0  # Required pair completeness in percent
+    
+    loader = ProductDataLoader()
+    products = loader.load_products_from_stores()
+    loader.close()
+    
+    if SAMPLE_SIZE and len(products) > SAMPLE_SIZE:
+        products = random.Random(42).sample(products, SAMPLE_SIZE)
+    print(f"\nTuning on {len(products):,} products")
+    
+    if config.LABELED_PAIRS_PATH:
+        truth_pairs = load_labeled_pairs(config.LABELED_PAIRS_PATH)
+    else:
+        truth_pairs = exact_match_pairs(products)
+    print(f"Reference pairs: {len(truth_pairs):,}")
+    
+    results = tune(products, truth_pairs)
+    
+    print_results(results)
+    
+    best = recommend(results, TARGET_RECALL)
+    
+    print("\n" + "=" * 80)
+    if best is None:
+        print(f"No configuration reached {TARGET_RECALL}% pair completeness")
+        return 1
+    
+    print(f"RECOMMENDED (cheapest with >= {TARGET_RECALL}% pair completeness):")
+    print(f"  LSH_NUM_PERM = {best['num_perm']}")
+    print(f"  LSH_THRESHOLD = {best['threshold']}")
+    print(f"  N_GRAM_SIZE = {best['n_gram_size']}")
+    print(f"  Pair completeness: {best['pair_completeness']:.2f}%, reduction ratio: {best['reduction_ratio']:.3f}%")
+    
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
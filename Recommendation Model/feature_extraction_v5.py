@@ -25,6 +25,8 @@ from sentence_transformers import SentenceTransformer
 import pickle
 import os
 
+from brand_lexicon import BrandLexicon, KeywordAutomaton
+
 
 class SemanticFeatureExtractorV5:
     """
@@ -156,6 +158,9 @@ class SemanticFeatureExtractorV5:
             "sateen",
         ]
 
+        # Compiled brand lexicon (list order is the match priority)
+        self.brand_lexicon = BrandLexicon(self.brands)
+
         # PRIORITY-BASED CATEGORY KEYWORDS
         # Priority 1: Brand-specific overrides (highest priority)
         self.brand_category_map = {
@@ -382,6 +387,35 @@ class SemanticFeatureExtractorV5:
             "sauces": ["sauces"],
         }
 
+        self.compile_category_matcher()
+
+    def compile_category_matcher(self):
+        """
+        Compile all category keywords into a single multi-pattern matcher
+        so every category is scored in one scan of the product name
+        """
+        self.category_names = [
+            category for category in self.category_keywords if category != "other"
+        ]
+        self.category_automaton = KeywordAutomaton(
+            keyword
+            for category in self.category_names
+            for keyword in self.category_keywords[category]
+        )
+
+        # keyword index -> category indices (repeated keywords count repeatedly)
+        self.keyword_categories = [[] for _ in range(len(self.category_automaton))]
+        for category_idx, category in enumerate(self.category_names):
+            for keyword in self.category_keywords[category]:
+                keyword_idx = self.category_automaton.keyword_index[keyword]
+                self.keyword_categories[keyword_idx].append(category_idx)
+
+        # sub category -> parent category (first parent wins)
+        self.parent_categories = {}
+        for parent, children in self.category_hierarchy.items():
+            for child in children:
+                self.parent_categories.setdefault(child, parent)
+
     def load_semantic_model(self):
         """Load sentence transformer model"""
         print("\n Loading semantic model...")
@@ -418,7 +452,13 @@ class SemanticFeatureExtractorV5:
 
         print("\n Extracting basic features...")
 
-        for idx, row in products_df.iterrows():
+        # Brand and category for the whole column in one pass
+        classified = self.infer_categories_batch(products_df["name"])
+        brands = classified["brand"].tolist()
+        categories = classified["category"].tolist()
+        parent_categories = classified["parent_category"].tolist()
+
+        for position, (idx, row) in enumerate(products_df.iterrows()):
             if idx % 5000 == 0:
                 print(f"   Processed {idx}/{len(products_df)}...")
 
@@ -448,12 +488,10 @@ class SemanticFeatureExtractorV5:
                 # Size extraction
                 **self.extract_sizes(name),
                 # Brand
-                "brand": self.extract_brand(name),
+                "brand": brands[position],
                 # Priority-based category detection
-                "category": self.infer_category_priority(name),
-                "parent_category": self.get_parent_category(
-                    self.infer_category_priority(name)
-                ),
+                "category": categories[position],
+                "parent_category": parent_categories[position],
                 # Product type keywords
                 **self.extract_product_type_keywords(name),
                 # Special indicators
@@ -512,11 +550,7 @@ class SemanticFeatureExtractorV5:
 
     def extract_brand(self, text):
         """Extract brand name"""
-        text_lower = text.lower()
-        for brand in self.brands:
-            if brand in text_lower:
-                return brand
-        return "unknown"
+        return self.brand_lexicon.find(text.lower()) or "unknown"
 
     def infer_category_priority(self, text):
         """
@@ -528,32 +562,50 @@ class SemanticFeatureExtractorV5:
         3. Generic keywords (lowest)
         """
         text_lower = text.lower()
+        return self._classify(text_lower, self.extract_brand(text))
 
+    def _classify(self, text_lower, brand):
+        """Category for a lowercase name whose brand is already known"""
         # Priority 1: Check brand-specific overrides
-        brand = self.extract_brand(text)
         if brand in self.brand_category_map:
             return self.brand_category_map[brand]
 
-        # Priority 2: Check strong product type keywords
-        category_scores = {}
-        for category, keywords in self.category_keywords.items():
-            if category == "other":
-                continue
-            score = sum(1 for keyword in keywords if keyword in text_lower)
-            if score > 0:
-                category_scores[category] = score
+        # Priority 2: Score every category in a single scan of the name
+        scores = [0] * len(self.category_names)
+        for keyword_idx in self.category_automaton.find_all(text_lower):
+            for category_idx in self.keyword_categories[keyword_idx]:
+                scores[category_idx] += 1
 
-        if category_scores:
-            return max(category_scores, key=category_scores.get)
+        # Ties go to the category listed first
+        best = max(range(len(scores)), key=scores.__getitem__, default=None)
+        if best is not None and scores[best] > 0:
+            return self.category_names[best]
 
         return "other"
 
+    def infer_categories_batch(self, names):
+        """
+        Classify a whole column of product names at once
+        Returns: DataFrame with brand, category and parent_category
+        (same index as names; identical names are classified once)
+        """
+        names = pd.Series(names).map(str)
+
+        classified = {}
+        for name in names.unique():
+            text_lower = name.lower()
+            brand = self.brand_lexicon.find(text_lower) or "unknown"
+            category = self._classify(text_lower, brand)
+            classified[name] = (brand, category, self.get_parent_category(category))
+
+        rows = [classified[name] for name in names]
+        return pd.DataFrame(
+            rows, index=names.index, columns=["brand", "category", "parent_category"]
+        )
+
     def get_parent_category(self, sub_category):
         """Get parent category from hierarchy"""
-        for parent, children in self.category_hierarchy.items():
-            if sub_category in children:
-                return parent
-        return "other"
+        return self.parent_categories.get(sub_category, "other")
 
     def extract_product_type_keywords(self, text):
         """Extract binary product type keywords"""